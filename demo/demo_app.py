@@ -1,38 +1,156 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+
+import cv2
 import streamlit as st
 import numpy as np
-from PIL import Image
 
-from src.pipeline import analyze_image
-from src.utils import to_float01
-from src.explain.heatmap import make_heatmap_overlay
+from src.context import ImageContext
+from src.loader import decode_image
+from src.pipeline import TruthLensResult, analyze_image, quick_scores
+from src.cache import ResultCache, open_cache, bytes_digest
+from src.explain.heatmap import make_heatmap_overlay8
+
+# Images are shown (and overlays blended) at most this many px per side
+PREVIEW_MAX_SIDE = 1024
+# Finished analyses kept in memory; each holds a preview-sized heatmap only (<= 4 MB)
+MAX_JOBS = 32
 
 st.set_page_config(page_title="TruthLens - AI Image Lie Detector", layout="wide")
 
+
+# ---- shared across sessions and reruns: keyed by upload content hash
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="truthlens")
+
+
+@st.cache_resource
+def _jobs() -> dict[str, tuple[Future, Future]]:
+    """digest -> (quick_scores, full result) futures."""
+    return {}
+
+
+@st.cache_resource
+def _result_cache() -> ResultCache:
+    # Re-uploads of the same file (also across restarts) hit the on-disk result cache
+    return open_cache(Path(__file__).resolve().parents[1] / "out" / "cache")
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_upload(digest: str, _data: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Full-resolution RGB (for analysis) and a <= PREVIEW_MAX_SIDE copy (for display).
+    Decoded like the CLI / batch runs (EXIF orientation applied), whose results
+    share the on-disk cache.
+    """
+    rgb, _ = decode_image(_data)
+    h, w = rgb.shape[:2]
+    s = PREVIEW_MAX_SIDE / max(h, w)
+    if s >= 1.0:
+        return rgb, rgb
+    preview = cv2.resize(rgb, (max(1, round(w * s)), max(1, round(h * s))), interpolation=cv2.INTER_AREA)
+    return rgb, preview
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def overlay_preview(digest: str, _preview: np.ndarray, _heat01: np.ndarray) -> np.ndarray:
+    return make_heatmap_overlay8(_preview, _heat01, alpha=0.45)
+
+
+def _analyze(
+    cache: ResultCache, digest: str, rgb: np.ndarray, preview_shape: tuple[int, int], quick: Future
+) -> TruthLensResult:
+    try:
+        key = cache.key(digest)
+        res = cache.get(key)
+        if res is None:
+            # cheap stages first, published for the page; analyze_image reuses them from the context
+            ctx = ImageContext(rgb)
+            quick.set_result(quick_scores(ctx, maps=True))
+            res = analyze_image(ctx)
+            cache.put(key, res)
+    finally:
+        if not quick.done():
+            quick.set_result(None)  # cache hit or failure: nothing to show early
+    # the page only shows the preview, so only a preview-sized heatmap is kept in memory
+    ph, pw = preview_shape
+    if res.heatmap01.shape != (ph, pw):
+        res = replace(res, heatmap01=cv2.resize(res.heatmap01, (pw, ph), interpolation=cv2.INTER_AREA))
+    return res
+
+
+def full_result(digest: str, rgb: np.ndarray, preview_shape: tuple[int, int]) -> tuple[Future, Future]:
+    """Starts (once per image content) the analysis in the background: (quick_scores, full result)."""
+    jobs = _jobs()
+    if digest not in jobs:
+        if len(jobs) >= MAX_JOBS:
+            jobs.pop(next(iter(jobs)))
+        quick = Future()
+        jobs[digest] = quick, _executor().submit(_analyze, _result_cache(), digest, rgb, preview_shape, quick)
+    return jobs[digest]
+
+
+# ---- page
+
 st.title("TruthLens 🔍 — Explainable AI Image Forensics (MVP)")
 st.caption("Uploads any image → verdict + evidence + heatmap (frequency/noise/repetition/edges)")
 
 up = st.file_uploader("Upload an image", type=["png", "jpg", "jpeg", "webp"])
 
 if up:
-    img = Image.open(up).convert("RGB")
-    rgb = np.array(img)
-
-    res = analyze_image(rgb)
-    overlay = make_heatmap_overlay(to_float01(rgb), res.heatmap01, alpha=0.45)
+    data = up.getvalue()
+    digest = bytes_digest(data)
+    try:
+        rgb, preview = load_upload(digest, data)
+    except ValueError as e:
+        st.error(f"{e}: {up.name}")
+        st.stop()
+    quick_job, job = full_result(digest, rgb, preview.shape[:2])
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Original")
-        st.image(img, use_container_width=True)
+        st.image(preview, use_container_width=True)
     with col2:
         st.subheader("Forensic Heatmap Overlay")
-        st.image((overlay * 255).astype(np.uint8), use_container_width=True)
+        overlay_slot = st.empty()
 
     st.divider()
     a, b, c = st.columns(3)
-    a.metric("Verdict", res.verdict)
-    b.metric("AI Likelihood", f"{res.ai_likelihood:.2f}")
-    c.metric("Confidence", f"{res.confidence:.2f}")
+    verdict_slot, likelihood_slot, confidence_slot = a.empty(), b.empty(), c.empty()
+    note_slot = st.empty()
+
+    # Cheap stages first: shown while noise / repetition still run
+    if not job.done():
+        verdict_slot.metric("Verdict", "…")
+        likelihood_slot.metric("AI Likelihood", "…")
+        confidence_slot.metric("Confidence", "…")
+        overlay_slot.info("Heatmap pending…")
+        quick = quick_job.result()
+        if quick is not None and not job.done():
+            lo, hi = quick["likelihood_bounds"]
+            likelihood_slot.metric("AI Likelihood", f"{lo:.2f} – {hi:.2f}")
+            note_slot.caption(
+                f"Edges score {quick['edges']['score']:.2f}, spectrum score {quick['spectrum']['score']:.2f}; "
+                "noise residual and patch repetition still running."
+            )
+
+    with st.spinner("Analyzing noise residual and patch repetition…"):
+        try:
+            res = job.result()
+        except Exception as e:
+            _jobs().pop(digest, None)  # let a re-upload retry
+            st.error(f"Analysis failed: {e}")
+            st.stop()
+    note_slot.empty()
+
+    overlay_slot.image(overlay_preview(digest, preview, res.heatmap01), use_container_width=True)
+    verdict_slot.metric("Verdict", res.verdict)
+    likelihood_slot.metric("AI Likelihood", f"{res.ai_likelihood:.2f}")
+    confidence_slot.metric("Confidence", f"{res.confidence:.2f}")
 
     st.subheader("Evidence (Explainable)")
     for e in res.evidence:
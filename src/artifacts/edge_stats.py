@@ -2,30 +2,54 @@ from __future__ import annotations
 import numpy as np
 import cv2
 from ..utils import normalize01
+from ..context import ImageContext
 
 
-def edge_features(gray01: np.ndarray) -> dict:
-    g8 = (np.clip(gray01, 0, 1) * 255).astype(np.uint8)
+def edge_maps(gray: np.ndarray, sobel: bool = True) -> tuple[np.ndarray, np.ndarray | None]:
+    """(laplacian, sobel gradient magnitude or None), float32, from gray01 or gray8."""
+    g8 = gray if gray.dtype == np.uint8 else (np.clip(gray, 0, 1) * 255).astype(np.uint8)
 
-    # Laplacian variance: blur vs oversharp clue
     lap = cv2.Laplacian(g8, cv2.CV_32F, ksize=3)
-    lap_var = float(np.var(lap))
+    if not sobel:
+        return lap, None
 
-    # Gradient magnitude map
     gx = cv2.Sobel(g8, cv2.CV_32F, 1, 0, ksize=3)
     gy = cv2.Sobel(g8, cv2.CV_32F, 0, 1, ksize=3)
     mag = np.sqrt(gx * gx + gy * gy).astype(np.float32)
+    return lap, mag
 
-    mag01 = normalize01(mag)
 
+def edge_score(lap_var: float) -> float:
     # Heuristic: extremely low or extremely high lap_var can be suspicious
     # (depends on image; we score "out-of-middle" ranges)
     low = np.clip((60.0 - lap_var) / 60.0, 0.0, 1.0)
     high = np.clip((lap_var - 900.0) / 900.0, 0.0, 1.0)
-    score = float(np.clip(0.5 * low + 0.5 * high, 0.0, 1.0))
+    return float(np.clip(0.5 * low + 0.5 * high, 0.0, 1.0))
+
+
+def edge_features(image: np.ndarray | ImageContext, maps: bool = True, retain: bool = False) -> dict:
+    """
+    image: gray01 array or ImageContext (uses its gray8).
+    maps=False skips the Sobel gradient map (only the Laplacian is scored).
+    retain=True adds the raw Laplacian and gradient magnitude as lap /
+    grad_mag, for roi.FeatureMaps.
+    """
+    lap, mag = edge_maps(ImageContext.of(image).gray8, sobel=maps or retain)
+
+    # Laplacian variance: blur vs oversharp clue
+    lap_var = float(np.var(lap))
+    kept = {"lap": lap, "grad_mag": mag} if retain else {}
+    if not maps:
+        return {"lap_var": lap_var, "score": edge_score(lap_var), **kept}
+
+    # Gradient magnitude map
+    mag01 = normalize01(mag)
+
+    score = edge_score(lap_var)
 
     return {
         "lap_var": lap_var,
         "score": score,
         "edge_map": mag01,
+        **kept,
     }
@@ -2,40 +2,268 @@ from __future__ import annotations
 import numpy as np
 import cv2
 from ..utils import normalize01
+from ..context import ImageContext
 
 
-def noise_residual_features(rgb01: np.ndarray) -> dict:
+def _nlmeans(rgb8: np.ndarray) -> np.ndarray:
+    return cv2.fastNlMeansDenoisingColored(rgb8, None, 7, 7, 7, 21)
+
+
+def _median(rgb8: np.ndarray) -> np.ndarray:
+    return cv2.medianBlur(rgb8, 3)
+
+
+def _gaussian(rgb8: np.ndarray) -> np.ndarray:
+    return cv2.GaussianBlur(rgb8, (0, 0), 1.0)
+
+
+def _bilateral(rgb8: np.ndarray) -> np.ndarray:
+    return cv2.bilateralFilter(rgb8, 5, 30, 5)
+
+
+# Denoiser backends. Each one leaves a differently sized / structured residual,
+# so each has its own score ranges, fitted linearly against nlmeans' ranges on
+# a synthetic set of clean / noisy / blurred / JPEG-compressed images:
+#   smooth: resid_mean (hi, lo) mapped to smooth_score 0 -> 1
+#   corr:   resid_corr_1px (lo, hi) mapped to corr_score 0 -> 1
+# "nlmeans_down" runs nlmeans at <= max_side px and upsamples the residual map.
+# Rough cost on 1200x900 relative to nlmeans: nlmeans_down 1/2 (1/15 at 12MP),
+# bilateral 1/30, median / gaussian 1/45.
+DENOISERS = {
+    "nlmeans":      {"fn": _nlmeans,   "smooth": (0.010, 0.003),  "corr": (0.10, 0.45)},
+    "nlmeans_down": {"fn": _nlmeans,   "smooth": (0.012, 0.0095), "corr": (0.38, 0.65)},
+    "median":       {"fn": _median,    "smooth": (0.0043, 0.0005), "corr": (0.05, 0.17)},
+    "gaussian":     {"fn": _gaussian,  "smooth": (0.0048, 0.0005), "corr": (0.07, 0.19)},
+    "bilateral":    {"fn": _bilateral, "smooth": (0.0050, 0.0005), "corr": (0.02, 0.17)},
+}
+
+# Denoisers that treat channels symmetrically (per channel, or bilateral's
+# summed color distance), so they can run on BGR input without a conversion.
+# nlmeans goes through Lab and needs the real channel order.
+CHANNEL_AGNOSTIC = {"median", "gaussian", "bilateral"}
+
+NLMEANS_DOWN_MAX_SIDE = 768
+
+
+def effective_denoiser(denoiser: str, shape: tuple[int, ...], max_side: int = NLMEANS_DOWN_MAX_SIDE) -> str:
+    """
+    The backend that actually runs on an image of this shape: "nlmeans_down"
+    only downscales images larger than max_side, smaller ones get the plain
+    nlmeans residual and must be scored with nlmeans' ranges.
+    """
+    if denoiser == "nlmeans_down" and max(shape[:2]) <= max_side:
+        return "nlmeans"
+    return denoiser
+
+
+# Residual autocorrelation surface: Welch average over at most ACF_MAX_BLOCKS
+# tiles of ACF_BLOCK px, so its cost does not grow with the image size.
+# A local maximum of the axis autocorrelation at lag 2..ACF_MAX_PERIOD that
+# stands out by more than PERIOD_MIN_PEAK is reported as resid_period
+# (resampling / upsampling leaves such periodic correlations in the noise).
+ACF_BLOCK = 32
+ACF_MAX_BLOCKS = 128
+ACF_MAX_PERIOD = 8
+PERIOD_MIN_PEAK = 0.02
+
+
+def residual_magnitude(
+    rgb01: np.ndarray,
+    denoiser: str = "nlmeans",
+    max_side: int = NLMEANS_DOWN_MAX_SIDE,
+    rgb8: np.ndarray | None = None,
+    bgr: bool = False,
+) -> np.ndarray:
+    """
+    Per-pixel mean |rgb - denoised(rgb)|. For "nlmeans_down" it is returned
+    at the reduced working resolution (score it as effective_denoiser()). rgb8: the same image as uint8, if
+    already at hand (skips the float -> uint8 conversion).
+    bgr=True: the inputs are BGR (CHANNEL_AGNOSTIC denoisers only); the
+    result is bit-identical to passing them as RGB.
+    """
+    if denoiser not in DENOISERS:
+        raise ValueError(f"Unknown denoiser: {denoiser} (choose from {', '.join(DENOISERS)})")
+    if bgr and denoiser not in CHANNEL_AGNOSTIC:
+        raise ValueError(f"Denoiser {denoiser} needs RGB input")
+
+    h, w = rgb01.shape[:2]
+    src01 = rgb01
+    if effective_denoiser(denoiser, (h, w), max_side) == "nlmeans_down":
+        scale = max_side / max(h, w)
+        src01 = cv2.resize(rgb01, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        rgb8 = None
+
     # Work in uint8 for denoiser stability
-    rgb8 = (np.clip(rgb01, 0, 1) * 255.0).astype(np.uint8)
+    if rgb8 is None:
+        rgb8 = (np.clip(src01, 0, 1) * 255.0).astype(np.uint8)
 
-    # Denoise (fast + decent)
-    den = cv2.fastNlMeansDenoisingColored(rgb8, None, 7, 7, 7, 21)
+    den = DENOISERS[denoiser]["fn"](rgb8)
     den01 = den.astype(np.float32) / 255.0
 
-    resid = (rgb01 - den01).astype(np.float32)
-    resid_mag = np.mean(np.abs(resid), axis=2)
+    resid = (src01 - den01).astype(np.float32)
+    if bgr:
+        resid = resid[..., ::-1]  # same summation order as for RGB input
+    return np.mean(np.abs(resid), axis=2)
 
-    # Simple stats
-    rstd = float(np.std(resid_mag))
-    rmean = float(np.mean(resid_mag))
 
-    # Autocorr at 1-pixel shift (camera noise tends to be less structured)
-    a = resid_mag[:, :-1]
-    b = resid_mag[:, 1:]
-    corr = float(np.corrcoef(a.ravel(), b.ravel())[0, 1]) if a.size > 10 else 0.0
-    corr = float(np.clip(corr, -1.0, 1.0))
-
-    # Score heuristic
+def noise_score(rmean: float, corr: float, denoiser: str = "nlmeans") -> float:
     # - very low residual => over-smooth (common in some gens)
     # - very structured residual (high corr) => suspicious
-    smooth_score = np.clip((0.010 - rmean) / (0.010 - 0.003), 0.0, 1.0)
-    corr_score = np.clip((corr - 0.10) / (0.45 - 0.10), 0.0, 1.0)
-    score = float(np.clip(0.6 * corr_score + 0.4 * smooth_score, 0.0, 1.0))
+    cfg = DENOISERS[denoiser]
+    s_hi, s_lo = cfg["smooth"]
+    c_lo, c_hi = cfg["corr"]
+    smooth_score = np.clip((s_hi - rmean) / (s_hi - s_lo), 0.0, 1.0)
+    corr_score = np.clip((corr - c_lo) / (c_hi - c_lo), 0.0, 1.0)
+    return float(np.clip(0.6 * corr_score + 0.4 * smooth_score, 0.0, 1.0))
+
 
+def lag1_corr(resid_mag: np.ndarray) -> float:
+    """
+    Pearson correlation of horizontally adjacent residuals, i.e.
+    np.corrcoef(r[:, :-1].ravel(), r[:, 1:].ravel()), from float64 sums over
+    the shifted views (no copies of the map). 0 for tiny or constant maps.
+    """
+    h, w = resid_mag.shape
+    n = h * (w - 1)
+    if n <= 10:
+        return 0.0
+    first = resid_mag[:, 0].astype(np.float64)
+    last = resid_mag[:, -1].astype(np.float64)
+    s = float(resid_mag.sum(dtype=np.float64))
+    ss = float(np.einsum("ij,ij->", resid_mag, resid_mag, dtype=np.float64))
+    sab = float(np.einsum("ij,ij->", resid_mag[:, :-1], resid_mag[:, 1:], dtype=np.float64))
+
+    ma, mb = (s - last.sum()) / n, (s - first.sum()) / n
+    var_a = (ss - last @ last) / n - ma * ma
+    var_b = (ss - first @ first) / n - mb * mb
+    den = np.sqrt(var_a * var_b) if var_a > 0 and var_b > 0 else 0.0
+    if den <= 0:
+        return 0.0
+    return float(np.clip((sab / n - ma * mb) / den, -1.0, 1.0))
+
+
+class WelchACF:
+    """
+    Autocorrelation surface of a residual map by Wiener-Khinchin, averaged
+    Welch-style over block x block tiles: each tile's mean is removed, its
+    zero-padded (2 * block) rfft2 power spectrum summed, and one irfft2 of
+    the average gives the linear autocovariance for lags up to block - 1.
+    Tiles can come from several add() calls (e.g. the tiles of a tiled run).
+    """
+
+    def __init__(self, block: int = ACF_BLOCK):
+        self.block = block
+        self.power: np.ndarray | None = None
+        self.count = 0
+
+    def add(self, resid_mag: np.ndarray, max_blocks: int = ACF_MAX_BLOCKS) -> None:
+        """Adds up to max_blocks tiles of resid_mag, evenly spread over it."""
+        b = self.block
+        ny, nx = resid_mag.shape[0] // b, resid_mag.shape[1] // b
+        if ny == 0 or nx == 0:
+            return
+        tiles = resid_mag[:ny * b, :nx * b].reshape(ny, b, nx, b).swapaxes(1, 2)  # view
+        k = np.arange(ny * nx)
+        if k.size > max_blocks:
+            k = np.linspace(0, k.size - 1, max_blocks).astype(np.int64)
+        x = tiles[k // nx, k % nx].astype(np.float32)
+        x -= x.mean(axis=(1, 2), keepdims=True)
+        f = np.fft.rfft2(x, s=(2 * b, 2 * b))
+        p = np.sum(f.real * f.real + f.imag * f.imag, axis=0, dtype=np.float64)
+        self.power = p if self.power is None else self.power + p
+        self.count += k.size
+
+    def surface(self) -> np.ndarray | None:
+        """
+        Correlation at lag (dy, dx) in [dy % 2B, dx % 2B] for |dy|, |dx| < B
+        (1 at lag 0), or None before any tile was added.
+        """
+        if self.power is None:
+            return None
+        b = self.block
+        acov = np.fft.irfft2(self.power, s=(2 * b, 2 * b))
+        lags = np.abs(np.fft.fftfreq(2 * b, 1.0 / (2 * b)))
+        overlap = np.maximum(b - lags[:, None], 1) * np.maximum(b - lags[None, :], 1)  # pairs per tile
+        acov /= overlap
+        return acov / acov[0, 0] if acov[0, 0] > 0 else np.zeros_like(acov)
+
+
+def acf_stats(acf: np.ndarray | None, max_period: int = ACF_MAX_PERIOD) -> dict:
+    """
+    Multi-lag stats of a WelchACF surface: vertical 1px, diagonal 1px (both
+    diagonals) and 2px (horizontal + vertical) correlations, plus the
+    strongest periodic peak of the axis autocorrelation (resid_period in px,
+    0 if none) and how far it stands out of its neighbours.
+    """
+    if acf is None:
+        return {"resid_corr_v1px": 0.0, "resid_corr_diag": 0.0, "resid_corr_2px": 0.0,
+                "resid_period": 0, "resid_period_peak": 0.0}
+    axis = (acf[0, :max_period + 2] + acf[:max_period + 2, 0]) / 2
+    peaks = axis[2:max_period + 1] - np.maximum(axis[1:max_period], axis[3:max_period + 2])
+    # multiples of the period peak too: take the shortest lag within half of the strongest peak
+    k = int(np.flatnonzero(peaks >= peaks.max() / 2)[0]) if peaks.max() > 0 else 0
+    peak = float(peaks[k])
     return {
-        "resid_mean": rmean,
-        "resid_std": rstd,
-        "resid_corr_1px": corr,
-        "score": score,
-        "resid_map": normalize01(resid_mag),
+        "resid_corr_v1px": float(acf[1, 0]),
+        "resid_corr_diag": float((acf[1, 1] + acf[1, -1]) / 2),
+        "resid_corr_2px": float((acf[0, 2] + acf[2, 0]) / 2),
+        "resid_period": k + 2 if peak > PERIOD_MIN_PEAK else 0,
+        "resid_period_peak": max(peak, 0.0),
     }
+
+
+def residual_structure(resid_mag: np.ndarray) -> dict:
+    """resid_corr_1px (exact) plus the multi-lag / periodicity stats of the WelchACF surface."""
+    acf = WelchACF()
+    acf.add(resid_mag)
+    return {"resid_corr_1px": lag1_corr(resid_mag), **acf_stats(acf.surface())}
+
+
+def residual_stats(resid_mag: np.ndarray, denoiser: str = "nlmeans") -> dict:
+    """Noise stats and score of a residual magnitude map (or a region of one)."""
+    # Simple stats
+    rstd = float(np.std(resid_mag))
+    rmean = float(np.mean(resid_mag))
+
+    # Autocorrelation (camera noise tends to be less structured); the score
+    # uses the 1-pixel shift
+    structure = residual_structure(resid_mag)
+
+    score = noise_score(rmean, structure["resid_corr_1px"], denoiser)
+    return {"resid_mean": rmean, "resid_std": rstd, **structure, "score": score, "denoiser": denoiser}
+
+
+def noise_residual_features(
+    image: np.ndarray | ImageContext,
+    denoiser: str = "nlmeans",
+    max_side: int = NLMEANS_DOWN_MAX_SIDE,
+    maps: bool = True,
+    retain: bool = False,
+) -> dict:
+    """
+    image: rgb01 array or ImageContext (uses its rgb01 + rgb8, or its BGR
+    native images for CHANNEL_AGNOSTIC denoisers).
+    maps=False skips the full-size normalized resid_map.
+    retain=True adds the raw residual magnitude as resid_mag (at the
+    denoiser's working resolution) for region queries, see roi.FeatureMaps.
+    """
+    ctx = ImageContext.of(image)
+    h, w = ctx.shape
+    denoiser = effective_denoiser(denoiser, (h, w), max_side)  # reported as such under "denoiser"
+    if not isinstance(image, ImageContext):
+        resid_mag = residual_magnitude(ctx.rgb01, denoiser, max_side)
+    elif ctx.order == "bgr" and denoiser in CHANNEL_AGNOSTIC:
+        resid_mag = residual_magnitude(ctx.native01, denoiser, max_side, rgb8=ctx.native8, bgr=True)
+    else:
+        resid_mag = residual_magnitude(ctx.rgb01, denoiser, max_side, rgb8=ctx.rgb8)
+
+    stats = residual_stats(resid_mag, denoiser)
+    if retain:
+        stats["resid_mag"] = resid_mag
+    if not maps:
+        return stats
+
+    if resid_mag.shape != (h, w):
+        resid_mag = cv2.resize(resid_mag, (w, h), interpolation=cv2.INTER_LINEAR)
+
+    return {**stats, "resid_map": normalize01(resid_mag)}
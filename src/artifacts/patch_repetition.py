@@ -1,79 +1,227 @@
 from __future__ import annotations
+from functools import lru_cache
 import numpy as np
 import cv2
 from ..utils import normalize01
+from ..context import ImageContext
 
+# Reported similarity stats over the patches' best (non-overlapping) matches:
+#   max_sim  the largest one
+#   p95_sim  their SIM_PERCENTILE-th percentile, which is what is scored
+# The exhaustive search finds a near-identical partner for some patch in
+# almost every photo (smooth sky, walls), so max_sim sits at 0.97+ everywhere;
+# p95_sim is what the former 3500-random-pair sample measured in expectation,
+# and keeps the 0.85 / 0.97 score range.
+SIM_PERCENTILE = 95
+# hot_mean giving the full hot score. hits count every pair above sim_thresh
+# (not a sample), so the normalized hot map is ~2.5x denser than it was.
+HOT_MEAN_FULL = 0.30
 
-def _cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-    na = np.linalg.norm(a) + 1e-8
-    nb = np.linalg.norm(b) + 1e-8
-    return float(np.dot(a, b) / (na * nb))
 
+def _normalized_patches(small: np.ndarray, patch: int, stride: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (P, coords): zero-mean, unit-norm patch vectors [N, D] (rows so a
+    dot product is the cosine similarity) and their top-left corners [N, 2].
+    A stack of same-sized images [B, hs, ws] gives P [B, N, D] (same coords).
+    """
+    win = np.lib.stride_tricks.sliding_window_view(small, (patch, patch), axis=(-2, -1))
+    win = win[..., ::stride, ::stride, :, :]
+    ny, nx = win.shape[-4:-2]
+    P = win.reshape(*small.shape[:-2], ny * nx, patch * patch).astype(np.float32)  # one copy
+    P -= P.mean(axis=-1, keepdims=True)
+    P /= np.linalg.norm(P, axis=-1, keepdims=True) + 1e-8
 
-def patch_repetition_features(gray01: np.ndarray, patch: int = 24, stride: int = 12) -> dict:
-    h, w = gray01.shape
+    yy, xx = np.meshgrid(np.arange(ny) * stride, np.arange(nx) * stride, indexing="ij")
+    coords = np.stack([yy.ravel(), xx.ravel()], axis=1)
+    return P, coords
+
+
+def _similarity_search(
+    P: np.ndarray,
+    coords: np.ndarray,
+    patch: int,
+    thresh: float,
+    block_elems: int,
+    rows: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exhaustive all-pairs cosine search as blocked P[i:j] @ P.T products, so at
+    most block_elems similarities are held at once.
+    Overlapping patches (incl. self) are excluded: they are near-copies by
+    construction, not repeated content.
+    Returns (best, hits) where best[i] = the highest similarity of patch i
+    to any other and hits[i] = #patches with sim > thresh to i.
+    P may be a stack [B, N, D] of same-sized images: the overlap mask of each
+    block is then built once for all of them, and best / hits are per image
+    ([B, N]).
+    rows: only these patches are compared against all others (hits then
+    has one entry per row), e.g. the patches of a region of interest.
+    """
+    N = P.shape[-2]
+    n_rows = N if rows is None else len(rows)
+    n_images = int(np.prod(P.shape[:-2]))
+    block = max(1, block_elems // (N * n_images))
+    best = np.empty((*P.shape[:-2], n_rows), dtype=np.float32)
+    hits = np.zeros((*P.shape[:-2], n_rows), dtype=np.float32)
+    PT = np.swapaxes(P, -1, -2)
+
+    for i0 in range(0, n_rows, block):
+        i1 = min(n_rows, i0 + block)
+        sel = slice(i0, i1) if rows is None else rows[i0:i1]
+        S = P[..., sel, :] @ PT  # [(B,) b, N]
+
+        dy = np.abs(coords[sel, None, 0] - coords[None, :, 0])
+        dx = np.abs(coords[sel, None, 1] - coords[None, :, 1])
+        S[..., (dy < patch) & (dx < patch)] = -1.0
 
+        best[..., i0:i1] = S.max(axis=-1)
+        hits[..., i0:i1] = np.count_nonzero(S > thresh, axis=-1)
+
+    return best, hits
+
+
+def similarity_stats(best: np.ndarray) -> dict[str, float]:
+    """max_sim / p95_sim of one image's per-patch best matches (see SIM_PERCENTILE)."""
+    return {
+        "max_sim": float(np.clip(best.max(), -1.0, 1.0)),
+        "p95_sim": float(np.clip(np.percentile(best, SIM_PERCENTILE), -1.0, 1.0)),
+    }
+
+
+NO_SIMILARITY = {"max_sim": 0.0, "p95_sim": 0.0}
+
+
+def _paint_patches(shape: tuple[int, int], coords: np.ndarray, weights: np.ndarray, patch: int) -> np.ndarray:
+    """Sum of weights[i] over each patch footprint (2D difference array + cumsum)."""
+    hs, ws = shape
+    diff = np.zeros((hs + 1, ws + 1), dtype=np.float32)
+    keep = weights > 0
+    y, x, v = coords[keep, 0], coords[keep, 1], weights[keep]
+    np.add.at(diff, (y, x), v)
+    np.add.at(diff, (y, x + patch), -v)
+    np.add.at(diff, (y + patch, x), -v)
+    np.add.at(diff, (y + patch, x + patch), v)
+    return np.cumsum(np.cumsum(diff, axis=0), axis=1)[:hs, :ws]
+
+
+def downscale_for_repetition(gray01: np.ndarray, max_side: int = 512) -> np.ndarray:
+    h, w = gray01.shape
     # Downscale for speed (keeps textures)
-    scale = 512.0 / max(h, w) if max(h, w) > 512 else 1.0
+    scale = max_side / max(h, w) if max(h, w) > max_side else 1.0
     if scale < 1.0:
-        small = cv2.resize(gray01, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
-    else:
-        small = gray01.copy()
+        return cv2.resize(gray01, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return gray01
+
 
+def repetition_hotmap(
+    small: np.ndarray,
+    patch: int = 24,
+    stride: int = 12,
+    sim_thresh: float = 0.92,
+    block_elems: int = 1 << 22,
+    patches: tuple[np.ndarray, np.ndarray] | None = None,
+) -> tuple[dict[str, float], np.ndarray] | None:
+    """
+    (similarity_stats, hot01) at the resolution of `small`, or None when the
+    image is too small to compare patches.
+    patches: _normalized_patches(small, patch, stride), if already built.
+    """
     hs, ws = small.shape
-    patches = []
-    coords = []
-
-    for y in range(0, hs - patch + 1, stride):
-        for x in range(0, ws - patch + 1, stride):
-            p = small[y:y + patch, x:x + patch].astype(np.float32)
-            p = p - float(np.mean(p))
-            patches.append(p.ravel())
-            coords.append((y, x))
-
-    if len(patches) < 10:
-        return {"max_sim": 0.0, "score": 0.0, "rep_map": np.zeros_like(gray01, dtype=np.float32)}
-
-    P = np.stack(patches, axis=0)  # [N, D]
-    N = P.shape[0]
-
-    # Sample comparisons for speed
-    rng = np.random.default_rng(0)
-    sample_pairs = min(3500, N * 6)
-    max_sim = -1.0
-    hot = np.zeros((hs, ws), dtype=np.float32)
-
-    for _ in range(sample_pairs):
-        i = int(rng.integers(0, N))
-        j = int(rng.integers(0, N))
-        if i == j:
-            continue
-        sim = _cosine_sim(P[i], P[j])
-        if sim > max_sim:
-            max_sim = sim
-
-        # highlight unusually similar pairs
-        if sim > 0.92:
-            yi, xi = coords[i]
-            yj, xj = coords[j]
-            hot[yi:yi + patch, xi:xi + patch] += 1.0
-            hot[yj:yj + patch, xj:xj + patch] += 1.0
-
-    # Normalize repetition map and upsample back
-    hot = normalize01(hot)
-    if scale < 1.0:
+    if hs < patch or ws < patch:
+        return None
+
+    P, coords = patches or _normalized_patches(small, patch, stride)
+    if P.shape[0] < 10:
+        return None
+
+    # Every pair is compared; highlight unusually similar ones
+    best, hits = _similarity_search(P, coords, patch, sim_thresh, block_elems)
+    hot = _paint_patches((hs, ws), coords, hits, patch)
+    return similarity_stats(best), normalize01(hot)
+
+
+@lru_cache(maxsize=16)
+def _resize_weights(n_src: int, n_dst: int) -> np.ndarray:
+    """Total weight each source row gets in a 1D INTER_LINEAR resize n_src -> n_dst."""
+    R = cv2.resize(np.eye(n_src, dtype=np.float32), (n_src, n_dst), interpolation=cv2.INTER_LINEAR)
+    return R.sum(axis=0, dtype=np.float64)
+
+
+def upsampled_mean(hot: np.ndarray, h: int, w: int) -> float:
+    """
+    mean(cv2.resize(hot, (w, h), INTER_LINEAR)) without building the h x w
+    map: the resize is separable and linear, so the mean is wy @ hot @ wx.
+    """
+    hs, ws = hot.shape
+    if (hs, ws) == (h, w):
+        return float(np.mean(hot))
+    wy, wx = _resize_weights(hs, h), _resize_weights(ws, w)
+    return float(wy @ hot.astype(np.float64) @ wx) / (h * w)
+
+
+def repetition_score(p95_sim: float, hot_mean: float) -> float:
+    # Score: high similarity OR large hot regions
+    sim_score = np.clip((p95_sim - 0.85) / (0.97 - 0.85), 0.0, 1.0)
+    hot_score = float(np.clip(hot_mean / HOT_MEAN_FULL, 0.0, 1.0))
+    return float(np.clip(0.55 * sim_score + 0.45 * hot_score, 0.0, 1.0))
+
+
+def patch_repetition_features(
+    image: np.ndarray | ImageContext,
+    patch: int = 24,
+    stride: int = 12,
+    sim_thresh: float = 0.92,
+    block_elems: int = 1 << 22,
+    maps: bool = True,
+    retain: bool = False,
+) -> dict:
+    """
+    image: gray01 array or ImageContext (uses its 512px small_gray).
+    maps=False skips the full-size rep_map (the score is unchanged).
+    retain=True adds the normalized patch vectors and their corners in
+    `small` as patches / coords (None when the image is too small) plus
+    small_shape and the search parameters, for roi.FeatureMaps.
+    """
+    ctx = ImageContext.of(image)
+    h, w = ctx.shape
+    small = ctx.small_gray(512)
+
+    kept = {}
+    patches = None
+    if retain:
+        if small.shape[0] >= patch and small.shape[1] >= patch:
+            patches = _normalized_patches(small, patch, stride)
+        kept = {
+            "patches": patches[0] if patches else None,
+            "coords": patches[1] if patches else None,
+            "small_shape": small.shape,
+            "patch": patch,
+            "stride": stride,
+            "sim_thresh": sim_thresh,
+        }
+
+    found = repetition_hotmap(small, patch, stride, sim_thresh, block_elems, patches=patches)
+    if found is None:
+        out = {**NO_SIMILARITY, "score": 0.0, **kept}
+        if maps:
+            out["rep_map"] = np.zeros((h, w), dtype=np.float32)
+        return out
+    sims, hot = found
+
+    if not maps:
+        return {**sims, "score": repetition_score(sims["p95_sim"], upsampled_mean(hot, h, w)), **kept}
+
+    # Upsample repetition map back
+    if small.shape != (h, w):
         rep_map = cv2.resize(hot, (w, h), interpolation=cv2.INTER_LINEAR)
     else:
         rep_map = hot
 
-    # Score: high max similarity OR large hot regions
-    max_sim = float(np.clip(max_sim, -1.0, 1.0))
-    max_sim_score = np.clip((max_sim - 0.85) / (0.97 - 0.85), 0.0, 1.0)
-    hot_score = float(np.clip(np.mean(rep_map) / 0.12, 0.0, 1.0))
-    score = float(np.clip(0.55 * max_sim_score + 0.45 * hot_score, 0.0, 1.0))
+    score = repetition_score(sims["p95_sim"], float(np.mean(rep_map)))
 
     return {
-        "max_sim": max_sim,
+        **sims,
         "score": score,
         "rep_map": rep_map.astype(np.float32),
+        **kept,
     }
@@ -1,37 +1,118 @@
 from __future__ import annotations
+from functools import lru_cache
 import numpy as np
 import cv2
+from ..context import ImageContext
 
+# Inputs arrive in a handful of fixed resolutions, so per-shape windows and
+# radial bin maps are built once and reused.
+_CACHE_SHAPES = 16
 
-def _radial_profile(mag: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
-    h, w = mag.shape
-    cy, cx = h // 2, w // 2
-    y, x = np.indices((h, w))
-    r = np.sqrt((x - cx) ** 2 + (y - cy) ** 2).astype(np.int32)
-    r_max = min(cy, cx)
-    r = np.clip(r, 0, r_max)
 
-    # radial mean
-    tbin = np.bincount(r.ravel(), mag.ravel())
-    nr = np.bincount(r.ravel())
-    radial_mean = tbin / np.maximum(nr, 1)
-    radii = np.arange(len(radial_mean))
-    return radii[1:], radial_mean[1:]  # skip r=0
+@lru_cache(maxsize=_CACHE_SHAPES)
+def _window(h: int, w: int) -> np.ndarray:
+    win = (np.hanning(h).reshape(-1, 1) * np.hanning(w).reshape(1, -1)).astype(np.float32)
+    win.flags.writeable = False
+    return win
 
 
-def spectrum_features(gray01: np.ndarray) -> dict:
+@lru_cache(maxsize=_CACHE_SHAPES)
+def _radial_bins(h: int, w: int, fh: int, fw: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Radial bins for the rfft2 half-plane of an (fh, fw) padded transform of an
+    (h, w) image, with radii in bins of the *unpadded* spectrum so profiles
+    stay comparable across padding.
+
+    Returns (bins, weights, counts): interior columns stand for themselves and
+    their conjugate mirror, so they weigh 2 - this makes the half-plane mean
+    equal the full-plane (fftshift) mean.
+    """
+    # integer frequency indices, rescaled in float64 so unpadded radii are exact
+    ry = np.fft.ifftshift(np.arange(fh) - fh // 2) * (h / fh)
+    rx = np.arange(fw // 2 + 1) * (w / fw)
+    r = np.sqrt(ry[:, None] ** 2 + rx[None, :] ** 2).astype(np.int32)
+    r_max = min(h // 2, w // 2)
+    bins = np.clip(r, 0, r_max).ravel()
+
+    col_w = np.full(rx.shape[0], 2.0, dtype=np.float32)
+    col_w[0] = 1.0
+    if fw % 2 == 0:
+        col_w[-1] = 1.0  # Nyquist column has no mirror
+    weights = np.broadcast_to(col_w, r.shape).ravel().copy()
+
+    counts = np.bincount(bins, weights, minlength=r_max + 1)
+    for a in (bins, weights, counts):
+        a.flags.writeable = False
+    return bins, weights, counts
+
+
+def _fft_size(n: int) -> int:
+    """
+    n itself unless it has a prime factor > 13 (slow Bluestein path in
+    pocketfft), in which case the next optimal DFT size. Small sides are
+    never padded, it would not pay off.
+    """
+    if n < 256:
+        return n
+    m = n
+    for p in (2, 3, 5, 7, 11, 13):
+        while m % p == 0:
+            m //= p
+    return n if m == 1 else cv2.getOptimalDFTSize(n)
+
+
+@lru_cache(maxsize=_CACHE_SHAPES)
+def _stacked_bins(h: int, w: int, fh: int, fw: int, n: int) -> np.ndarray:
+    """_radial_bins of n stacked spectra, image i offset to its own range of bins."""
+    bins, _, counts = _radial_bins(h, w, fh, fw)
+    out = (bins[None, :] + counts.shape[0] * np.arange(n)[:, None]).ravel()
+    out.flags.writeable = False
+    return out
+
+
+def _radial_profile(mag: np.ndarray, h: int, w: int, fw: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    mag: rfft2 half-plane magnitude of an (h, w) image padded to width fw,
+    or a stack [N, fh, fw // 2 + 1] of them (profiles are then [N, R]).
+    """
+    bins, weights, counts = _radial_bins(h, w, mag.shape[-2], fw)
+    n_bins = counts.shape[0]
+
+    # radial mean; a stack goes through one bincount with per-image bin offsets
+    if mag.ndim == 2:
+        tbin = np.bincount(bins, mag.ravel() * weights, minlength=n_bins)
+    else:
+        n = mag.shape[0]
+        flat = (mag.reshape(n, -1) * weights).ravel()
+        stacked = _stacked_bins(h, w, mag.shape[-2], fw, n)
+        tbin = np.bincount(stacked, flat, minlength=n * n_bins).reshape(n, n_bins)
+    radial_mean = tbin / np.maximum(counts, 1)
+    radii = np.arange(n_bins)
+    return radii[1:], radial_mean[..., 1:]  # skip r=0
+
+
+def spectrum_profile(gray01: np.ndarray, pad_optimal: bool = False, gain: float = 1.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Radial mean of the log-magnitude spectrum: (radii, profile).
+    gain scales |F| before the log (used to extrapolate tile spectra to a
+    larger image, where |F| grows with sqrt(area)).
+    gray01 may be a stack [N, h, w] of same-sized images: one batched FFT,
+    shared window and bins, profiles [N, R] identical to one-by-one calls.
+    """
     # windowing reduces border artifacts
-    h, w = gray01.shape
-    win_y = np.hanning(h).reshape(-1, 1)
-    win_x = np.hanning(w).reshape(1, -1)
-    win = (win_y * win_x).astype(np.float32)
+    h, w = gray01.shape[-2:]
+    x = np.asarray(gray01, dtype=np.float32) * _window(h, w)
 
-    x = (gray01 * win).astype(np.float32)
-    f = np.fft.fftshift(np.fft.fft2(x))
-    mag = np.log1p(np.abs(f)).astype(np.float32)
+    fh, fw = (_fft_size(h), _fft_size(w)) if pad_optimal else (h, w)
+    f = np.abs(np.fft.rfft2(x, s=(fh, fw)))
+    if gain != 1.0:
+        f *= gain
+    mag = np.log1p(f).astype(np.float32)
 
-    radii, rp = _radial_profile(mag)
+    return _radial_profile(mag, h, w, fw)
 
+
+def profile_features(radii: np.ndarray, rp: np.ndarray) -> dict:
     # Fit log(r) vs log(profile) => natural images ~ 1/f^alpha
     r = radii.astype(np.float32)
     y = rp.astype(np.float32)
@@ -62,3 +143,20 @@ def spectrum_features(gray01: np.ndarray) -> dict:
         "resid_std": resid_std,
         "score": score,
     }
+
+
+def spectrum_features(image: np.ndarray | ImageContext, pad_optimal: bool = False) -> dict:
+    """
+    Spectral roll-off features from a float32 real FFT of the gray image
+    (image: gray01 array or ImageContext). By default the same numbers as the
+    full-plane fft2 + fftshift reference.
+
+    pad_optimal=True zero-pads sides with a prime factor > 13 to an optimal
+    DFT size (2-3x faster on such sizes) but changes the features: the
+    padding interpolates the spectrum, which lowers resid_std of noise-like
+    content (509x761 uniform noise: 0.062 -> 0.046, slope -0.023 -> -0.019)
+    and moves natural content by a few 1e-3. Sizes without such factors
+    (every common camera/screen resolution) are never padded.
+    """
+    radii, rp = spectrum_profile(ImageContext.of(image).gray01, pad_optimal=pad_optimal)
+    return profile_features(radii, rp)
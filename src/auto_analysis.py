@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import argparse
 import csv
 import json
+from array import array
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterator
 import numpy as np
 
+from .stats import pct, P2Quantile, TopK
 
-def load_csv(path: Path) -> list[dict]:
-    with open(path, encoding="utf-8") as f:
-        return list(csv.DictReader(f))
+# Splits tracked by the calibration, by their code in ReportColumns.split
+SPLITS = ("real", "ai", "borderline")
 
 
 def to_float(x: str, default=0.0) -> float:
@@ -18,12 +22,6 @@ def to_float(x: str, default=0.0) -> float:
         return default
 
 
-def pct(values: list[float], p: float, fallback: float) -> float:
-    if not values:
-        return fallback
-    return float(np.percentile(np.array(values, dtype=np.float32), p))
-
-
 def clamp_thresholds(likely_real_max: float, likely_ai_min: float, margin: float = 0.05) -> tuple[float, float]:
     """
     Ensures thresholds are not inverted and leaves a reasonable "Uncertain" gap.
@@ -46,29 +44,149 @@ def clamp_thresholds(likely_real_max: float, likely_ai_min: float, margin: float
     return likely_real_max, likely_ai_min
 
 
+@dataclass
+class SplitStream:
+    """Count, mean and p10 / p90 of one split's ai_likelihoods without keeping them."""
+
+    count: int = 0
+    total: float = 0.0
+    quantiles: dict[int, P2Quantile] = field(default_factory=lambda: {10: P2Quantile(10), 90: P2Quantile(90)})
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        self.total += x
+        for est in self.quantiles.values():
+            est.add(x)
+
+
+@dataclass
+class ReportColumns:
+    """Parsed columns of the non-ERROR rows of a batch report."""
+
+    likelihood: np.ndarray  # float64 ai_likelihood
+    split: np.ndarray  # int8 index into SPLITS, -1 for any other split
+
+
+@dataclass
+class ReportScan:
+    columns: ReportColumns | None  # None with streaming=True
+    streams: dict[str, SplitStream] | None  # per split, only with streaming=True
+    top: dict[str, list[dict]]
+
+
+def iter_report(path: Path) -> Iterator[dict]:
+    """Rows of a batch report: batch_report.csv or batch_report.jsonl."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        reader = csv.reader(f)
+        header = next(reader, [])
+        for rec in reader:
+            if rec:
+                yield dict(zip(header, rec))
+
+
+def scan_report(path: Path, k: int = 3, streaming: bool = False) -> ReportScan:
+    """
+    One pass over the report: ai_likelihood / split of the non-ERROR rows go
+    into compact arrays (or, with streaming=True, only into per-split
+    count / mean / P-square quantile estimators), and the k lowest, highest
+    and closest-to-0.5 rows are kept in bounded heaps. Each likelihood string
+    is parsed once.
+    """
+    codes = {name: i for i, name in enumerate(SPLITS)}
+    lik, split = array("d"), array("b")
+    streams = {name: SplitStream() for name in SPLITS} if streaming else None
+    top_real, top_ai, top_unc = TopK(k), TopK(k), TopK(k)
+
+    for i, row in enumerate(iter_report(path)):
+        if row.get("verdict") == "ERROR":
+            continue
+        x = to_float(row.get("ai_likelihood", ""))
+        s = row.get("split", "")
+        if streams is not None:
+            if s in streams:
+                streams[s].add(x)
+        else:
+            lik.append(x)
+            split.append(codes.get(s, -1))
+
+        if s == "real" and top_real.wants(x, i):
+            top_real.push(x, i, row)
+        elif s == "ai" and top_ai.wants(-x, i):
+            top_ai.push(-x, i, row)
+        if top_unc.wants(abs(x - 0.5), i):
+            top_unc.push(abs(x - 0.5), i, row)
+
+    columns = None
+    if streams is None:
+        columns = ReportColumns(np.frombuffer(lik, dtype=np.float64), np.frombuffer(split, dtype=np.int8))
+    return ReportScan(columns, streams, {"real": top_real.rows(), "ai": top_ai.rows(), "uncertain": top_unc.rows()})
+
+
+def split_stats(scan: ReportScan) -> dict[str, dict]:
+    """Per split: count, mean (None if empty) and p10 / p90 (fallback 0.0 / None if empty)."""
+    out = {}
+    for code, name in enumerate(SPLITS):
+        if scan.streams is not None:
+            st = scan.streams[name]
+            out[name] = {
+                "count": st.count,
+                "mean": st.total / st.count if st.count else None,
+                "p10": st.quantiles[10].value(0.0),
+                "p90": st.quantiles[90].value(0.0),
+            }
+            continue
+        v = scan.columns.likelihood[scan.columns.split == code]
+        out[name] = {
+            "count": int(v.size),
+            "mean": float(np.mean(v)) if v.size else None,
+            "p10": pct(v, 10, 0.0),
+            "p90": pct(v, 90, 0.0),
+        }
+    return out
+
+
 def main() -> None:
+    ap = argparse.ArgumentParser(description="TruthLens auto-analysis: calibration thresholds + top examples")
+    ap.add_argument("--report", default=None,
+                    help="batch_run report (.csv or .jsonl; default: out/batch_report.csv, else out/batch_report.jsonl)")
+    ap.add_argument("--streaming", action="store_true",
+                    help="Estimate p10 / p90 with streaming P-square quantiles instead of keeping every "
+                         "likelihood in memory (approximate; for very large reports)")
+    ap.add_argument("--top", type=int, default=3, help="Examples kept per bucket")
+    args = ap.parse_args()
+
     repo_root = Path(__file__).resolve().parents[1]
     out_root = repo_root / "out"
-    csv_path = out_root / "batch_report.csv"
+    if args.report:
+        csv_path = Path(args.report)
+    else:
+        csv_path = out_root / "batch_report.csv"
+        if not csv_path.exists() and (out_root / "batch_report.jsonl").exists():
+            csv_path = out_root / "batch_report.jsonl"
     if not csv_path.exists():
-        raise FileNotFoundError("out/batch_report.csv not found. Run: python -m src.batch_run")
+        raise FileNotFoundError(f"{csv_path} not found. Run: python -m src.batch_run")
 
-    rows = load_csv(csv_path)
-
-    # collect likelihoods per split
-    real = [to_float(r["ai_likelihood"]) for r in rows if r["split"] == "real" and r["verdict"] != "ERROR"]
-    ai = [to_float(r["ai_likelihood"]) for r in rows if r["split"] == "ai" and r["verdict"] != "ERROR"]
-    border = [to_float(r["ai_likelihood"]) for r in rows if r["split"] == "borderline" and r["verdict"] != "ERROR"]
+    scan = scan_report(csv_path, k=args.top, streaming=args.streaming)
+    stats = split_stats(scan)
+    real, ai, border = stats["real"], stats["ai"], stats["borderline"]
 
     # baseline calibration (no ML)
     # - real threshold: 90th percentile (most real should be below this)
     # - ai threshold: 10th percentile (most ai should be above this)
-    likely_real_max = pct(real, 90, 0.30)
-    likely_ai_min = pct(ai, 10, 0.70)
+    likely_real_max = real["p90"] if real["count"] else 0.30
+    likely_ai_min = ai["p10"] if ai["count"] else 0.70
 
     # Safety clamp (prevents inverted thresholds)
     likely_real_max, likely_ai_min = clamp_thresholds(likely_real_max, likely_ai_min, margin=0.05)
 
+    def rounded(x: float | None) -> float | None:
+        return round(x, 3) if x is not None else None
+
     calibration = {
         "thresholds": {
             "likely_real_max": round(likely_real_max, 3),
@@ -76,35 +194,27 @@ def main() -> None:
             "uncertain_range": [round(likely_real_max, 3), round(likely_ai_min, 3)],
         },
         "stats": {
-            "count_real": len(real),
-            "count_ai": len(ai),
-            "count_borderline": len(border),
-            "real_mean": round(float(np.mean(real)), 3) if real else None,
-            "ai_mean": round(float(np.mean(ai)), 3) if ai else None,
-            "borderline_mean": round(float(np.mean(border)), 3) if border else None,
-            "real_p10": round(pct(real, 10, 0.0), 3) if real else None,
-            "real_p90": round(pct(real, 90, 0.0), 3) if real else None,
-            "ai_p10": round(pct(ai, 10, 0.0), 3) if ai else None,
-            "ai_p90": round(pct(ai, 90, 0.0), 3) if ai else None,
+            "count_real": real["count"],
+            "count_ai": ai["count"],
+            "count_borderline": border["count"],
+            "real_mean": rounded(real["mean"]),
+            "ai_mean": rounded(ai["mean"]),
+            "borderline_mean": rounded(border["mean"]),
+            "real_p10": rounded(real["p10"]) if real["count"] else None,
+            "real_p90": rounded(real["p90"]) if real["count"] else None,
+            "ai_p10": rounded(ai["p10"]) if ai["count"] else None,
+            "ai_p90": rounded(ai["p90"]) if ai["count"] else None,
         },
     }
-
-    def best(rows_subset: list[dict], key, n=3, reverse=False):
-        return sorted(rows_subset, key=key, reverse=reverse)[:n]
-
-    real_rows = [r for r in rows if r["split"] == "real" and r["verdict"] != "ERROR"]
-    ai_rows = [r for r in rows if r["split"] == "ai" and r["verdict"] != "ERROR"]
-    all_ok = [r for r in rows if r["verdict"] != "ERROR"]
+    if args.streaming:
+        calibration["stats"]["quantiles"] = "p2_streaming"
 
     # best examples:
     # - real: lowest ai_likelihood
     # - ai: highest ai_likelihood
     # - uncertain: closest to 0.5
-    top_real = best(real_rows, key=lambda r: to_float(r["ai_likelihood"]), n=3, reverse=False)
-    top_ai = best(ai_rows, key=lambda r: to_float(r["ai_likelihood"]), n=3, reverse=True)
-    top_uncertain = best(all_ok, key=lambda r: abs(to_float(r["ai_likelihood"]) - 0.5), n=3, reverse=False)
-
-    top_examples = {"real": top_real, "ai": top_ai, "uncertain": top_uncertain}
+    top_real, top_ai, top_uncertain = scan.top["real"], scan.top["ai"], scan.top["uncertain"]
+    top_examples = scan.top
 
     # save outputs
     (out_root / "calibration.json").write_text(json.dumps(calibration, indent=2), encoding="utf-8")
@@ -1,25 +1,36 @@
 from __future__ import annotations
 
 import os
-import csv
 import json
+import time
+import hashlib
+import argparse
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
 
-import cv2
-import numpy as np
-
-from .utils import read_image_rgb, ensure_dir, to_float01
+from .utils import ensure_dir
+from .loader import DecodedImage, prefetch, read_image
+from .context import ImageContext
 from .pipeline import analyze_image
-from .explain.heatmap import make_heatmap_overlay
+from .artifacts.noise_residual import DENOISERS
+from .parallel import bounded_map, default_workers
+from .dedup import DuplicateIndex, phash64
+from .cache import open_cache, bytes_digest, code_version, result_options
+from .calibration import as_provider, get_thresholds, verdict_from_likelihood
+from .manifest import RunManifest
+from .features import FeatureStore, raw_features
+from .timing import STAGES
+from .reports import ReportWriter, ShardedJsonl, find_report
+from .explain.writer import OVERLAY_FORMATS, OverlayWriter, overlay_path, write_overlay
 
 
 IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
 
+CSV_FIELDS = ["image", "split", "category", "verdict", "confidence", "ai_likelihood", "evidence", "overlay", "json"]
 
-def save_rgb01(path: str, rgb01: np.ndarray) -> None:
-    rgb8 = (np.clip(rgb01, 0, 1) * 255).astype(np.uint8)
-    bgr = cv2.cvtColor(rgb8, cv2.COLOR_RGB2BGR)
-    cv2.imwrite(path, bgr)
+# Per-image stage times (ms) with --timings; analysis stages are empty on cache hits
+TIMING_FIELDS = ["t_decode_ms"] + [f"t_{s}_ms" for s in STAGES] + ["t_analyze_ms", "t_outputs_ms"]
 
 
 def infer_labels_from_path(p: Path) -> tuple[str, str]:
@@ -48,7 +59,355 @@ def infer_labels_from_path(p: Path) -> tuple[str, str]:
     return split, category
 
 
+@dataclass(frozen=True)
+class BatchOptions:
+    repo_root: Path
+    overlays_dir: Path
+    json_dir: Path
+    calibration: Path | None = None
+    denoiser: str = "nlmeans"
+    tile: int | None = None
+    cascade: bool = False
+    cache_dir: Path | None = None
+    cache_max_bytes: int = 2 << 30
+    dedup_index: Path | None = None
+    dedup_distance: int = 6
+    reuse_duplicates: bool = False
+    json_shards: int = 0
+    overlays: bool = True
+    overlay_format: str = "png"
+    overlay_quality: int | None = None
+    overlay_max_side: int | None = None
+    overlay_writers: int = 0  # background writer threads; 0 = write inline
+    timings: bool = False
+    trace_memory: bool = False
+    decode_min_side: int | None = None  # reduced JPEG decode (changes scores)
+    features: bool = False  # rows carry raw_features() under "features" (for the feature store)
+
+    def analyze_kwargs(self) -> dict:
+        return {
+            "calibration": self.calibration,
+            "denoiser": self.denoiser,
+            "tile": self.tile,
+            "cascade": self.cascade,
+            "timings": self.timings,
+            "trace_memory": self.trace_memory,
+            "maps": self.overlays,
+        }
+
+    def result_options(self) -> dict:
+        """analyze_kwargs plus what else changes the result (cache key / run signature)."""
+        opts = self.analyze_kwargs()
+        if self.decode_min_side:
+            opts["decode_min_side"] = self.decode_min_side
+        return opts
+
+    def csv_fields(self) -> list[str]:
+        fields = list(CSV_FIELDS)
+        if self.cascade:
+            fields.append("skipped_stages")
+        if self.cache_dir is not None:
+            fields.append("cache_hit")
+        if self.dedup_index is not None:
+            fields += ["phash", "duplicate_of", "dup_distance"]
+        if self.timings or self.trace_memory:
+            fields += TIMING_FIELDS
+        if self.trace_memory:
+            fields.append("peak_alloc_mb")
+        return fields
+
+    def result_signature(self) -> str:
+        """Names the settings behind ai_likelihood / scores (not the verdict); kept with dedup index entries."""
+        blob = json.dumps(result_options(self.result_options()), sort_keys=True, default=str) + code_version()
+        return hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+    def signature(self) -> str:
+        """Changes whenever a previously written row could differ (options, thresholds, code)."""
+        sig = self.result_options()
+        sig["calibration"] = get_thresholds(as_provider(self.calibration).get())
+        sig["fields"] = self.csv_fields()
+        sig["features"] = self.features
+        blob = json.dumps(sig, sort_keys=True, default=str) + code_version()
+        return hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+
+# Read-only view of the on-disk index, loaded once per (worker) process
+_dedup_snapshots: dict[Path, DuplicateIndex] = {}
+
+
+def _dedup_snapshot(path: Path) -> DuplicateIndex:
+    if path not in _dedup_snapshots:
+        _dedup_snapshots[path] = DuplicateIndex.open(path)
+    return _dedup_snapshots[path]
+
+
+def _reuse_report(
+    rel: str, split: str, category: str, h: int, match: tuple[str, str, int], opts: BatchOptions
+) -> dict | None:
+    """
+    Row copying the report of an indexed near-duplicate analyzed with the same
+    result_signature; the verdict is re-derived under the current thresholds.
+    """
+    key, ref, dist = match
+    prior = find_report(ref, key) if ref else None
+    if prior is None:
+        return None
+    verdict, confidence = verdict_from_likelihood(prior["ai_likelihood"], *as_provider(opts.calibration).thresholds())
+    row = {
+        "image": rel,
+        "split": split,
+        "category": category,
+        "verdict": verdict,
+        "confidence": round(confidence, 4),
+        "ai_likelihood": prior["ai_likelihood"],
+        "evidence": " | ".join(prior["evidence"]),
+        "overlay": prior.get("outputs", {}).get("heatmap_overlay", ""),
+        "json": ref,
+        "phash": f"{h:016x}",
+        "duplicate_of": key,
+        "dup_distance": dist,
+    }
+    if opts.features:
+        row["features"] = raw_features(prior["scores"])
+    return row
+
+
+def _index_row(index: DuplicateIndex, indexed: dict[str, int], h: int, row: dict, sig: str) -> None:
+    """Adds row's image to the index, or repoints its entry at the report just written (maybe other settings)."""
+    rel = row["image"]
+    if rel in indexed:
+        index.update(indexed[rel], row["json"], sig)
+    else:
+        indexed[rel] = len(index)
+        index.add(h, rel, row["json"], sig)
+
+
+def _split_features(row: dict) -> tuple[dict, dict | None]:
+    """(row without "features", its features); the input row is left as is."""
+    if "features" not in row:
+        return row, None
+    return {k: v for k, v in row.items() if k != "features"}, row["features"]
+
+
+# Background overlay writer of the in-process (workers <= 1) run
+_overlay_writer: OverlayWriter | None = None
+
+
+def _writer_for(opts: BatchOptions) -> OverlayWriter:
+    global _overlay_writer
+    if _overlay_writer is None:
+        _overlay_writer = OverlayWriter(
+            opts.overlay_format, opts.overlay_quality, opts.overlay_max_side, workers=opts.overlay_writers
+        )
+    return _overlay_writer
+
+
+def load_image(p: Path, opts: BatchOptions) -> DecodedImage:
+    # BGR as decoded: ImageContext converts only where the channel order matters
+    return read_image(p, order="bgr", min_side=opts.decode_min_side)
+
+
+def _error_row(rel: str, split: str, category: str, message: str) -> dict:
+    return {
+        "image": rel,
+        "split": split,
+        "category": category,
+        "verdict": "ERROR",
+        "confidence": "",
+        "ai_likelihood": "",
+        "evidence": message,
+        "overlay": "",
+        "json": "",
+    }
+
+
+def _crashed(task: tuple[Path, BatchOptions, object], err: BaseException) -> tuple[dict, None]:
+    """ERROR row for an image that was in flight when a worker process died."""
+    p, opts, _ = task
+    return _error_row(p.relative_to(opts.repo_root).as_posix(), *infer_labels_from_path(p),
+                      f"worker process died: {err}"), None
+
+
+def process_image(
+    task: tuple[Path, BatchOptions, DecodedImage | BaseException | None],
+) -> tuple[dict, dict | None]:
+    """
+    Analyzes one image and writes its overlay + JSON report.
+    The image comes pre-decoded (or as its load error) from a prefetch
+    thread, or is read here when None.
+    Returns (CSV row, report). The report is only returned (and not written)
+    with json_shards, where the caller appends it to a shard and fills in
+    row["json"]. Failures come back as an ERROR row instead of raising.
+    """
+    p, opts, img = task
+    overlays_dir, json_dir = opts.overlays_dir, opts.json_dir
+    rel = p.relative_to(opts.repo_root).as_posix()
+    split, category = infer_labels_from_path(p)
+
+    dedup = {}
+    times = {}
+    try:
+        if img is None:
+            img = load_image(p, opts)
+        elif isinstance(img, BaseException):
+            raise img
+        ctx = ImageContext(img.image, order=img.order)
+        times["t_decode_ms"] = img.decode_ms
+
+        if opts.dedup_index is not None:
+            h = phash64(ctx.native8, order=ctx.order)
+            snapshot = _dedup_snapshot(opts.dedup_index)
+            matches = [m for m in snapshot.query(h, opts.dedup_distance) if m[0] != rel]
+            if matches and opts.reuse_duplicates:
+                # only reports produced by the same settings can stand in for this image
+                same = [m for m in snapshot.query(h, opts.dedup_distance, opts.result_signature()) if m[0] != rel]
+                row = _reuse_report(rel, split, category, h, same[0], opts) if same else None
+                if row is not None:
+                    return row, None
+            dedup = {
+                "phash": f"{h:016x}",
+                "duplicate_of": matches[0][0] if matches else "",
+                "dup_distance": matches[0][2] if matches else "",
+            }
+
+        res = None
+        if opts.cache_dir is not None:
+            cache = open_cache(opts.cache_dir, max_bytes=opts.cache_max_bytes)
+            key = cache.key(bytes_digest(img.data), opts.result_options())
+            res = cache.get(key, calibration=opts.calibration, need_heatmap=opts.overlays)
+        cache_hit = res is not None
+        if res is None:
+            res = analyze_image(ctx, **opts.analyze_kwargs())
+            if opts.cache_dir is not None:
+                cache.put(key, res)
+        if "timings" in res.scores:
+            t = res.scores["timings"]
+            times.update({f"t_{k}_ms": v for k, v in t["ms"].items()})
+            times["t_analyze_ms"] = t["total_ms"]
+            if "peak_bytes" in t:
+                times["peak_alloc_mb"] = round(max(t["peak_bytes"].values(), default=0) / (1 << 20), 2)
+        t0 = time.perf_counter()
+
+        base = p.stem
+        out_path = None
+        report_path = json_dir / f"{base}_report.json"
+
+        if opts.overlays:
+            out_path = overlay_path(overlays_dir / f"{base}_heatmap", opts.overlay_format)
+            if opts.overlay_writers:
+                _writer_for(opts).submit(out_path, ctx.native8, res.heatmap01, order=ctx.order)
+            else:
+                write_overlay(out_path, ctx.native8, res.heatmap01, fmt=opts.overlay_format,
+                              quality=opts.overlay_quality, max_side=opts.overlay_max_side, order=ctx.order)
+
+        report = {
+            "image": rel,
+            "split": split,
+            "category": category,
+            "verdict": res.verdict,
+            "confidence": round(res.confidence, 4),
+            "ai_likelihood": round(res.ai_likelihood, 4),
+            "evidence": res.evidence,
+            "scores": res.scores,
+            "outputs": {"heatmap_overlay": out_path.as_posix() if out_path else ""},
+        }
+        if img.scale > 1:
+            report["decode_scale"] = img.scale
+
+        if opts.json_shards:
+            report_path = None
+        else:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+        row = {
+            "image": rel,
+            "split": split,
+            "category": category,
+            "verdict": res.verdict,
+            "confidence": res.confidence,
+            "ai_likelihood": res.ai_likelihood,
+            "evidence": " | ".join(res.evidence),
+            "overlay": out_path.as_posix() if out_path else "",
+            "json": report_path.as_posix() if report_path else "",
+            **dedup,
+        }
+        if opts.timings or opts.trace_memory:
+            times["t_outputs_ms"] = (time.perf_counter() - t0) * 1e3
+            row.update({k: round(v, 3) if k.startswith("t_") else v for k, v in times.items()})
+        if opts.cascade:
+            row["skipped_stages"] = "|".join(res.scores["cascade"]["skipped"])
+        if opts.cache_dir is not None:
+            row["cache_hit"] = int(cache_hit)
+        if opts.features:
+            row["features"] = raw_features(res.scores)
+        return row, None if report_path else report
+
+    except Exception as e:
+        return _error_row(rel, split, category, str(e)), None
+
+
 def main() -> None:
+    global _overlay_writer
+    ap = argparse.ArgumentParser(description="TruthLens batch run over demo/sample_images")
+    ap.add_argument("--workers", type=int, default=1,
+                    help=f"Analysis processes (1 = in-process, this machine has {default_workers()} cores)")
+    ap.add_argument("--max-in-flight", type=int, default=None,
+                    help="Max images queued in the pool at once (default: 2 x workers)")
+    ap.add_argument("--unordered", action="store_true",
+                    help="Write rows as images complete instead of in sorted path order")
+    ap.add_argument("--calibration", default=None,
+                    help="calibration.json to use (default: out/calibration.json, reloaded when it changes)")
+    ap.add_argument("--denoiser", default="nlmeans", choices=list(DENOISERS),
+                    help="Noise residual backend (nlmeans = most accurate, median/gaussian = fastest)")
+    ap.add_argument("--tile", type=int, default=None,
+                    help="Analyze images larger than this many px per side in tiles (bounded memory)")
+    ap.add_argument("--cascade", action="store_true",
+                    help="Skip repetition / noise stages once cheaper stages fix the verdict")
+    ap.add_argument("--cache", action="store_true",
+                    help="Reuse results for already analyzed image content (out/cache, LRU-evicted)")
+    ap.add_argument("--cache-max-mb", type=int, default=2048, help="Cache size limit")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Only analyze new / changed files (by size + mtime) and merge into the previous report; "
+                         "progress is journaled to out/batch_manifest.jsonl so an interrupted run resumes")
+    ap.add_argument("--checkpoint-every", type=int, default=50,
+                    help="With --incremental: flush the manifest every N images")
+    ap.add_argument("--report-format", default="csv", choices=["csv", "jsonl"],
+                    help="out/batch_report.csv or an append-only out/batch_report.jsonl (rows written as they finish)")
+    ap.add_argument("--flush-every", type=int, default=50, help="Flush report files every N images")
+    ap.add_argument("--json-shards", type=int, default=0,
+                    help="Write per-image reports as compact JSON lines into N out/json/reports-NNN.jsonl shards "
+                         "instead of one file per image (0 = one file per image)")
+    ap.add_argument("--timings", action="store_true",
+                    help="Add per-stage wall times (decode, extractors, heatmap, outputs) to the report")
+    ap.add_argument("--trace-memory", action="store_true",
+                    help="With --timings: also record peak allocated MB per image (tracemalloc, slower)")
+    ap.add_argument("--no-overlays", action="store_true",
+                    help="Scores only: skip heatmap construction and overlay PNGs (faster, less memory)")
+    ap.add_argument("--overlay-format", default="png", choices=list(OVERLAY_FORMATS), help="Overlay image format")
+    ap.add_argument("--overlay-quality", type=int, default=None,
+                    help="PNG compression level 0-9, or JPEG / WebP quality 0-100 (default: OpenCV's)")
+    ap.add_argument("--overlay-max-side", type=int, default=None, help="Downscale overlays to at most this many px")
+    ap.add_argument("--overlay-writers", type=int, default=2,
+                    help="Background threads encoding overlays while the next image is analyzed "
+                         "(in-process runs; with --workers > 1 each worker writes its own)")
+    ap.add_argument("--prefetch", type=int, default=4,
+                    help="Decode up to N upcoming images in background threads while the current one is analyzed "
+                         "(in-process runs; 0 = off)")
+    ap.add_argument("--decode-min-side", type=int, default=None,
+                    help="Decode JPEGs at 1/2, 1/4 or 1/8 scale as long as the long side stays >= this many px "
+                         "(much faster on large photos; scores are computed on the smaller image)")
+    ap.add_argument("--features", action="store_true",
+                    help="Also store raw per-extractor features in out/features.npz (re-score with python -m src.rescore)")
+    ap.add_argument("--dedup", action="store_true",
+                    help="Flag near-duplicates via a perceptual-hash index kept in out/dedup_index.npz")
+    ap.add_argument("--dedup-distance", type=int, default=6,
+                    help="Max Hamming distance (of 64 bits) counted as a near-duplicate")
+    ap.add_argument("--reuse-duplicates", action="store_true",
+                    help="With --dedup: copy the prior report of an indexed near-duplicate analyzed with the same "
+                         "settings instead of re-analyzing (verdict re-derived from the current thresholds)")
+    args = ap.parse_args()
+
     repo_root = Path(__file__).resolve().parents[1]  # TruthLens/
     img_root = repo_root / "demo" / "sample_images"
     out_root = repo_root / "out"
@@ -57,7 +416,8 @@ def main() -> None:
     json_dir = out_root / "json"
 
     ensure_dir(str(out_root))
-    ensure_dir(str(overlays_dir))
+    if not args.no_overlays:
+        ensure_dir(str(overlays_dir))
     ensure_dir(str(json_dir))
 
     if not img_root.exists():
@@ -73,77 +433,162 @@ def main() -> None:
         print(f"No images found under: {img_root}")
         return
 
-    csv_path = out_root / "batch_report.csv"
-    rows = []
-
-    for p in images:
-        rel = p.relative_to(repo_root).as_posix()
-        split, category = infer_labels_from_path(p)
-
-        try:
-            rgb = read_image_rgb(str(p))
-            res = analyze_image(rgb)
-
-            rgb01 = to_float01(rgb)
-            overlay01 = make_heatmap_overlay(rgb01, res.heatmap01, alpha=0.45)
-
-            base = p.stem
-            overlay_path = overlays_dir / f"{base}_heatmap.png"
-            report_path = json_dir / f"{base}_report.json"
-
-            save_rgb01(str(overlay_path), overlay01)
-
-            report = {
-                "image": rel,
-                "split": split,
-                "category": category,
-                "verdict": res.verdict,
-                "confidence": round(res.confidence, 4),
-                "ai_likelihood": round(res.ai_likelihood, 4),
-                "evidence": res.evidence,
-                "scores": res.scores,
-                "outputs": {"heatmap_overlay": overlay_path.as_posix()},
-            }
-
-            with open(report_path, "w", encoding="utf-8") as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
-
-            rows.append({
-                "image": rel,
-                "split": split,
-                "category": category,
-                "verdict": res.verdict,
-                "confidence": res.confidence,
-                "ai_likelihood": res.ai_likelihood,
-                "evidence": " | ".join(res.evidence),
-                "overlay": overlay_path.as_posix(),
-                "json": report_path.as_posix(),
-            })
-
-            print(f"[OK] {rel} -> {res.verdict} (ai={res.ai_likelihood:.2f})")
-
-        except Exception as e:
-            print(f"[ERR] {rel}: {e}")
-            rows.append({
-                "image": rel,
-                "split": split,
-                "category": category,
-                "verdict": "ERROR",
-                "confidence": "",
-                "ai_likelihood": "",
-                "evidence": str(e),
-                "overlay": "",
-                "json": "",
-            })
-
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"\n✅ Done. CSV saved to: {csv_path}")
-    print(f"✅ Overlays: {overlays_dir}")
+    report_path = out_root / f"batch_report.{args.report_format}"
+
+    opts = BatchOptions(
+        repo_root=repo_root,
+        overlays_dir=overlays_dir,
+        json_dir=json_dir,
+        calibration=Path(args.calibration) if args.calibration else None,
+        denoiser=args.denoiser,
+        tile=args.tile,
+        cascade=args.cascade,
+        cache_dir=out_root / "cache" if args.cache else None,
+        cache_max_bytes=args.cache_max_mb << 20,
+        dedup_index=out_root / "dedup_index.npz" if args.dedup else None,
+        dedup_distance=args.dedup_distance,
+        reuse_duplicates=args.reuse_duplicates,
+        json_shards=args.json_shards,
+        overlays=not args.no_overlays,
+        overlay_format=args.overlay_format,
+        overlay_quality=args.overlay_quality,
+        overlay_max_side=args.overlay_max_side,
+        overlay_writers=args.overlay_writers if args.workers <= 1 else 0,
+        timings=args.timings or args.trace_memory,
+        trace_memory=args.trace_memory,
+        decode_min_side=args.decode_min_side,
+        features=args.features,
+    )
+    index = DuplicateIndex.open(opts.dedup_index) if args.dedup else None
+    if index is not None and args.dedup_distance > index.max_exact_distance:
+        ap.error(f"--dedup-distance {args.dedup_distance}: the index only finds every match up to "
+                 f"{index.max_exact_distance}")
+    indexed = {k: i for i, k in enumerate(index.keys)} if index is not None else {}
+    result_sig = opts.result_signature()
+    dup_count = 0
+    early_exits = analyzed = 0
+    time_sums: dict[str, float] = {}
+    time_counts: dict[str, int] = {}
+    writer = ReportWriter(report_path, opts.csv_fields(), args.report_format, args.flush_every)
+    shards = ShardedJsonl(json_dir, args.json_shards, append=args.incremental, flush_every=args.flush_every) \
+        if args.json_shards else None
+
+    store = None
+    if args.features:
+        store = FeatureStore(meta={
+            "denoiser": opts.denoiser,
+            "tile": opts.tile,
+            "cascade": opts.cascade,
+            "decode_min_side": opts.decode_min_side,
+            "code_version": code_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    def emit(row: dict) -> None:
+        row, feats = _split_features(row)
+        if store is not None and feats is not None:
+            store.add(row["image"], row["split"], row["category"], row["verdict"], feats)
+        writer.write(row)
+
+    manifest = None
+    stats = {}
+    todo = images
+    unchanged: deque[tuple[int, dict]] = deque()  # (position in images, row) still to write
+    position: dict[str, int] = {}
+    if args.incremental:
+        manifest = RunManifest(out_root / "batch_manifest.jsonl", opts.signature(), args.checkpoint_every)
+        todo = []
+        for i, p in enumerate(images):
+            rel = p.relative_to(repo_root).as_posix()
+            stats[rel] = p.stat()
+            row = manifest.lookup(rel, stats[rel])
+            if row is None:
+                todo.append(p)
+                position[rel] = i
+            else:
+                unchanged.append((i, row))
+                if index is not None and row.get("phash"):
+                    _index_row(index, indexed, int(row["phash"], 16), row, result_sig)
+        print(f"Incremental: {len(images) - len(todo)} unchanged, {len(todo)} to analyze")
+
+    if args.workers <= 1:
+        loaded = prefetch(todo, lambda p: load_image(p, opts), depth=args.prefetch)
+        tasks = ((p, opts, img if err is None else err) for p, img, err in loaded)
+    else:
+        tasks = ((p, opts, None) for p in todo)  # each worker decodes its own images
+    for row, report in bounded_map(
+        process_image,
+        tasks,
+        workers=args.workers,
+        ordered=not args.unordered,
+        max_in_flight=args.max_in_flight,
+        on_crash=_crashed,
+    ):
+        if report is not None:
+            row["json"] = shards.write(row["image"], report).as_posix()
+        if row["verdict"] != "ERROR":
+            analyzed += 1
+        if row.get("skipped_stages"):
+            early_exits += 1
+        for k in TIMING_FIELDS:
+            if row.get(k, "") != "":
+                time_sums[k] = time_sums.get(k, 0.0) + row[k]
+                time_counts[k] = time_counts.get(k, 0) + 1
+        if index is not None and row.get("phash"):
+            h = int(row["phash"], 16)
+            if not row["duplicate_of"]:
+                # duplicates within this run are only visible to the live index
+                matches = [m for m in index.query(h, opts.dedup_distance) if m[0] != row["image"]]
+                if matches:
+                    row["duplicate_of"], row["dup_distance"] = matches[0][0], matches[0][2]
+            if row["duplicate_of"]:
+                dup_count += 1
+            if row["verdict"] != "ERROR":
+                _index_row(index, indexed, h, row, result_sig)
+        if row["verdict"] == "ERROR":
+            print(f"[ERR] {row['image']}: {row['evidence']}")
+        else:
+            dup = f" [dup of {row['duplicate_of']}]" if row.get("duplicate_of") else ""
+            hit = " [cached]" if row.get("cache_hit") else ""
+            print(f"[OK] {row['image']} -> {row['verdict']} (ai={float(row['ai_likelihood']):.2f}){dup}{hit}")
+        if manifest is not None:
+            manifest.record(row["image"], stats[row["image"]], row)
+        # unchanged rows are merged in by path (or all go first with --unordered)
+        while unchanged and (args.unordered or unchanged[0][0] < position[row["image"]]):
+            emit(unchanged.popleft()[1])
+        emit(row)
+    while unchanged:
+        emit(unchanged.popleft()[1])
+
+    writer.close()
+    if _overlay_writer is not None:
+        for path, err in _overlay_writer.close():
+            print(f"[ERR] overlay {path}: {err}")
+        _overlay_writer = None  # a later main() in this process starts a new one
+    if shards is not None:
+        shards.close()
+    if manifest is not None:
+        # files gone since the last run are dropped from the journal
+        manifest.compact(set(stats))
+
+    if index is not None:
+        index.save(opts.dedup_index)
+    if store is not None:
+        store.save(out_root / "features.npz")
+
+    print(f"\n✅ Done. Report saved to: {report_path} ({writer.count} rows)")
+    if opts.overlays:
+        print(f"✅ Overlays: {overlays_dir}")
     print(f"✅ JSON reports: {json_dir}")
+    if opts.cascade:
+        print(f"✅ Cascade early exits: {early_exits}/{analyzed} analyzed images")
+    if time_sums:
+        means = " | ".join(f"{k[2:-3]} {time_sums[k] / time_counts[k]:.1f}" for k in TIMING_FIELDS if k in time_sums)
+        print(f"✅ Mean stage times (ms): {means}")
+    if store is not None:
+        print(f"✅ Feature store: {out_root / 'features.npz'} ({len(store)} images)")
+    if index is not None:
+        print(f"✅ Near-duplicates: {dup_count} (index: {opts.dedup_index}, {len(index)} fingerprints)")
 
 
 if __name__ == "__main__":
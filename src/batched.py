@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import numpy as np
+import cv2
+
+from .utils import to_float01, rgb_to_gray01, normalize01
+from .artifacts.spectrum_fft import spectrum_profile, profile_features
+from .artifacts.noise_residual import residual_magnitude, residual_structure, noise_score, effective_denoiser
+from .artifacts.patch_repetition import (
+    _normalized_patches,
+    _similarity_search,
+    _paint_patches,
+    downscale_for_repetition,
+    repetition_score,
+    upsampled_mean,
+    similarity_stats,
+    NO_SIMILARITY,
+)
+from .artifacts.edge_stats import edge_score
+
+
+def _as_stack(images: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(rgb01, rgb8) stacks [N, H, W, 3], converted as ImageContext converts one image."""
+    if images.dtype == np.uint8:
+        return np.divide(images, np.float32(255.0), dtype=np.float32), images
+    # float input is scaled per image (to_float01 decides 0-1 vs 0-255 by its max)
+    rgb01 = np.stack([to_float01(x) for x in images])
+    return rgb01, (np.clip(rgb01, 0, 1) * 255.0).astype(np.uint8)
+
+
+def _spectrum(gray01: np.ndarray) -> list[dict]:
+    radii, rp = spectrum_profile(gray01)
+    return [profile_features(radii, p) for p in rp]
+
+
+def _noise(rgb01: np.ndarray, rgb8: np.ndarray, denoiser: str, maps: bool) -> list[dict]:
+    n, h, w = rgb01.shape[:3]
+    denoiser = effective_denoiser(denoiser, (h, w))
+    # the denoisers are OpenCV calls, one per image; the statistics are batched
+    resid = np.stack([residual_magnitude(rgb01[i], denoiser, rgb8=rgb8[i]) for i in range(n)])
+    rstd = np.std(resid, axis=(1, 2))
+    rmean = np.mean(resid, axis=(1, 2))
+
+    out = []
+    for i in range(n):
+        structure = residual_structure(resid[i])
+        stats = {
+            "resid_mean": float(rmean[i]),
+            "resid_std": float(rstd[i]),
+            **structure,
+            "score": noise_score(float(rmean[i]), structure["resid_corr_1px"], denoiser),
+            "denoiser": denoiser,
+        }
+        if maps:
+            r = resid[i]
+            if r.shape != (h, w):
+                r = cv2.resize(r, (w, h), interpolation=cv2.INTER_LINEAR)
+            stats["resid_map"] = normalize01(r)
+        out.append(stats)
+    return out
+
+
+def _repetition(
+    gray01: np.ndarray,
+    maps: bool,
+    patch: int = 24,
+    stride: int = 12,
+    sim_thresh: float = 0.92,
+    block_elems: int = 1 << 22,
+) -> list[dict]:
+    n, h, w = gray01.shape
+    small = np.stack([downscale_for_repetition(g, 512) for g in gray01])
+    hs, ws = small.shape[1:]
+
+    P, coords = (None, None) if hs < patch or ws < patch else _normalized_patches(small, patch, stride)
+    if P is None or P.shape[1] < 10:
+        out = [{**NO_SIMILARITY, "score": 0.0} for _ in range(n)]
+        if maps:
+            for o in out:
+                o["rep_map"] = np.zeros((h, w), dtype=np.float32)
+        return out
+
+    # one similarity search for all N images (shared overlap masks)
+    best, hits = _similarity_search(P, coords, patch, sim_thresh, block_elems)
+    out = []
+    for i in range(n):
+        sims = similarity_stats(best[i])
+        hot = normalize01(_paint_patches((hs, ws), coords, hits[i], patch))
+        if not maps:
+            out.append({**sims, "score": repetition_score(sims["p95_sim"], upsampled_mean(hot, h, w))})
+            continue
+        rep_map = cv2.resize(hot, (w, h), interpolation=cv2.INTER_LINEAR) if (hs, ws) != (h, w) else hot
+        out.append({
+            **sims,
+            "score": repetition_score(sims["p95_sim"], float(np.mean(rep_map))),
+            "rep_map": rep_map.astype(np.float32),
+        })
+    return out
+
+
+def _edges(gray8: np.ndarray, maps: bool) -> list[dict]:
+    n = gray8.shape[0]
+    lap = np.empty(gray8.shape, dtype=np.float32)
+    for i in range(n):
+        cv2.Laplacian(gray8[i], cv2.CV_32F, dst=lap[i], ksize=3)
+    lap_var = np.var(lap, axis=(1, 2))
+    out = [{"lap_var": float(v), "score": edge_score(float(v))} for v in lap_var]
+    if not maps:
+        return out
+
+    gx = np.empty(gray8.shape, dtype=np.float32)
+    gy = np.empty(gray8.shape, dtype=np.float32)
+    for i in range(n):
+        cv2.Sobel(gray8[i], cv2.CV_32F, 1, 0, dst=gx[i], ksize=3)
+        cv2.Sobel(gray8[i], cv2.CV_32F, 0, 1, dst=gy[i], ksize=3)
+    mag = np.sqrt(gx * gx + gy * gy).astype(np.float32)
+    for o, m in zip(out, mag):
+        o["edge_map"] = normalize01(m)
+    return out
+
+
+def batched_features(
+    images: np.ndarray,
+    denoiser: str = "nlmeans",
+    maps: bool = True,
+    chunk_pixels: int = 1 << 19,
+) -> list[tuple[dict, dict, dict, dict, np.ndarray | None]]:
+    """
+    Per-image (spectrum, noise, repetition, edges, heatmap) for a stack of
+    same-sized RGB images [N, H, W, 3] (uint8 or float), with the same values
+    analyze_image computes one image at a time:
+      - float / gray conversions and the heatmap combine run on the whole chunk
+      - one batched real FFT with shared window and radial bins
+      - one all-pairs patch search per chunk (overlap masks built once)
+      - batched residual / Laplacian statistics
+    OpenCV filters (denoisers, resizes, Laplacian / Sobel) still run per image.
+
+    The stack is processed in chunks of about chunk_pixels pixels: larger
+    chunks fall out of the CPU caches and get slower than one-by-one calls
+    (and would hold N full-size float copies).
+    """
+    if images.ndim != 4 or images.shape[-1] != 3:
+        raise ValueError(f"Expected an N x H x W x 3 stack, got shape {images.shape}")
+    step = max(1, chunk_pixels // (images.shape[1] * images.shape[2]))
+    out = []
+    for i in range(0, images.shape[0], step):
+        out += _chunk_features(images[i:i + step], denoiser, maps)
+    return out
+
+
+def _chunk_features(images: np.ndarray, denoiser: str, maps: bool) -> list[tuple]:
+    rgb01, rgb8 = _as_stack(images)
+    gray01 = rgb_to_gray01(rgb01)
+    gray8 = (np.clip(gray01, 0, 1) * 255).astype(np.uint8)
+
+    spec = _spectrum(gray01)
+    noi = _noise(rgb01, rgb8, denoiser, maps)
+    rep = _repetition(gray01, maps)
+    edg = _edges(gray8, maps)
+
+    heats: list[np.ndarray | None] = [None] * len(images)
+    if maps:
+        from .pipeline import HEATMAP_MAPS  # pipeline imports this module
+
+        stages = {"noise": noi, "repetition": rep, "edges": edg}
+        heat = np.zeros(gray01.shape, dtype=np.float32)
+        for name, key, wt in HEATMAP_MAPS:
+            heat += wt * np.stack([f[key] for f in stages[name]])
+        heats = [normalize01(x) for x in heat]
+    return list(zip(spec, noi, rep, edg, heats))
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+from .utils import to_float01, rgb_to_gray01
+from .pipeline import analyze_image
+from .artifacts.spectrum_fft import spectrum_features
+from .artifacts.noise_residual import noise_residual_features
+from .artifacts.patch_repetition import patch_repetition_features
+from .artifacts.edge_stats import edge_features
+from .explain.heatmap import make_heatmap_overlay, make_heatmap_overlay8
+
+
+# Megapixels -> (h, w), 4:3
+SIZES = {
+    "0.3": (480, 640),
+    "2": (1224, 1632),
+    "12": (3000, 4000),
+    "48": (6000, 8000),
+}
+
+# overlay: float32 make_heatmap_overlay, overlay8: its uint8 version used by the writers
+TARGETS = ["spectrum", "noise", "repetition", "edges", "analyze", "overlay", "overlay8"]
+
+
+def synth_image(h: int, w: int, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic photo-like RGB uint8: smooth low-frequency structure, a few
+    hard-edged shapes and sensor-like noise. Same (h, w, seed) -> same bytes.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.random((max(2, h // 64), max(2, w // 64), 3), dtype=np.float32)
+    img = cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+    detail = rng.random((max(2, h // 8), max(2, w // 8), 3), dtype=np.float32)
+    img += 0.25 * cv2.resize(detail, (w, h), interpolation=cv2.INTER_LINEAR)
+    for _ in range(12):
+        y, x = int(rng.integers(0, h)), int(rng.integers(0, w))
+        r = int(rng.integers(max(2, min(h, w) // 40), max(3, min(h, w) // 8)))
+        cv2.circle(img, (x, y), r, tuple(float(c) for c in rng.random(3) * 1.25), -1)
+    img += rng.standard_normal((h, w, 3), dtype=np.float32) * 0.02
+    return (np.clip(img / 1.25, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_case(case: tuple[str, str, str, int, int, float, int | None]) -> dict:
+    """
+    Runs in a fresh process so peak RSS belongs to this case only. The input
+    comes as a .npy written by the parent, so synth_image's float temporaries
+    are not part of it: peak_rss_mb is the interpreter + input + the target,
+    delta_rss_mb the part of it above the peak after setup (inputs converted).
+    Timed runs: at least `repeats`, more for fast cases until min_time seconds
+    are spent, which keeps p50 / p95 of millisecond-scale stages stable.
+    """
+    size, image_path, target, repeats, warmup, min_time, threads = case
+    if threads is not None:
+        cv2.setNumThreads(threads)
+    rgb = np.load(image_path)
+    h, w = rgb.shape[:2]
+
+    if target in ("spectrum", "noise", "repetition", "edges", "overlay", "overlay8"):
+        rgb01 = to_float01(rgb)
+        gray01 = rgb_to_gray01(rgb01)
+    fn = {
+        "spectrum": lambda: spectrum_features(gray01),
+        "noise": lambda: noise_residual_features(rgb01),
+        "repetition": lambda: patch_repetition_features(gray01),
+        "edges": lambda: edge_features(gray01),
+        "analyze": lambda: analyze_image(rgb),
+        "overlay": lambda: make_heatmap_overlay(rgb01, gray01),
+        "overlay8": lambda: make_heatmap_overlay8(rgb, gray01),
+    }[target]
+    setup_rss = _peak_rss_mb()
+
+    for _ in range(warmup):
+        fn()
+    times = []
+    while len(times) < repeats or (sum(times) < min_time and len(times) < 1000):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    t = np.array(times)
+    peak_rss = _peak_rss_mb()
+    return {
+        "size": size,
+        "target": target,
+        "shape": [h, w],
+        "repeats": len(times),
+        "cv2_threads": cv2.getNumThreads(),
+        "p50_ms": float(np.percentile(t, 50) * 1e3),
+        "p95_ms": float(np.percentile(t, 95) * 1e3),
+        "mean_ms": float(t.mean() * 1e3),
+        "throughput_ips": float(1.0 / t.mean()),
+        "throughput_mps": float(h * w / 1e6 / t.mean()),
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss,
+        "delta_rss_mb": peak_rss - setup_rss if peak_rss is not None else None,
+    }
+
+
+def _environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run(sizes: list[str], targets: list[str], repeats: int = 5, warmup: int = 1, min_time: float = 1.0,
+        threads: int | None = None) -> dict:
+    ctx = get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="truthlens_bench_") as tmp:
+        for size in sizes:
+            image_path = os.path.join(tmp, f"{size}mp.npy")
+            np.save(image_path, synth_image(*SIZES[size]))  # made here: the cases only load it
+            for target in targets:
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    case = (size, image_path, target, repeats, warmup, min_time, threads)
+                    r = pool.submit(_bench_case, case).result()
+                rss = "n/a"
+                if r["peak_rss_mb"] is not None:
+                    rss = f"{r['peak_rss_mb']:.0f} MB (+{r['delta_rss_mb']:.0f})"
+                print(f"[OK] {size:>4} MP {target:<10} p50={r['p50_ms']:9.1f} ms  p95={r['p95_ms']:9.1f} ms  "
+                      f"{r['throughput_mps']:7.2f} MP/s  peak={rss}")
+                results.append(r)
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": _environment(), "results": results}
+
+
+def compare(base: dict, new: dict, threshold: float = 0.10, p95_threshold: float = 0.25) -> list[dict]:
+    """
+    Matches cases by (size, target) and flags those whose p50 latency or peak
+    RSS grew by more than threshold, or p95 latency by more than p95_threshold
+    (relative; the tail is noisier than the median).
+    """
+    limits = {"p50_ms": threshold, "p95_ms": p95_threshold, "peak_rss_mb": threshold}
+    base_cases = {(r["size"], r["target"]): r for r in base["results"]}
+    rows = []
+    for r in new["results"]:
+        b = base_cases.get((r["size"], r["target"]))
+        if b is None:
+            continue
+        row = {"size": r["size"], "target": r["target"], "regressions": []}
+        for metric, limit in limits.items():
+            if b.get(metric) and r.get(metric) is not None:
+                row[metric] = r[metric] / b[metric] - 1.0
+                if row[metric] > limit:
+                    row["regressions"].append(metric)
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="TruthLens benchmarks (synthetic images, one process per case)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="Benchmark extractors / pipeline and save JSON results")
+    r.add_argument("--sizes", default=",".join(SIZES), help=f"Comma-separated megapixel sizes from {list(SIZES)}")
+    r.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {TARGETS}")
+    r.add_argument("--repeats", type=int, default=5, help="Timed runs per case")
+    r.add_argument("--warmup", type=int, default=1, help="Untimed runs per case")
+    r.add_argument("--min-time", type=float, default=1.0, help="Keep repeating fast cases for at least this many s")
+    r.add_argument("--cv2-threads", type=int, default=None,
+                   help="Pin OpenCV's thread count (1 = least noisy timings; default: OpenCV's choice)")
+    r.add_argument("--out", default="out/bench.json", help="Results JSON")
+
+    c = sub.add_parser("compare", help="Diff results against a baseline; exit 1 on regressions")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.10,
+                   help="Relative p50 latency / peak RSS increase counted as a regression")
+    c.add_argument("--p95-threshold", type=float, default=0.25,
+                   help="Relative p95 latency increase counted as a regression")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        sizes = args.sizes.split(",")
+        targets = args.targets.split(",")
+        unknown = [s for s in sizes if s not in SIZES] + [t for t in targets if t not in TARGETS]
+        if unknown:
+            ap.error(f"Unknown sizes / targets: {unknown}")
+        report = run(sizes, targets, repeats=args.repeats, warmup=args.warmup, min_time=args.min_time,
+                     threads=args.cv2_threads)
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n✅ Saved: {out}")
+        return
+
+    base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    rows = compare(base, new, args.threshold, args.p95_threshold)
+    regressions = 0
+    for row in rows:
+        deltas = "  ".join(f"{m}={row[m]:+.1%}" + ("!" if m in row["regressions"] else "")
+                           for m in ("p50_ms", "p95_ms", "peak_rss_mb") if m in row)
+        tag = "[ERR]" if row["regressions"] else "[OK] "
+        print(f"{tag} {row['size']:>4} MP {row['target']:<10} {deltas}")
+        regressions += bool(row["regressions"])
+    if regressions:
+        print(f"\n{regressions} case(s) regressed (p50 / peak RSS above {args.threshold:.0%}, "
+              f"p95 above {args.p95_threshold:.0%})")
+        sys.exit(1)
+    print(f"\n✅ No regressions (p50 / peak RSS within {args.threshold:.0%}, p95 within {args.p95_threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+from .pipeline import TruthLensResult, WEIGHTS, analyze_image
+from .roi import FeatureMaps
+from .calibration import CalibrationProvider, as_provider, get_thresholds, verdict_from_likelihood
+
+# Bump when the cached payload layout changes
+CACHE_FORMAT = 1
+
+# Source files whose content defines the analysis results
+_CODE_FILES = ["pipeline.py", "tiled.py", "batched.py", "roi.py", "context.py", "utils.py", "artifacts"]
+
+_code_version: str | None = None
+
+# analyze_image options that change its scores. The others only change what
+# is reported or kept (timings, maps, retain) or, like calibration, only the
+# verdict, which is re-derived on every hit.
+_RESULT_OPTIONS = ("denoiser", "tile", "tile_overlap", "cascade")
+_ANALYZE_PARAMS = inspect.signature(analyze_image).parameters
+
+
+def code_version() -> str:
+    """
+    Digest of the extractor / pipeline sources and the combine weights.
+    Any edit to them yields new cache keys, so stale entries are never hit
+    (they simply age out through LRU eviction).
+    """
+    global _code_version
+    if _code_version is None:
+        src_root = Path(__file__).resolve().parent
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"format={CACHE_FORMAT};weights={json.dumps(WEIGHTS, sort_keys=True)}".encode())
+        for name in _CODE_FILES:
+            p = src_root / name
+            for f in sorted(p.rglob("*.py")) if p.is_dir() else [p]:
+                h.update(f.relative_to(src_root).as_posix().encode())
+                h.update(f.read_bytes())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def result_options(options: dict | None = None) -> dict:
+    """
+    The part of an options dict that decides an analysis result, with
+    analyze_image's defaults filled in, so callers passing different (or
+    no) option dicts for the same effective settings agree. Options that
+    are not analyze_image parameters (e.g. decode_min_side) are kept unless
+    None. In cascade mode the verdict thresholds decide which stages run and
+    are included.
+    """
+    options = options or {}
+    opts = {k: options.get(k, _ANALYZE_PARAMS[k].default) for k in _RESULT_OPTIONS}
+    opts.update({k: v for k, v in options.items() if k not in _ANALYZE_PARAMS and v is not None})
+    if opts["cascade"]:
+        opts["calibration"] = get_thresholds(as_provider(options.get("calibration")).get())
+    return opts
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def file_digest(path: str | Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _touch(path: Path) -> None:
+    # another process may have evicted the entry since it was read
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of analysis results.
+
+    key = hash(image bytes) + hash(analysis options + code_version()), so the
+    same image under another path is a hit and any extractor / weight change
+    is a miss. Each entry is <root>/<k[:2]>/<k>.json plus an optional
+    <k>.png heatmap (uint8) and <k>.npz feature maps (put_maps). The verdict is re-derived from the cached
+    ai_likelihood with the *current* calibration on every hit, so
+    recalibrating does not invalidate anything.
+
+    Total size is kept under max_bytes by evicting least recently used
+    entries (hits refresh an entry's mtime).
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = 2 << 30, store_heatmap: bool = True):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.store_heatmap = store_heatmap
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._size = sum(_file_size(f) for f in self.root.rglob("*") if f.is_file())
+
+    def key(self, digest: str, options: dict | None = None) -> str:
+        """options: analyze_image (+ loader) options; only their result_options() count."""
+        blob = json.dumps(result_options(options), sort_keys=True, default=str) + code_version()
+        return digest + hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        d = self.root / key[:2]
+        return d / f"{key}.json", d / f"{key}.png"
+
+    def _maps_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.npz"
+
+    def get(
+        self,
+        key: str,
+        calibration: CalibrationProvider | str | Path | dict | None = None,
+        need_heatmap: bool = True,
+    ) -> TruthLensResult | None:
+        meta_path, heat_path = self._paths(key)
+        try:
+            payload = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        heat = None
+        if need_heatmap:
+            heat8 = cv2.imread(str(heat_path), cv2.IMREAD_GRAYSCALE)
+            if heat8 is None:
+                return None
+            heat = heat8.astype(np.float32) / 255.0
+            _touch(heat_path)
+        _touch(meta_path)
+
+        calib = as_provider(calibration).get()
+        likely_real_max, likely_ai_min = get_thresholds(calib)
+        verdict, confidence = verdict_from_likelihood(payload["ai_likelihood"], likely_real_max, likely_ai_min)
+        scores = payload["scores"]
+        scores["thresholds_used"] = {
+            "likely_real_max": float(likely_real_max),
+            "likely_ai_min": float(likely_ai_min),
+            "has_calibration_file": bool(calib),
+        }
+
+        return TruthLensResult(
+            verdict=verdict,
+            confidence=float(np.clip(confidence, 0.0, 1.0)),
+            ai_likelihood=payload["ai_likelihood"],
+            evidence=payload["evidence"],
+            scores=scores,
+            heatmap01=heat,
+        )
+
+    def put(self, key: str, res: TruthLensResult) -> None:
+        meta_path, heat_path = self._paths(key)
+        meta_path.parent.mkdir(exist_ok=True)
+
+        written = 0
+        if self.store_heatmap and res.heatmap01 is not None:
+            heat8 = (np.clip(res.heatmap01, 0, 1) * 255).astype(np.uint8)
+            written -= _file_size(heat_path)  # overwriting an existing entry
+            cv2.imwrite(str(heat_path), heat8)
+            written += heat_path.stat().st_size
+
+        # timings describe the run that filled the entry, not a later hit
+        scores = {k: v for k, v in res.scores.items() if k != "timings"}
+        payload = {"ai_likelihood": res.ai_likelihood, "evidence": res.evidence, "scores": scores}
+        tmp = meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        written -= _file_size(meta_path)
+        os.replace(tmp, meta_path)  # the json marks the entry complete
+        written += meta_path.stat().st_size
+
+        self._size += written
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_maps(self, key: str) -> FeatureMaps | None:
+        """The retained feature maps of an entry (for region queries), if stored."""
+        path = self._maps_path(key)
+        try:
+            fm = FeatureMaps.load(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        _touch(path)
+        return fm
+
+    def put_maps(self, key: str, feature_maps: FeatureMaps) -> None:
+        """Stores feature maps with an entry; they are evicted together."""
+        path = self._maps_path(key)
+        path.parent.mkdir(exist_ok=True)
+        old = _file_size(path)
+        feature_maps.save(path)
+        self._size += path.stat().st_size - old
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self, target: float = 0.9) -> None:
+        """Drops least recently used entries until the cache is under target * max_bytes."""
+        entries: dict[str, list] = {}
+        for f in self.root.rglob("*"):
+            if f.is_file():
+                try:
+                    st = f.stat()
+                except OSError:  # evicted by another process meanwhile
+                    continue
+                e = entries.setdefault(f.stem, [0.0, 0, []])
+                e[0] = max(e[0], st.st_mtime)
+                e[1] += st.st_size
+                e[2].append(f)
+        total = sum(e[1] for e in entries.values())
+        limit = self.max_bytes * target
+        for _, size, files in sorted(entries.values(), key=lambda e: e[0]):
+            if total <= limit:
+                break
+            for f in files:
+                f.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+
+_caches: dict[Path, ResultCache] = {}
+
+
+def open_cache(root: str | Path, max_bytes: int = 2 << 30) -> ResultCache:
+    """One shared ResultCache per directory and process."""
+    root = Path(root).resolve()
+    if root not in _caches:
+        _caches[root] = ResultCache(root, max_bytes=max_bytes)
+    return _caches[root]
@@ -1,16 +1,90 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
+import time
 from pathlib import Path
 
+import numpy as np
+
+
+def default_calibration_path(repo_root: Path | None = None) -> Path:
+    if repo_root is None:
+        repo_root = Path(__file__).resolve().parents[1]  # TruthLens/
+    return repo_root / "out" / "calibration.json"
+
 
 def load_calibration(repo_root: Path) -> dict | None:
-    path = repo_root / "out" / "calibration.json"
+    path = default_calibration_path(repo_root)
     if not path.exists():
         return None
     return json.loads(path.read_text(encoding="utf-8"))
 
 
+class CalibrationProvider:
+    """
+    In-process calibration cache.
+
+    source may be:
+      - a dict: used as-is, the filesystem is never touched
+      - a path to a calibration.json: loaded once, reloaded when its mtime changes
+      - None: the default out/calibration.json of this checkout
+
+    To keep per-image cost near zero the file is stat'ed at most once every
+    check_interval seconds (0 = on every call).
+    """
+
+    def __init__(self, source: str | Path | dict | None = None, check_interval: float = 1.0):
+        self._static = isinstance(source, dict)
+        self._calib: dict | None = dict(source) if self._static else None
+        self.path: Path | None = None if self._static else Path(source or default_calibration_path())
+        self.check_interval = float(check_interval)
+        self._mtime_ns: int | None = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> dict | None:
+        if self._static:
+            return self._calib
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._calib
+        with self._lock:
+            self._next_check = now + self.check_interval
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._calib, self._mtime_ns = None, None
+                return None
+            if mtime_ns != self._mtime_ns:
+                self._calib = json.loads(self.path.read_text(encoding="utf-8"))
+                self._mtime_ns = mtime_ns
+            return self._calib
+
+    def thresholds(self) -> tuple[float, float]:
+        return get_thresholds(self.get())
+
+
+# One shared provider per calibration file and process
+_path_providers: dict[Path, CalibrationProvider] = {}
+
+
+def default_provider() -> CalibrationProvider:
+    return as_provider(default_calibration_path())
+
+
+def as_provider(calibration: CalibrationProvider | str | Path | dict | None) -> CalibrationProvider:
+    if isinstance(calibration, CalibrationProvider):
+        return calibration
+    if isinstance(calibration, dict):
+        return CalibrationProvider(calibration)
+    path = Path(calibration or default_calibration_path()).resolve()
+    if path not in _path_providers:
+        _path_providers[path] = CalibrationProvider(path)
+    return _path_providers[path]
+
+
 def get_thresholds(calib: dict | None) -> tuple[float, float]:
     """
     returns (likely_real_max, likely_ai_min)
@@ -36,3 +110,19 @@ def verdict_from_likelihood(ai_likelihood: float, likely_real_max: float, likely
     # Confidence is lower near 0.5
     conf = 1.0 - abs(x - 0.5) * 2.0
     return "Uncertain", min(1.0, max(0.0, conf))
+
+
+# verdict_from_likelihood's labels, indexed by the codes of verdicts_from_likelihoods
+VERDICTS = ("Likely Real", "Uncertain", "Likely AI-generated")
+
+
+def verdicts_from_likelihoods(
+    ai_likelihood: np.ndarray, likely_real_max: float, likely_ai_min: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """verdict_from_likelihood over an array: (int8 codes into VERDICTS, confidences)."""
+    x = np.asarray(ai_likelihood, dtype=np.float64)
+    is_ai = x >= likely_ai_min
+    is_real = ~is_ai & (x <= likely_real_max)
+    codes = np.where(is_ai, 2, np.where(is_real, 0, 1)).astype(np.int8)
+    conf = np.where(is_ai, x, np.where(is_real, 1.0 - x, 1.0 - np.abs(x - 0.5) * 2.0))
+    return codes, np.clip(conf, 0.0, 1.0)
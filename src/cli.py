@@ -2,39 +2,80 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import cv2
-import numpy as np
 
-from .utils import read_image_rgb, ensure_dir, to_float01
-from .pipeline import analyze_image
-from .explain.heatmap import make_heatmap_overlay
-
-
-def save_rgb01(path: str, rgb01: np.ndarray) -> None:
-    rgb8 = (np.clip(rgb01, 0, 1) * 255).astype(np.uint8)
-    bgr = cv2.cvtColor(rgb8, cv2.COLOR_RGB2BGR)
-    cv2.imwrite(path, bgr)
+from .utils import ensure_dir
+from .loader import read_image
+from .context import ImageContext
+from .pipeline import analyze_image, analyze_region
+from .roi import parse_box
+from .artifacts.noise_residual import DENOISERS
+from .explain.writer import OVERLAY_FORMATS, overlay_path, write_overlay
+from .cache import open_cache, bytes_digest
 
 
 def main() -> None:
     ap = argparse.ArgumentParser(description="TruthLens CLI - Explainable AI image forensics (MVP)")
     ap.add_argument("--image", required=True, help="Path to image")
     ap.add_argument("--out", default="out", help="Output folder")
+    ap.add_argument("--calibration", default=None, help="calibration.json to use (default: out/calibration.json)")
+    ap.add_argument("--denoiser", default="nlmeans", choices=list(DENOISERS),
+                    help="Noise residual backend (nlmeans = most accurate, median/gaussian = fastest)")
+    ap.add_argument("--tile", type=int, default=None,
+                    help="Analyze images larger than this many px per side in tiles (bounded memory)")
+    ap.add_argument("--cascade", action="store_true",
+                    help="Skip repetition / noise stages once cheaper stages fix the verdict")
+    ap.add_argument("--timings", action="store_true", help="Report per-stage wall times under scores.timings")
+    ap.add_argument("--cache", default=None,
+                    help="Result cache folder; re-running on the same image content returns instantly")
+    ap.add_argument("--cache-max-mb", type=int, default=2048, help="Cache size limit (LRU eviction)")
+    ap.add_argument("--decode-min-side", type=int, default=None,
+                    help="Decode JPEGs at 1/2, 1/4 or 1/8 scale as long as the long side stays >= this many px")
+    ap.add_argument("--overlay-format", default="png", choices=list(OVERLAY_FORMATS), help="Overlay image format")
+    ap.add_argument("--overlay-quality", type=int, default=None,
+                    help="PNG compression level 0-9, or JPEG / WebP quality 0-100 (default: OpenCV's)")
+    ap.add_argument("--overlay-max-side", type=int, default=None, help="Downscale the overlay to at most this many px")
+    ap.add_argument("--roi", action="append", type=parse_box, default=[], metavar="X,Y,W,H",
+                    help="Also report this region (repeatable); re-scored from retained feature maps")
     args = ap.parse_args()
+    if args.roi and args.tile is not None:
+        ap.error("--roi needs the untiled feature maps and cannot be combined with --tile")
 
     ensure_dir(args.out)
 
-    rgb = read_image_rgb(args.image)
-    res = analyze_image(rgb)
+    options = {
+        "calibration": args.calibration,
+        "denoiser": args.denoiser,
+        "tile": args.tile,
+        "cascade": args.cascade,
+        "timings": args.timings,
+    }
 
-    rgb01 = to_float01(rgb)
-    overlay01 = make_heatmap_overlay(rgb01, res.heatmap01, alpha=0.45)
+    img = read_image(args.image, order="bgr", min_side=args.decode_min_side)
+    ctx = ImageContext(img.image, order=img.order)
+    res = None
+    feature_maps = None
+    if args.cache:
+        cache = open_cache(args.cache, max_bytes=args.cache_max_mb << 20)
+        key_options = {**options, "decode_min_side": args.decode_min_side} if args.decode_min_side else options
+        key = cache.key(bytes_digest(img.data), key_options)
+        res = cache.get(key, calibration=args.calibration)
+        if res is not None and args.roi:
+            feature_maps = cache.get_maps(key)
+            res = res if feature_maps is not None else None
+    if res is None:
+        res = analyze_image(ctx, retain=bool(args.roi), **options)
+        feature_maps = res.feature_maps
+        if args.cache:
+            cache.put(key, res)
+            if feature_maps is not None:
+                cache.put_maps(key, feature_maps)
 
     base = os.path.splitext(os.path.basename(args.image))[0]
-    out_overlay = os.path.join(args.out, f"{base}_truthlens_heatmap.png")
+    out_overlay = overlay_path(os.path.join(args.out, f"{base}_truthlens_heatmap"), args.overlay_format).as_posix()
     out_json = os.path.join(args.out, f"{base}_truthlens_report.json")
 
-    save_rgb01(out_overlay, overlay01)
+    write_overlay(out_overlay, ctx.native8, res.heatmap01, alpha=0.45, fmt=args.overlay_format,
+                  quality=args.overlay_quality, max_side=args.overlay_max_side, order=ctx.order)
 
     report = {
         "verdict": res.verdict,
@@ -44,6 +85,28 @@ def main() -> None:
         "scores": res.scores,
         "outputs": {"heatmap_overlay": out_overlay},
     }
+    if img.scale > 1:
+        report["decode_scale"] = img.scale
+
+    regions = []
+    for i, box in enumerate(args.roi):
+        box = tuple(round(v / img.scale) for v in box)  # decoded pixels
+        r = analyze_region(feature_maps, box, calibration=args.calibration)
+        x, y, w, h = r.scores["region"]
+        roi_overlay = overlay_path(os.path.join(args.out, f"{base}_truthlens_roi{i}"), args.overlay_format).as_posix()
+        write_overlay(roi_overlay, ctx.native8[y:y + h, x:x + w], r.heatmap01, alpha=0.45, fmt=args.overlay_format,
+                      quality=args.overlay_quality, max_side=args.overlay_max_side, order=ctx.order)
+        regions.append({
+            "region": [x, y, w, h],
+            "verdict": r.verdict,
+            "confidence": round(r.confidence, 4),
+            "ai_likelihood": round(r.ai_likelihood, 4),
+            "evidence": r.evidence,
+            "scores": {k: r.scores[k] for k in ("spectrum", "noise", "repetition", "edges")},
+            "heatmap_overlay": roi_overlay,
+        })
+    if regions:
+        report["regions"] = regions
 
     with open(out_json, "w", encoding="utf-8") as f:
         json.dump(report, f, indent=2, ensure_ascii=False)
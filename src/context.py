@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from functools import cached_property
+
+import numpy as np
+import cv2
+
+from .utils import to_float01, rgb_to_gray01
+
+
+class ImageContext:
+    """
+    One image plus its derived representations, each computed on first use
+    and then shared by every extractor / output that needs it:
+
+      rgb8    uint8 RGB
+      rgb01   float32 RGB in [0, 1]
+      gray01  float32 BT.601 gray in [0, 1]
+      gray8   uint8 gray (truncated from gray01, as the extractors always did)
+      small_gray(max_side)  INTER_AREA-downscaled gray01 for patch search
+
+    stages holds extractor results that quick_scores leaves for a later
+    analyze_image on the same context, which takes them out again.
+
+    The source may be uint8 or float RGB, or a 2D gray array (then only the
+    gray representations exist). A uint8 source is always scaled by 1/255, in
+    a single pass without to_float01's max() scan and clip. Values equal
+    to_float01's except for (near-black) uint8 images with max <= 1, which
+    to_float01 would take as already in [0, 1].
+
+    order="bgr" takes the source as OpenCV decoded it. rgb01 is then a
+    channel-reversed view and the gray images are bit-identical to the RGB
+    path; only rgb8 costs a cvtColor copy, made when something needs it.
+    Channel-order-agnostic consumers use native8 / native01 instead.
+    """
+
+    def __init__(self, image: np.ndarray, order: str = "rgb"):
+        if image.ndim not in (2, 3):
+            raise ValueError(f"Expected an HxW or HxWx3 image, got shape {image.shape}")
+        if order not in ("rgb", "bgr"):
+            raise ValueError(f"Unknown channel order: {order}")
+        self.source = image
+        self.order = order
+        self._small: dict[int, np.ndarray] = {}
+        self.stages: dict[tuple, dict] = {}  # (stage name, maps, retain) -> extractor dict
+
+    @classmethod
+    def of(cls, image: np.ndarray | ImageContext) -> ImageContext:
+        return image if isinstance(image, ImageContext) else cls(image)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.source.shape[:2]
+
+    @property
+    def is_gray(self) -> bool:
+        return self.source.ndim == 2
+
+    def _need_rgb(self) -> None:
+        if self.is_gray:
+            raise ValueError("RGB representation requested from a gray-only ImageContext")
+
+    @cached_property
+    def native8(self) -> np.ndarray:
+        """uint8 color image in the source's channel order."""
+        self._need_rgb()
+        if self.source.dtype == np.uint8:
+            return self.source
+        return (np.clip(self.native01, 0, 1) * 255.0).astype(np.uint8)
+
+    @cached_property
+    def native01(self) -> np.ndarray:
+        """float32 [0, 1] color image in the source's channel order."""
+        self._need_rgb()
+        if self.source.dtype == np.uint8:
+            return np.divide(self.source, np.float32(255.0), dtype=np.float32)
+        return to_float01(self.source)
+
+    @cached_property
+    def rgb8(self) -> np.ndarray:
+        if self.order == "bgr":
+            return cv2.cvtColor(self.native8, cv2.COLOR_BGR2RGB)
+        return self.native8
+
+    @cached_property
+    def rgb01(self) -> np.ndarray:
+        if self.order == "bgr":
+            return self.native01[..., ::-1]
+        return self.native01
+
+    @cached_property
+    def gray01(self) -> np.ndarray:
+        if self.is_gray:
+            if self.source.dtype == np.uint8:
+                return np.divide(self.source, np.float32(255.0), dtype=np.float32)
+            return self.source  # float gray is taken as-is, as the extractors always did
+        return rgb_to_gray01(self.rgb01)
+
+    @cached_property
+    def gray8(self) -> np.ndarray:
+        if self.is_gray and self.source.dtype == np.uint8:
+            return self.source
+        return (np.clip(self.gray01, 0, 1) * 255).astype(np.uint8)
+
+    def small_gray(self, max_side: int = 512) -> np.ndarray:
+        if max_side not in self._small:
+            from .artifacts.patch_repetition import downscale_for_repetition
+
+            self._small[max_side] = downscale_for_repetition(self.gray01, max_side)
+        return self._small[max_side]
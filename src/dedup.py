@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+from .utils import pack_strings, unpack_strings
+
+
+def phash64(rgb: np.ndarray, order: str = "rgb") -> int:
+    """
+    64-bit DCT perceptual hash: low 8x8 DCT block of a 32x32 gray thumbnail,
+    thresholded at its median. Survives recompression, rescaling and mild crops.
+    order="bgr" hashes a BGR image to the same value as its RGB version.
+    """
+    small = cv2.resize(rgb, (32, 32), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY if order == "bgr" else cv2.COLOR_RGB2GRAY)
+    dct = cv2.dct(small.astype(np.float32))[:8, :8].ravel()
+    bits = dct > np.median(dct[1:])  # DC term would skew the median
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class DuplicateIndex:
+    """
+    Near-duplicate lookup over 64-bit perceptual hashes (multi-index hashing).
+
+    Each hash is split into `bands` equal chunks and every chunk is kept in a
+    sorted array. By pigeonhole, two hashes within Hamming distance d share a
+    chunk that differs in at most d // bands bits, so a query only needs a few
+    binary searches per band plus a popcount over the (few) candidates -
+    lookups stay well under a millisecond with millions of entries.
+
+    Entries are (hash, key, ref, sig): key identifies the image, ref points to
+    its report and sig names the settings that produced it ("" = unknown).
+    Fresh inserts go to a small pending buffer; every merge_every inserts it
+    is sorted and merged into the sorted arrays (O(N) per merge, no re-sort).
+    """
+
+    def __init__(self, bands: int = 4, merge_every: int = 4096):
+        if 64 % bands:
+            raise ValueError("bands must divide 64")
+        self.bands = bands
+        self.merge_every = merge_every
+        self._bits = 64 // bands
+        self._mask = np.uint64((1 << self._bits) - 1)
+
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.keys: list[str] = []
+        self.refs: list[str] = []
+        self.sigs: list[str] = []
+        self._sorted_vals: list[np.ndarray] = []
+        self._sorted_idx: list[np.ndarray] = []
+        self._pending: list[int] = []
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self._pending)
+
+    @property
+    def max_exact_distance(self) -> int:
+        """Largest distance for which query() is guaranteed to find every match."""
+        return 2 * self.bands - 1
+
+    def _band(self, h: np.ndarray | np.uint64, b: int):
+        return (h >> np.uint64(b * self._bits)) & self._mask
+
+    def _rebuild(self) -> None:
+        self._sorted_vals, self._sorted_idx = [], []
+        for b in range(self.bands):
+            vals = self._band(self.hashes, b)
+            order = np.argsort(vals, kind="stable")
+            self._sorted_vals.append(vals[order])
+            self._sorted_idx.append(order)
+
+    def _merge_pending(self) -> None:
+        if not self._pending:
+            return
+        new = np.array(self._pending, dtype=np.uint64)
+        base = len(self.hashes)
+        self.hashes = np.concatenate([self.hashes, new])
+        self._pending = []
+        for b in range(self.bands):
+            vals = self._band(new, b)
+            order = np.argsort(vals, kind="stable")
+            vals = vals[order]
+            # after equal values, as a stable re-sort of all entries would put them
+            at = np.searchsorted(self._sorted_vals[b], vals, side="right")
+            self._sorted_vals[b] = np.insert(self._sorted_vals[b], at, vals)
+            self._sorted_idx[b] = np.insert(self._sorted_idx[b], at, order + base)
+
+    def add(self, h: int, key: str, ref: str = "", sig: str = "") -> None:
+        self._pending.append(h)
+        self.keys.append(key)
+        self.refs.append(ref)
+        self.sigs.append(sig)
+        if len(self._pending) >= self.merge_every:
+            self._merge_pending()
+
+    def update(self, i: int, ref: str, sig: str = "") -> None:
+        """Points entry i (its position in keys) at a newer report."""
+        self.refs[i] = ref
+        self.sigs[i] = sig
+
+    def query(self, h: int, max_distance: int = 6, sig: str | None = None) -> list[tuple[str, str, int]]:
+        """
+        Returns [(key, ref, distance)] within max_distance, sorted by distance.
+        sig: only entries added with this sig.
+
+        Up to bands - 1 only exact chunk matches are probed; beyond that every
+        chunk value within 1 bit is probed too, which keeps recall exact up to
+        max_exact_distance (2 * bands - 1).
+        """
+        q = np.uint64(h)
+        flips = max_distance >= self.bands
+
+        cand = []
+        for b in range(self.bands):
+            v = self._band(q, b)
+            probes = np.array([v], dtype=np.uint64)
+            if flips:
+                probes = np.concatenate([probes, v ^ (np.uint64(1) << np.arange(self._bits, dtype=np.uint64))])
+            lo = np.searchsorted(self._sorted_vals[b], probes, side="left")
+            hi = np.searchsorted(self._sorted_vals[b], probes, side="right")
+            cand += [self._sorted_idx[b][a:z] for a, z in zip(lo, hi) if z > a]
+        idx = np.unique(np.concatenate(cand)) if cand else np.zeros(0, dtype=np.int64)
+        dist = np.bitwise_count(self.hashes[idx] ^ q)
+
+        out = [(int(i), int(d)) for i, d in zip(idx, dist) if d <= max_distance]
+
+        # pending inserts: linear scan, bounded by merge_every
+        if self._pending:
+            pend = np.bitwise_count(np.array(self._pending, dtype=np.uint64) ^ q)
+            base = len(self.hashes)
+            out += [(base + int(i), int(pend[i])) for i in np.flatnonzero(pend <= max_distance)]
+
+        if sig is not None:
+            out = [t for t in out if self.sigs[t[0]] == sig]
+        out.sort(key=lambda t: (t[1], t[0]))
+        return [(self.keys[i], self.refs[i], d) for i, d in out]
+
+    def save(self, path: str | Path) -> None:
+        self._merge_pending()
+        path = Path(path)
+        key_blob, key_off = pack_strings(self.keys)
+        ref_blob, ref_off = pack_strings(self.refs)
+        sig_blob, sig_off = pack_strings(self.sigs)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                bands=np.array(self.bands),
+                hashes=self.hashes,
+                key_blob=key_blob,
+                key_off=key_off,
+                ref_blob=ref_blob,
+                ref_off=ref_off,
+                sig_blob=sig_blob,
+                sig_off=sig_off,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "DuplicateIndex":
+        with np.load(path) as z:
+            index = cls(bands=int(z["bands"]))
+            index.hashes = z["hashes"].astype(np.uint64)
+            index.keys = unpack_strings(z["key_blob"], z["key_off"])
+            index.refs = unpack_strings(z["ref_blob"], z["ref_off"])
+            # indexes saved before sigs existed match no sig
+            index.sigs = unpack_strings(z["sig_blob"], z["sig_off"]) if "sig_blob" in z else [""] * len(index.keys)
+        index._rebuild()
+        return index
+
+    @classmethod
+    def open(cls, path: str | Path, bands: int = 4) -> "DuplicateIndex":
+        return cls.load(path) if Path(path).exists() else cls(bands=bands)
@@ -5,8 +5,12 @@ Utilities for visual and human-readable explanations,
 including heatmaps and forensic reports.
 """
 
-from .heatmap import make_heatmap_overlay
+from .heatmap import make_heatmap_overlay, make_heatmap_overlay8
+from .writer import OverlayWriter, write_overlay
 
 __all__ = [
     "make_heatmap_overlay",
+    "make_heatmap_overlay8",
+    "OverlayWriter",
+    "write_overlay",
 ]
@@ -13,3 +13,45 @@ def make_heatmap_overlay(rgb01: np.ndarray, heat01: np.ndarray, alpha: float = 0
     base = rgb01.astype(np.float32)
     out = (1 - alpha) * base + alpha * heat_color
     return np.clip(out, 0.0, 1.0)
+
+
+def make_heatmap_overlay8(
+    rgb8: np.ndarray,
+    heat01: np.ndarray,
+    alpha: float = 0.45,
+    max_side: int | None = None,
+    bgr: bool = False,
+    order: str = "rgb",
+) -> np.ndarray:
+    """
+    uint8 version of make_heatmap_overlay: no float32 full-frame temporaries
+    (min-max scaling, colormap and blend all run on uint8).
+    max_side: downscale image + heatmap first (INTER_AREA).
+    A heatmap of another size (e.g. a full-res one over a preview) is
+    resized to the image.
+    bgr=True returns BGR, ready for cv2.imwrite without another conversion.
+    order="bgr": rgb8 is BGR (as decoded by OpenCV).
+    """
+    h, w = rgb8.shape[:2]
+    if max_side and max(h, w) > max_side:
+        s = max_side / max(h, w)
+        rgb8 = cv2.resize(rgb8, (max(1, round(w * s)), max(1, round(h * s))), interpolation=cv2.INTER_AREA)
+    if heat01.shape[:2] != rgb8.shape[:2]:
+        heat01 = cv2.resize(heat01, (rgb8.shape[1], rgb8.shape[0]), interpolation=cv2.INTER_AREA)
+
+    mn, mx, _, _ = cv2.minMaxLoc(heat01)
+    if mx - mn < 1e-8:
+        heat8 = np.zeros(heat01.shape, dtype=np.uint8)
+    else:
+        heat8 = cv2.convertScaleAbs(heat01, alpha=255.0 / (mx - mn), beta=-mn * 255.0 / (mx - mn))
+    heat_color = cv2.applyColorMap(heat8, cv2.COLORMAP_JET)  # BGR
+
+    if bgr == (order == "bgr"):
+        base = rgb8
+    elif bgr:
+        base = cv2.cvtColor(rgb8, cv2.COLOR_RGB2BGR)
+    else:
+        base = cv2.cvtColor(rgb8, cv2.COLOR_BGR2RGB)
+    if not bgr:
+        cv2.cvtColor(heat_color, cv2.COLOR_BGR2RGB, dst=heat_color)
+    return cv2.addWeighted(base, 1.0 - alpha, heat_color, alpha, 0.0)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+from .heatmap import make_heatmap_overlay8
+
+# format -> (file suffix, cv2 quality flag)
+OVERLAY_FORMATS = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION),
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def encode_params(fmt: str = "png", quality: int | None = None) -> list[int]:
+    """
+    cv2.imwrite params. quality is the PNG compression level (0-9) for png,
+    the 0-100 quality for jpg / webp; None keeps OpenCV's default.
+    """
+    if fmt not in OVERLAY_FORMATS:
+        raise ValueError(f"Unknown overlay format: {fmt} (choose from {', '.join(OVERLAY_FORMATS)})")
+    return [] if quality is None else [OVERLAY_FORMATS[fmt][1], int(quality)]
+
+
+def overlay_path(stem: str | Path, fmt: str = "png") -> Path:
+    """stem + the suffix of fmt, e.g. out/overlays/img_heatmap -> .../img_heatmap.webp"""
+    stem = Path(stem)
+    return stem.with_name(stem.name + OVERLAY_FORMATS[fmt][0])
+
+
+def write_overlay(
+    path: str | Path,
+    rgb8: np.ndarray,
+    heat01: np.ndarray,
+    alpha: float = 0.45,
+    fmt: str = "png",
+    quality: int | None = None,
+    max_side: int | None = None,
+    order: str = "rgb",
+) -> None:
+    """order="bgr": rgb8 is BGR as decoded by OpenCV (then no conversion is needed at all)."""
+    bgr8 = make_heatmap_overlay8(rgb8, heat01, alpha=alpha, max_side=max_side, bgr=True, order=order)
+    if not cv2.imwrite(str(path), bgr8, encode_params(fmt, quality)):
+        raise OSError(f"Cannot write overlay: {path}")
+
+
+class OverlayWriter:
+    """
+    Composes and encodes overlays on background threads (OpenCV releases the
+    GIL for both), so PNG / JPEG / WebP encoding overlaps the next analysis.
+
+    At most max_pending overlays are queued; submit() blocks beyond that, so
+    the source frames held by pending jobs stay bounded. Failures do not
+    raise in submit(); close() waits for everything and returns them as
+    (path, error) pairs.
+    """
+
+    def __init__(
+        self,
+        fmt: str = "png",
+        quality: int | None = None,
+        max_side: int | None = None,
+        workers: int = 2,
+        max_pending: int = 8,
+    ):
+        encode_params(fmt, quality)  # validate early
+        self.fmt = fmt
+        self.quality = quality
+        self.max_side = max_side
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="overlay")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self.errors: list[tuple[str, str]] = []
+
+    def path_for(self, stem: str | Path) -> Path:
+        return overlay_path(stem, self.fmt)
+
+    def submit(
+        self, path: str | Path, rgb8: np.ndarray, heat01: np.ndarray, alpha: float = 0.45, order: str = "rgb"
+    ) -> None:
+        self._slots.acquire()
+        fut = self._pool.submit(
+            write_overlay, path, rgb8, heat01, alpha, self.fmt, self.quality, self.max_side, order
+        )
+        fut.add_done_callback(lambda f, p=str(path): self._done(p, f))
+
+    def _done(self, path: str, fut: Future) -> None:
+        self._slots.release()
+        with self._lock:
+            if fut.exception() is not None:
+                self.errors.append((path, str(fut.exception())))
+
+    def close(self) -> list[tuple[str, str]]:
+        self._pool.shutdown(wait=True)
+        return self.errors
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from .utils import pack_strings, unpack_strings
+
+STORE_FORMAT = 3
+
+# Store column -> (scores section, key) of TruthLensResult.scores
+FEATURES = {
+    "spectrum_slope": ("spectrum", "slope"),
+    "spectrum_resid_std": ("spectrum", "resid_std"),
+    "spectrum_score": ("spectrum", "score"),
+    "noise_resid_mean": ("noise", "resid_mean"),
+    "noise_resid_std": ("noise", "resid_std"),
+    "noise_resid_corr_1px": ("noise", "resid_corr_1px"),
+    "noise_resid_corr_v1px": ("noise", "resid_corr_v1px"),
+    "noise_resid_corr_diag": ("noise", "resid_corr_diag"),
+    "noise_resid_corr_2px": ("noise", "resid_corr_2px"),
+    "noise_resid_period": ("noise", "resid_period"),
+    "noise_resid_period_peak": ("noise", "resid_period_peak"),
+    "noise_score": ("noise", "score"),
+    "repetition_max_sim": ("repetition", "max_sim"),
+    "repetition_p95_sim": ("repetition", "p95_sim"),
+    "repetition_score": ("repetition", "score"),
+    "edges_lap_var": ("edges", "lap_var"),
+    "edges_score": ("edges", "score"),
+}
+
+
+def raw_features(scores: dict) -> dict[str, float | None]:
+    """The FEATURES of one result's scores; None for stats of cascade-skipped stages."""
+    out = {}
+    for col, (section, key) in FEATURES.items():
+        v = scores.get(section, {}).get(key)
+        out[col] = float(v) if v is not None else None
+    return out
+
+
+class FeatureStore:
+    """
+    Raw per-extractor features of a batch run, one row per analyzed image,
+    kept column-wise so rescoring works on whole columns at once.
+
+    On disk: a single .npz with a float64 matrix [N, len(FEATURES)] (NaN for
+    stats of skipped stages), the verdict each image got at analysis time
+    and packed image / split / category strings. meta records what the
+    features depend on (denoiser, code version, ...).
+    """
+
+    def __init__(self, meta: dict | None = None):
+        self.meta = dict(meta or {})
+        self.columns = list(FEATURES)
+        self._values = array("d")
+        self.images: list[str] = []
+        self.splits: list[str] = []
+        self.categories: list[str] = []
+        self.verdicts: list[str] = []
+        self._matrix: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def add(self, image: str, split: str, category: str, verdict: str, features: dict) -> None:
+        self._values.extend(np.nan if features.get(c) is None else features[c] for c in self.columns)
+        self.images.append(image)
+        self.splits.append(split)
+        self.categories.append(category)
+        self.verdicts.append(verdict)
+        self._matrix = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.frombuffer(self._values, dtype=np.float64).reshape(-1, len(self.columns))
+        return self._matrix
+
+    def column(self, name: str) -> np.ndarray:
+        return self.matrix[:, self.columns.index(name)]
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        strings = {}
+        for name in ("images", "splits", "categories", "verdicts"):
+            strings[f"{name}_blob"], strings[f"{name}_off"] = pack_strings(getattr(self, name))
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                format=np.array(STORE_FORMAT),
+                meta=np.array(json.dumps(self.meta, sort_keys=True)),
+                columns=np.array(self.columns),
+                features=self.matrix,
+                **strings,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FeatureStore":
+        with np.load(path) as z:
+            if int(z["format"]) != STORE_FORMAT:
+                raise ValueError(f"Unsupported feature store format in {path}")
+            store = cls(json.loads(str(z["meta"])))
+            store.columns = [str(c) for c in z["columns"]]
+            store._values = array("d", z["features"].astype(np.float64).tobytes())
+            for name in ("images", "splits", "categories", "verdicts"):
+                setattr(store, name, unpack_strings(z[f"{name}_blob"], z[f"{name}_off"]))
+        return store
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import numpy as np
+import cv2
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# libjpeg decodes at 1/2, 1/4 or 1/8 scale in the DCT domain: far less work
+# than a full decode followed by a resize
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# SOFn markers carrying the frame size (not DHT / JPG / DAC, which share the range)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass
+class DecodedImage:
+    image: np.ndarray  # uint8 HxWx3 in `order`
+    order: str  # "rgb" | "bgr"
+    scale: int  # 1, or the reduced JPEG decode factor
+    data: bytes  # the file bytes, e.g. for content hashing without a second read
+    decode_ms: float
+
+
+def jpeg_size(data: bytes) -> tuple[int, int] | None:
+    """(h, w) from the JPEG frame header, None if data is not a JPEG (or the header is cut off)."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 9 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # segments without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            return int.from_bytes(data[i + 5:i + 7], "big"), int.from_bytes(data[i + 7:i + 9], "big")
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def reduced_scale(data: bytes, min_side: int | None) -> int:
+    """
+    Largest JPEG reduction factor that keeps the decoded long side >= min_side;
+    1 for non-JPEGs (OpenCV would decode them fully and resize anyway) and
+    when min_side is None.
+    """
+    if not min_side:
+        return 1
+    size = jpeg_size(data)
+    if size is None:
+        return 1
+    long_side = max(size)
+    for k in (8, 4, 2):
+        if -(-long_side // k) >= min_side:
+            return k
+    return 1
+
+
+def decode_image(data: bytes, order: str = "rgb", min_side: int | None = None) -> tuple[np.ndarray, int]:
+    """
+    Decodes encoded image bytes to uint8 HxWx3. order="bgr" returns OpenCV's
+    native layout and skips the BGR -> RGB copy. min_side enables reduced
+    JPEG decoding (see reduced_scale); results then differ from a full
+    decode, so callers opt in per analysis profile. Returns (image, scale).
+    """
+    if order not in ("rgb", "bgr"):
+        raise ValueError(f"Unknown channel order: {order}")
+    scale = reduced_scale(data, min_side)
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _REDUCED_FLAGS.get(scale, cv2.IMREAD_COLOR))
+    if img is None:
+        raise ValueError("Cannot decode image")
+    if order == "rgb":
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+    return img, scale
+
+
+def read_image(path: str | Path, order: str = "rgb", min_side: int | None = None) -> DecodedImage:
+    t0 = time.perf_counter()
+    try:
+        data = Path(path).read_bytes()
+        img, scale = decode_image(data, order, min_side)
+    except (OSError, ValueError) as e:
+        raise FileNotFoundError(f"Cannot read image: {path} ({e})") from e
+    return DecodedImage(img, order, scale, data, (time.perf_counter() - t0) * 1e3)
+
+
+def prefetch(
+    items: Iterable[T],
+    load: Callable[[T], R],
+    depth: int = 4,
+    workers: int = 2,
+) -> Iterator[tuple[T, R | None, BaseException | None]]:
+    """
+    Yields (item, load(item), None) in input order while background threads
+    already load the next `depth` items (OpenCV decodes without the GIL, so
+    decoding overlaps whatever the consumer does meanwhile). A failed load
+    yields (item, None, error) instead of raising.
+    """
+    if depth <= 0:
+        for item in items:
+            try:
+                yield item, load(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    it = iter(items)
+    window: deque[tuple[T, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch") as pool:
+        try:
+            for item in it:
+                window.append((item, pool.submit(load, item)))
+                if len(window) > depth:
+                    yield _resolve(*window.popleft())
+            while window:
+                yield _resolve(*window.popleft())
+        finally:
+            for _, fut in window:
+                fut.cancel()
+
+
+def _resolve(item, fut: Future) -> tuple:
+    err = fut.exception()
+    return (item, None, err) if err is not None else (item, fut.result(), None)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+
+class RunManifest:
+    """
+    Append-only journal of finished batch_run images, used to resume / skip work.
+
+    One JSON line per completed image:
+      {"image": rel, "size": ..., "mtime_ns": ..., "options": sig, "row": {...}}
+    The last line for an image wins, so re-analyzing just appends. Lines are
+    flushed (and fsync'ed) every checkpoint_every appends; a torn last line
+    from a crash is ignored on load. compact() rewrites the journal with one
+    line per live image, dropping deleted files.
+    """
+
+    def __init__(self, path: str | Path, options: str, checkpoint_every: int = 50):
+        self.path = Path(path)
+        self.options = options
+        self.checkpoint_every = checkpoint_every
+        self.entries: dict[str, dict] = {}
+        self._f = None
+        self._unflushed = 0
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from an interrupted run
+                    self.entries[e["image"]] = e
+
+    def lookup(self, rel: str, st: os.stat_result) -> dict | None:
+        """Previous row for rel if the file and the analysis options are unchanged."""
+        e = self.entries.get(rel)
+        if (
+            e is None
+            or e["size"] != st.st_size
+            or e["mtime_ns"] != st.st_mtime_ns
+            or e["options"] != self.options
+            or e["row"].get("verdict") == "ERROR"  # failures are retried
+        ):
+            return None
+        return e["row"]
+
+    def record(self, rel: str, st: os.stat_result, row: dict) -> None:
+        e = {"image": rel, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "options": self.options, "row": row}
+        self.entries[rel] = e
+        if self._f is None:
+            self._f = open(self.path, "a", encoding="utf-8")
+        self._f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        self._unflushed += 1
+        if self._unflushed >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        if self._f is not None and self._unflushed:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._unflushed = 0
+
+    def close(self) -> None:
+        self.checkpoint()
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def compact(self, live: set[str]) -> None:
+        """Rewrites the journal keeping only the latest entry of each live image."""
+        self.close()
+        self.entries = {k: e for k, e in self.entries.items() if k in live}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in self.entries.values():
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import cv2
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def default_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def _init_worker() -> None:
+    # One OpenCV thread per process: the pool already fills every core,
+    # nested cv2 threading would only oversubscribe them.
+    cv2.setNumThreads(1)
+
+
+def bounded_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 1,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    on_crash: Callable[[T, BaseException], R] | None = None,
+) -> Iterator[R]:
+    """
+    Lazily maps fn over items, yielding results as they become available.
+
+    workers <= 1 runs inline (no pool, no pickling). Otherwise a process pool
+    is used and at most max_in_flight items (default: 2 * workers) are
+    submitted at any time, so huge inputs never queue up in memory.
+    ordered=True yields in input order, False yields as-completed.
+
+    fn must be a picklable top-level function and should handle its own
+    per-item errors; an exception escaping fn aborts the whole map.
+    A worker process dying (OOM kill, segfault) breaks the whole pool: with
+    on_crash, every item still in flight then yields on_crash(item, error)
+    (those that had already finished yield their result), a fresh pool is
+    started and the map goes on. Without it, BrokenProcessPool is raised.
+    """
+    if workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    limit = max(1, max_in_flight or 2 * workers)
+    it = iter(items)
+    pending: deque[tuple[T, Future]] = deque()
+    exhausted = False
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def submit(item: T) -> Future:
+        try:
+            return pool.submit(fn, item)
+        except BrokenProcessPool as e:  # broke before the item got in
+            fut: Future = Future()
+            fut.set_exception(e)
+            return fut
+
+    pool = new_pool()
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, submit(item)))
+            if not pending:
+                return
+
+            try:
+                if ordered:
+                    res = pending[0][1].result()
+                    pending.popleft()
+                    yield res
+                else:
+                    done, _ = wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                    for entry in [e for e in pending if e[1] in done]:
+                        res = entry[1].result()
+                        pending.remove(entry)
+                        yield res
+            except BrokenProcessPool as e:
+                if on_crash is None:
+                    raise
+                lost = list(pending)
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+                for item, fut in lost:
+                    if fut.done() and not fut.cancelled() and fut.exception() is None:
+                        yield fut.result()
+                    else:
+                        yield on_crash(item, e)
+    finally:
+        pool.shutdown()
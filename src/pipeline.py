@@ -2,16 +2,23 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator
 import numpy as np
 
-from .utils import to_float01, rgb_to_gray01, sigmoid, normalize01
+from .utils import read_image_rgb, sigmoid, normalize01
+from .parallel import bounded_map
+from .timing import StageTimer, timing_hooks
+from .context import ImageContext
+from .tiled import tiled_features
+from .batched import batched_features
 from .artifacts.spectrum_fft import spectrum_features
 from .artifacts.noise_residual import noise_residual_features
 from .artifacts.patch_repetition import patch_repetition_features
 from .artifacts.edge_stats import edge_features
+from .roi import FeatureMaps, region_features, clip_box
 
 # Dynamic calibration helpers (loaded if calibration.json exists)
-from .calibration import load_calibration, get_thresholds, verdict_from_likelihood
+from .calibration import CalibrationProvider, as_provider, get_thresholds, verdict_from_likelihood
 
 
 @dataclass
@@ -21,34 +28,258 @@ class TruthLensResult:
     ai_likelihood: float
     evidence: list[str]
     scores: dict
-    heatmap01: np.ndarray
+    heatmap01: np.ndarray | None  # None with analyze_image(maps=False)
+    feature_maps: FeatureMaps | None = None  # set by analyze_image(retain=True)
 
 
-def analyze_image(rgb: np.ndarray) -> TruthLensResult:
-    rgb01 = to_float01(rgb)
-    gray01 = rgb_to_gray01(rgb01)
+# Weighted combine (MVP weights)
+WEIGHTS = {"spectrum": 0.30, "noise": 0.30, "repetition": 0.25, "edges": 0.15}
 
-    spec = spectrum_features(gray01)
-    noi = noise_residual_features(rgb01)
-    rep = patch_repetition_features(gray01)
-    edg = edge_features(gray01)
+# ai_likelihood = sigmoid((combined - LIKELIHOOD_CENTER) * LIKELIHOOD_SLOPE)
+LIKELIHOOD_CENTER = 0.50
+LIKELIHOOD_SLOPE = 6.0
 
-    # Weighted combine (MVP weights)
-    w_spec, w_noi, w_rep, w_edg = 0.30, 0.30, 0.25, 0.15
-    combined = (
-        w_spec * spec["score"] +
-        w_noi  * noi["score"] +
-        w_rep  * rep["score"] +
-        w_edg  * edg["score"]
-    )
+# A stage is listed as evidence once its score exceeds EVIDENCE_MIN
+EVIDENCE_MIN = 0.55
+EVIDENCE = {
+    "spectrum": lambda f: f"Non-natural frequency spectrum (residual_std={f['resid_std']:.3f})",
+    "noise": lambda f: (
+        f"Suspicious noise residual (corr@1px={f['resid_corr_1px']:.2f}, resid_mean={f['resid_mean']:.4f}"
+        + (f", period={f['resid_period']:.0f}px)" if f.get("resid_period") else ")")
+    ),
+    "repetition": lambda f: f"Patch self-similarity / repetition (p95_sim={f['p95_sim']:.2f})",
+    "edges": lambda f: f"Edge statistics out of expected range (lap_var={f['lap_var']:.1f})",
+}
+NO_EVIDENCE = "No strong forensic artifacts detected by current heuristics (MVP)."
+
+# Heatmap = normalized weighted sum of these per-pixel maps
+HEATMAP_MAPS = (("noise", "resid_map", 0.45), ("repetition", "rep_map", 0.40), ("edges", "edge_map", 0.15))
+
+# Cascade: cheapest stages first; after the first _CASCADE_MIN stages the
+# remaining ones are skipped once they can no longer change the verdict.
+# An exit needs the stages that ran to carry enough weight: with WEIGHTS and
+# the default 0.30 / 0.70 thresholds that takes three (noise is dropped),
+# calibrated thresholds further from 0.5 also allow exits after two.
+_CASCADE_ORDER = ("edges", "spectrum", "repetition", "noise")
+_CASCADE_MIN = 2
 
+# Stat keys reported per stage (the rest of an extractor's dict is maps)
+_STAT_KEYS = {
+    "spectrum": ["slope", "resid_std", "score"],
+    "noise": [
+        "resid_mean", "resid_std", "resid_corr_1px", "resid_corr_v1px", "resid_corr_diag", "resid_corr_2px",
+        "resid_period", "resid_period_peak", "score", "denoiser",
+    ],
+    "repetition": ["max_sim", "p95_sim", "score"],
+    "edges": ["lap_var", "score"],
+}
+
+
+def _likelihood(combined: float) -> float:
     # Map to likelihood (smooth)
-    ai_likelihood = sigmoid((combined - 0.50) * 6.0)  # center around 0.5
-    ai_likelihood = float(np.clip(ai_likelihood, 0.0, 1.0))
+    ai_likelihood = sigmoid((combined - LIKELIHOOD_CENTER) * LIKELIHOOD_SLOPE)  # center around 0.5
+    return float(np.clip(ai_likelihood, 0.0, 1.0))
+
+
+def _likelihood_bounds(feats: dict[str, dict]) -> tuple[float, float]:
+    """ai_likelihood range reachable once the missing stages score anywhere in [0, 1]."""
+    partial = sum(WEIGHTS[k] * f["score"] for k, f in feats.items())
+    missing = sum(w for k, w in WEIGHTS.items() if k not in feats)
+    return _likelihood(partial), _likelihood(partial + missing)
+
+
+def quick_scores(rgb: np.ndarray | ImageContext, maps: bool = False) -> dict:
+    """
+    Stats of the cheap stages only (edges + spectrum, the first cascade
+    stages) and the ai_likelihood range they still leave open, for showing
+    something while the full analyze_image runs.
+    Given an ImageContext, the extractor results stay in its stages, so an
+    analyze_image(ctx, maps=maps) afterwards does not run them again.
+    """
+    ctx = ImageContext.of(rgb)
+    feats = {}
+    for name, run in (("edges", lambda: edge_features(ctx, maps=maps)), ("spectrum", lambda: spectrum_features(ctx))):
+        key = (name, maps, False)
+        feats[name] = ctx.stages[key] = ctx.stages.get(key) or run()
+    out = {name: {k: f[k] for k in _STAT_KEYS[name]} for name, f in feats.items()}
+    out["likelihood_bounds"] = list(_likelihood_bounds(feats))
+    return out
+
+
+def analyze_image(
+    rgb: np.ndarray | ImageContext,
+    calibration: CalibrationProvider | str | Path | dict | None = None,
+    denoiser: str = "nlmeans",
+    tile: int | None = None,
+    tile_overlap: int = 16,
+    cascade: bool = False,
+    timings: bool = False,
+    trace_memory: bool = False,
+    maps: bool = True,
+    retain: bool = False,
+) -> TruthLensResult:
+    """
+    rgb: uint8 / float RGB array, or an ImageContext to share its converted
+    representations with the caller (e.g. rgb01 for the overlay).
+    calibration: a CalibrationProvider, a calibration dict / json path, or None
+    for the process-wide provider backed by out/calibration.json.
+    denoiser: noise residual backend, see artifacts.noise_residual.DENOISERS.
+    tile: images with a side above this many px are analyzed tile by tile
+    (see tiled.tiled_features) so peak memory is bounded by the tile size.
+    cascade: run edges + spectrum first and skip repetition / noise once the
+    verdict is fixed whatever they score. Skipped stages are listed in
+    scores["cascade"] and their stats (score included) are None; the combined
+    score is the weighted mean over the stages that ran, one of the values
+    the exit allowed for, so the verdict is the one it was based on.
+    Not applied in tiled mode.
+    timings: record per-stage wall time under scores["timings"] (see
+    timing.STAGES); trace_memory adds per-stage peak allocated bytes. Also
+    enabled by registering a timing.add_timing_hook().
+    maps=False: scores only. Extractors skip their per-pixel maps (and the
+    upsampling back to full size), heatmap01 is None; scores are unchanged.
+    retain: keep the extractors' intermediate maps in result.feature_maps so
+    regions can be re-scored later with analyze_region. All stages then run
+    (no cascade skipping); not available in tiled mode.
+    """
+    hooks = timing_hooks()
+    timer = StageTimer(enabled=timings or trace_memory or bool(hooks), trace_memory=trace_memory)
+    calib = as_provider(calibration).get()
+    ctx = ImageContext.of(rgb)
+
+    if tile is not None and max(ctx.shape) > tile:
+        if retain:
+            raise ValueError("retain=True is not supported for tiled analysis")
+        with timer.stage("tiled"):
+            rgb_src = ctx.source if ctx.order == "rgb" else ctx.source[..., ::-1]
+            spec, noi, rep, edg, heat = tiled_features(
+                rgb_src, tile=tile, overlap=tile_overlap, denoiser=denoiser, maps=maps
+            )
+        with timer.stage("summarize"):
+            res = _summarize(spec, noi, rep, edg, heat, calib)
+        return _finish(res, timer, hooks)
+
+    with timer.stage("preprocess"):
+        ctx.gray8  # builds rgb01 and gray01 on the way
+
+    stages = {
+        "spectrum": lambda: spectrum_features(ctx),
+        "noise": lambda: noise_residual_features(ctx, denoiser=denoiser, maps=maps, retain=retain),
+        "repetition": lambda: patch_repetition_features(ctx, maps=maps, retain=retain),
+        "edges": lambda: edge_features(ctx, maps=maps, retain=retain),
+    }
+    likely_real_max, likely_ai_min = get_thresholds(calib)
+
+    feats: dict[str, dict] = {}
+    skipped: list[str] = []
+    for i, name in enumerate(_CASCADE_ORDER):
+        if cascade and not retain and i >= _CASCADE_MIN:
+            lo, hi = _likelihood_bounds(feats)
+            if (verdict_from_likelihood(lo, likely_real_max, likely_ai_min)[0] ==
+                    verdict_from_likelihood(hi, likely_real_max, likely_ai_min)[0]):
+                skipped = list(_CASCADE_ORDER[i:])
+                break
+        with timer.stage(name):
+            # left by quick_scores on this context, if it ran with the same options
+            feats[name] = ctx.stages.pop((name, maps, retain), None) or stages[name]()
+
+    for name in skipped:
+        feats[name] = {k: None for k in _STAT_KEYS[name]}
+
+    # Heatmap: combine artifact maps
+    heat = None
+    if maps:
+        with timer.stage("heatmap_combine"):
+            heat = np.zeros(ctx.shape, dtype=np.float32)
+            for name, key, wt in HEATMAP_MAPS:
+                if name not in skipped:
+                    heat += wt * feats[name][key]
+        with timer.stage("heatmap_normalize"):
+            heat = normalize01(heat)
+
+    with timer.stage("summarize"):
+        res = _summarize(feats["spectrum"], feats["noise"], feats["repetition"], feats["edges"], heat, calib)
+    if cascade:
+        bounds = _likelihood_bounds({k: f for k, f in feats.items() if k not in skipped})
+        res.scores["cascade"] = {
+            "early_exit": bool(skipped),
+            "skipped": skipped,
+            "likelihood_bounds": [round(bounds[0], 4), round(bounds[1], 4)],
+        }
+    if retain:
+        res.feature_maps = FeatureMaps.from_features(ctx.gray01, feats["noise"], feats["repetition"], feats["edges"])
+    return _finish(res, timer, hooks)
+
+
+def analyze_region(
+    feature_maps: FeatureMaps,
+    box: tuple[int, int, int, int],
+    calibration: CalibrationProvider | str | Path | dict | None = None,
+    maps: bool = True,
+) -> TruthLensResult:
+    """
+    Verdict, evidence and heatmap of the (x, y, w, h) region of an image
+    analyzed with retain=True, from its feature maps alone (milliseconds, no
+    denoising). Stats are restricted to the region, see roi.region_features;
+    the heatmap covers the region only. scores["region"] is the box clipped
+    to the image.
+    """
+    box = clip_box(box, feature_maps.shape)
+    spec, noi, rep, edg = region_features(feature_maps, box, maps=maps)
+    heat = None
+    if maps:
+        feats = {"noise": noi, "repetition": rep, "edges": edg}
+        heat = normalize01(sum(wt * feats[name][key] for name, key, wt in HEATMAP_MAPS))
+    res = _summarize(spec, noi, rep, edg, heat, as_provider(calibration).get())
+    res.scores["region"] = list(box)
+    return res
+
+
+def analyze_batch(
+    images: np.ndarray,
+    calibration: CalibrationProvider | str | Path | dict | None = None,
+    denoiser: str = "nlmeans",
+    maps: bool = True,
+) -> list[TruthLensResult]:
+    """
+    analyze_image over a stack of same-sized RGB images [N, H, W, 3] (e.g.
+    crawler thumbnails), vectorized across the stack (see
+    batched.batched_features). Returns one TruthLensResult per image,
+    identical to analyze_image(images[i], calibration, denoiser, maps=maps).
+    For tiling, cascade or timings use analyze_image.
+    """
+    calib = as_provider(calibration).get()
+    return [
+        _summarize(spec, noi, rep, edg, heat, calib)
+        for spec, noi, rep, edg, heat in batched_features(np.asarray(images), denoiser=denoiser, maps=maps)
+    ]
+
+
+def _finish(res: TruthLensResult, timer: StageTimer, hooks: list) -> TruthLensResult:
+    if timer.enabled:
+        res.scores["timings"] = timer.result()
+        for hook in hooks:
+            hook(res.scores["timings"], res)
+    return res
+
+
+def _summarize(
+    spec: dict,
+    noi: dict,
+    rep: dict,
+    edg: dict,
+    heat: np.ndarray | None,
+    calib: dict | None,
+) -> TruthLensResult:
+    w_spec, w_noi, w_rep, w_edg = (WEIGHTS[k] for k in ("spectrum", "noise", "repetition", "edges"))
+    feats = {"spectrum": spec, "noise": noi, "repetition": rep, "edges": edg}
+    ran = [k for k, f in feats.items() if f["score"] is not None]  # score None: skipped by the cascade
+    combined = sum(WEIGHTS[k] * feats[k]["score"] for k in ran)
+    if len(ran) < len(feats):
+        combined /= sum(WEIGHTS[k] for k in ran)
+
+    ai_likelihood = _likelihood(combined)
 
     # ---- Dynamic verdict rules (use calibration.json if available)
-    repo_root = Path(__file__).resolve().parents[1]  # TruthLens/
-    calib = load_calibration(repo_root)
     likely_real_max, likely_ai_min = get_thresholds(calib)
 
     verdict, confidence = verdict_from_likelihood(
@@ -59,36 +290,9 @@ def analyze_image(rgb: np.ndarray) -> TruthLensResult:
     confidence = float(np.clip(confidence, 0.0, 1.0))
 
     # Evidence (explainable)
-    evidence: list[str] = []
-    if spec["score"] > 0.55:
-        evidence.append(
-            f"Non-natural frequency spectrum (residual_std={spec['resid_std']:.3f})"
-        )
-    if noi["score"] > 0.55:
-        evidence.append(
-            f"Suspicious noise residual (corr@1px={noi['resid_corr_1px']:.2f}, resid_mean={noi['resid_mean']:.4f})"
-        )
-    if rep["score"] > 0.55:
-        evidence.append(
-            f"Patch self-similarity / repetition (max_sim={rep['max_sim']:.2f})"
-        )
-    if edg["score"] > 0.55:
-        evidence.append(
-            f"Edge statistics out of expected range (lap_var={edg['lap_var']:.1f})"
-        )
-
+    evidence = [EVIDENCE[k](feats[k]) for k in ran if feats[k]["score"] > EVIDENCE_MIN]
     if not evidence:
-        evidence.append(
-            "No strong forensic artifacts detected by current heuristics (MVP)."
-        )
-
-    # Heatmap: combine artifact maps
-    heat = (
-        0.45 * noi["resid_map"] +
-        0.40 * rep["rep_map"] +
-        0.15 * edg["edge_map"]
-    )
-    heat = normalize01(heat)
+        evidence.append(NO_EVIDENCE)
 
     scores = {
         "ai_likelihood": ai_likelihood,
@@ -104,10 +308,10 @@ def analyze_image(rgb: np.ndarray) -> TruthLensResult:
             "likely_ai_min": float(likely_ai_min),
             "has_calibration_file": bool(calib),
         },
-        "spectrum": spec,
-        "noise": {k: noi[k] for k in ["resid_mean", "resid_std", "resid_corr_1px", "score"]},
-        "repetition": {k: rep[k] for k in ["max_sim", "score"]},
-        "edges": {k: edg[k] for k in ["lap_var", "score"]},
+        "spectrum": {k: spec[k] for k in _STAT_KEYS["spectrum"]},
+        "noise": {k: noi[k] for k in _STAT_KEYS["noise"]},
+        "repetition": {k: rep[k] for k in _STAT_KEYS["repetition"]},
+        "edges": {k: edg[k] for k in _STAT_KEYS["edges"]},
     }
 
     return TruthLensResult(
@@ -118,3 +322,42 @@ def analyze_image(rgb: np.ndarray) -> TruthLensResult:
         scores=scores,
         heatmap01=heat,
     )
+
+
+def _analyze_path(task: tuple[str, dict]) -> tuple[str, TruthLensResult | None, str | None]:
+    path, kwargs = task
+    try:
+        return path, analyze_image(read_image_rgb(path), **kwargs), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _crashed_path(task: tuple[str, dict], err: BaseException) -> tuple[str, None, str]:
+    return task[0], None, f"worker process died: {err}"
+
+
+def analyze_many(
+    paths: Iterable[str | Path],
+    workers: int = 1,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    **options,
+) -> Iterator[tuple[str, TruthLensResult | None, str | None]]:
+    """
+    Streams (path, result, error) for each image path.
+
+    Exactly one of result / error is set; a failing image never stops the run,
+    nor does a crashing worker process (its in-flight images get an error).
+    With workers > 1 images are analyzed in a process pool with at most
+    max_in_flight images queued (see parallel.bounded_map).
+    options are forwarded to analyze_image and sent to the workers, so they
+    must be picklable (e.g. calibration as a dict or json path, not a provider).
+    """
+    return bounded_map(
+        _analyze_path,
+        ((str(p), options) for p in paths),
+        workers=workers,
+        ordered=ordered,
+        max_in_flight=max_in_flight,
+        on_crash=_crashed_path,
+    )
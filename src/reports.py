@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import csv
+import json
+import hashlib
+from pathlib import Path
+
+
+class ReportWriter:
+    """
+    Streams batch rows to out/batch_report.{csv,jsonl} as they arrive.
+
+    Nothing is buffered beyond the file object; the file is flushed every
+    flush_every rows, so a crash loses at most that many rows.
+    """
+
+    def __init__(self, path: str | Path, fields: list[str], fmt: str = "csv", flush_every: int = 50):
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown report format: {fmt}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self.count = 0
+        self._f = open(self.path, "w", newline="" if fmt == "csv" else None, encoding="utf-8")
+        if fmt == "csv":
+            self._writer = csv.DictWriter(self._f, fieldnames=fields, restval="")
+            self._writer.writeheader()
+
+    def write(self, row: dict) -> None:
+        if self.fmt == "csv":
+            self._writer.writerow(row)
+        else:
+            self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ShardedJsonl:
+    """
+    Per-image reports as compact JSON lines spread over n_shards files
+    (<dir>/reports-NNN.jsonl, shard chosen by a stable hash of the image key)
+    instead of one pretty-printed file per image.
+
+    append=True keeps existing shard contents (incremental runs); a re-analyzed
+    image then has several lines and the last one wins, see find_report().
+    """
+
+    def __init__(self, out_dir: str | Path, n_shards: int = 16, append: bool = False, flush_every: int = 50):
+        self.out_dir = Path(out_dir)
+        self.n_shards = n_shards
+        self.flush_every = flush_every
+        self._mode = "a" if append else "w"
+        self._files: dict[Path, object] = {}
+        self._count = 0
+        if not append:
+            for old in self.out_dir.glob("reports-*.jsonl"):
+                old.unlink()  # stale shards of a previous run
+
+    def shard_path(self, key: str) -> Path:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest()
+        i = int.from_bytes(digest, "little") % self.n_shards
+        return self.out_dir / f"reports-{i:03d}.jsonl"
+
+    def write(self, key: str, report: dict) -> Path:
+        path = self.shard_path(key)
+        if path not in self._files:
+            self._files[path] = open(path, self._mode, encoding="utf-8")
+        self._files[path].write(json.dumps(report, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._count += 1
+        if self._count % self.flush_every == 0:
+            for f in self._files.values():
+                f.flush()
+        return path
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+def find_report(ref: str | Path, image: str) -> dict | None:
+    """Loads the report of `image` from ref, a per-image .json or a .jsonl shard."""
+    ref = Path(ref)
+    if not ref.exists():
+        return None
+    if ref.suffix != ".jsonl":
+        with open(ref, encoding="utf-8") as f:
+            return json.load(f)
+    found = None
+    with open(ref, encoding="utf-8") as f:
+        for line in f:
+            if f'"image":{json.dumps(image, ensure_ascii=False)}' in line:
+                try:
+                    found = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+    return found
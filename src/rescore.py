@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .features import FeatureStore
+from .calibration import as_provider, get_thresholds, verdicts_from_likelihoods, VERDICTS
+from .pipeline import WEIGHTS, LIKELIHOOD_CENTER, LIKELIHOOD_SLOPE, EVIDENCE_MIN, EVIDENCE, NO_EVIDENCE
+
+STAGES = ("spectrum", "noise", "repetition", "edges")
+
+
+def rescore(
+    store: FeatureStore,
+    weights: dict[str, float] | None = None,
+    likely_real_max: float = 0.30,
+    likely_ai_min: float = 0.70,
+    center: float = LIKELIHOOD_CENTER,
+    slope: float = LIKELIHOOD_SLOPE,
+    evidence_min: float = EVIDENCE_MIN,
+) -> dict[str, np.ndarray]:
+    """
+    Recomputes what analyze_image derives from the stage scores, for every
+    stored image at once: combined score, ai_likelihood, verdict code
+    (into calibration.VERDICTS), confidence and evidence flags [N, 4] (one
+    column per STAGES entry). With the default arguments the values equal
+    the ones the pipeline produced. Stages a cascade run skipped are stored
+    as NaN; as in the pipeline the combined score of such rows is then the
+    weighted mean over the stages that ran.
+    """
+    weights = {**WEIGHTS, **(weights or {})}
+    combined = np.zeros(len(store), dtype=np.float64)
+    ran_weight = np.zeros(len(store), dtype=np.float64)
+    partial = np.zeros(len(store), dtype=bool)
+    scores = {}
+    for name in STAGES:
+        scores[name] = store.column(f"{name}_score")
+        ran = ~np.isnan(scores[name])
+        combined = combined + np.where(ran, weights[name] * scores[name], 0.0)  # same summation order as the pipeline
+        ran_weight = ran_weight + np.where(ran, weights[name], 0.0)
+        partial |= ~ran
+    combined[partial] /= ran_weight[partial]
+
+    likelihood = np.clip(1.0 / (1.0 + np.exp(-((combined - center) * slope))), 0.0, 1.0)
+    verdict, confidence = verdicts_from_likelihoods(likelihood, likely_real_max, likely_ai_min)
+    evidence = np.stack([scores[name] > evidence_min for name in STAGES], axis=1)
+    return {
+        "combined": combined,
+        "ai_likelihood": likelihood,
+        "verdict": verdict,
+        "confidence": confidence,
+        "evidence": evidence,
+    }
+
+
+def evidence_text(store: FeatureStore, i: int, flags: np.ndarray) -> list[str]:
+    """Evidence lines of stored image i, as the pipeline words them."""
+    out = []
+    for name, flag in zip(STAGES, flags):
+        if flag:
+            stats = {c[len(name) + 1:]: store.matrix[i, j] for j, c in enumerate(store.columns) if c.startswith(name)}
+            out.append(EVIDENCE[name](stats))
+    return out or [NO_EVIDENCE]
+
+
+def _parse_weights(text: str) -> dict[str, float]:
+    out = {}
+    for part in filter(None, text.split(",")):
+        name, _, value = part.partition("=")
+        if name not in STAGES:
+            raise argparse.ArgumentTypeError(f"Unknown stage {name!r} (choose from {', '.join(STAGES)})")
+        out[name] = float(value)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Re-score a stored batch run with other weights / thresholds (no re-analysis)")
+    ap.add_argument("--store", default="out/features.npz", help="Feature store written by batch_run --features")
+    ap.add_argument("--weights", type=_parse_weights, default={},
+                    help="Stage weights to override, e.g. spectrum=0.4,edges=0.05")
+    ap.add_argument("--calibration", default=None,
+                    help="calibration.json with the verdict thresholds (default: out/calibration.json)")
+    ap.add_argument("--center", type=float, default=LIKELIHOOD_CENTER, help="Sigmoid center of ai_likelihood")
+    ap.add_argument("--slope", type=float, default=LIKELIHOOD_SLOPE, help="Sigmoid slope of ai_likelihood")
+    ap.add_argument("--evidence-min", type=float, default=EVIDENCE_MIN,
+                    help="Stage score above which the stage is listed as evidence")
+    ap.add_argument("--out", default="out/rescored.csv", help="Re-scored report (CSV)")
+    ap.add_argument("--no-write", action="store_true", help="Only print the summary")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    store = FeatureStore.load(args.store)
+    t_load = time.perf_counter() - t0
+
+    likely_real_max, likely_ai_min = get_thresholds(as_provider(args.calibration).get())
+    t0 = time.perf_counter()
+    res = rescore(store, args.weights, likely_real_max, likely_ai_min, args.center, args.slope, args.evidence_min)
+    t_score = time.perf_counter() - t0
+
+    before = np.array([VERDICTS.index(v) if v in VERDICTS else -1 for v in store.verdicts], dtype=np.int8)
+    changed = int(np.count_nonzero(before != res["verdict"]))
+    print(f"[OK] {len(store)} images re-scored in {t_score * 1e3:.1f} ms (store loaded in {t_load * 1e3:.1f} ms)")
+    print(f"Thresholds: likely_real_max={likely_real_max:.3f} likely_ai_min={likely_ai_min:.3f}")
+    print(f"Verdict changes vs. stored run: {changed}")
+
+    splits = np.array(store.splits)
+    for split in sorted(set(store.splits)):
+        counts = np.bincount(res["verdict"][splits == split], minlength=len(VERDICTS))
+        dist = "  ".join(f"{VERDICTS[k]}={counts[k]}" for k in range(len(VERDICTS)))
+        print(f"  {split:<12} {dist}")
+
+    if args.no_write:
+        return
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["image", "split", "category", "verdict", "confidence", "ai_likelihood", "evidence", "verdict_before"])
+        for i in range(len(store)):
+            w.writerow([
+                store.images[i],
+                store.splits[i],
+                store.categories[i],
+                VERDICTS[res["verdict"][i]],
+                float(res["confidence"][i]),
+                float(res["ai_likelihood"][i]),
+                " | ".join(evidence_text(store, i, res["evidence"][i])),
+                store.verdicts[i],
+            ])
+    print(f"\n✅ Saved: {out}")
+
+
+if __name__ == "__main__":
+    main()
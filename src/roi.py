@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+from .utils import normalize01
+from .artifacts.spectrum_fft import spectrum_features
+from .artifacts.noise_residual import residual_stats
+from .artifacts.patch_repetition import (
+    _similarity_search, _paint_patches, repetition_score, upsampled_mean, similarity_stats, NO_SIMILARITY,
+)
+from .artifacts.edge_stats import edge_score
+
+MAPS_FORMAT = 1
+
+# Smaller regions leave too few pixels / radii for the statistics
+ROI_MIN_SIDE = 16
+
+
+@dataclass
+class FeatureMaps:
+    """
+    The per-pixel intermediates of one analyze_image(..., retain=True) run,
+    from which any region can be re-scored without re-running the
+    extractors (see region_features / pipeline.analyze_region):
+
+      gray01    float32 gray image (region spectrum)
+      resid     raw residual magnitude at the denoiser's working resolution
+      patches   normalized patch vectors [N, D] of the downscaled gray and
+      coords    their top-left corners [N, 2] in small_shape (None if too small)
+      lap       Laplacian of gray8
+      grad_mag  Sobel gradient magnitude of gray8
+
+    About 16 bytes per pixel plus the patches; save / load keep it next to
+    a cached result.
+    """
+
+    shape: tuple[int, int]
+    gray01: np.ndarray
+    resid: np.ndarray
+    denoiser: str
+    patches: np.ndarray | None
+    coords: np.ndarray | None
+    small_shape: tuple[int, int]
+    patch: int
+    stride: int
+    sim_thresh: float
+    lap: np.ndarray
+    grad_mag: np.ndarray
+
+    @classmethod
+    def from_features(cls, gray01: np.ndarray, noi: dict, rep: dict, edg: dict) -> "FeatureMaps":
+        """From the extractor dicts of a retain=True run."""
+        return cls(
+            shape=gray01.shape[:2],
+            gray01=gray01,
+            resid=noi["resid_mag"],
+            denoiser=noi["denoiser"],
+            patches=rep["patches"],
+            coords=rep["coords"],
+            small_shape=tuple(rep["small_shape"]),
+            patch=rep["patch"],
+            stride=rep["stride"],
+            sim_thresh=rep["sim_thresh"],
+            lap=edg["lap"],
+            grad_mag=edg["grad_mag"],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.gray01, self.resid, self.patches, self.coords, self.lap, self.grad_mag)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        meta = {
+            "format": MAPS_FORMAT,
+            "shape": list(self.shape),
+            "denoiser": self.denoiser,
+            "small_shape": list(self.small_shape),
+            "patch": self.patch,
+            "stride": self.stride,
+            "sim_thresh": self.sim_thresh,
+        }
+        arrays = {"gray01": self.gray01, "resid": self.resid, "lap": self.lap, "grad_mag": self.grad_mag}
+        if self.patches is not None:
+            arrays.update(patches=self.patches, coords=self.coords)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FeatureMaps":
+        with np.load(path) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta["format"] != MAPS_FORMAT:
+                raise ValueError(f"Unsupported feature maps format in {path}")
+            return cls(
+                shape=tuple(meta["shape"]),
+                gray01=z["gray01"],
+                resid=z["resid"],
+                denoiser=meta["denoiser"],
+                patches=z["patches"] if "patches" in z else None,
+                coords=z["coords"] if "coords" in z else None,
+                small_shape=tuple(meta["small_shape"]),
+                patch=meta["patch"],
+                stride=meta["stride"],
+                sim_thresh=meta["sim_thresh"],
+                lap=z["lap"],
+                grad_mag=z["grad_mag"],
+            )
+
+
+def parse_box(text: str) -> tuple[int, int, int, int]:
+    """'x,y,w,h' -> (x, y, w, h)."""
+    parts = text.split(",")
+    if len(parts) != 4:
+        raise ValueError(f"Expected a region as x,y,w,h, got {text!r}")
+    return tuple(int(p) for p in parts)
+
+
+def clip_box(box: tuple[int, int, int, int], shape: tuple[int, int]) -> tuple[int, int, int, int]:
+    """(x, y, w, h) clipped to an image of shape (h, w); ValueError if under ROI_MIN_SIDE."""
+    x, y, w, h = box
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(shape[1], x + w), min(shape[0], y + h)
+    if x1 - x0 < ROI_MIN_SIDE or y1 - y0 < ROI_MIN_SIDE:
+        raise ValueError(f"Region {box} is smaller than {ROI_MIN_SIDE}px inside the {shape[1]}x{shape[0]} image")
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _scaled(box: tuple[int, int, int, int], shape: tuple[int, int], to: tuple[int, int]) -> tuple[slice, slice]:
+    """Row / column slices of an (x, y, w, h) box of `shape` in an image of shape `to` (at least 1px)."""
+    x, y, w, h = box
+    sy, sx = to[0] / shape[0], to[1] / shape[1]
+    y0, x0 = int(y * sy), int(x * sx)
+    y1 = max(y0 + 1, min(to[0], math.ceil((y + h) * sy)))
+    x1 = max(x0 + 1, min(to[1], math.ceil((x + w) * sx)))
+    return slice(y0, y1), slice(x0, x1)
+
+
+def _to_region(m: np.ndarray, w: int, h: int) -> np.ndarray:
+    return cv2.resize(m, (w, h), interpolation=cv2.INTER_LINEAR) if m.shape != (h, w) else m
+
+
+def _repetition(fm: FeatureMaps, box: tuple[int, int, int, int], maps: bool) -> dict:
+    x, y, w, h = box
+    rows, cols = _scaled(box, fm.shape, fm.small_shape)
+    sel = None
+    if fm.patches is not None:
+        # patches centered in the region, compared against every patch of the image
+        cy = fm.coords[:, 0] + fm.patch / 2
+        cx = fm.coords[:, 1] + fm.patch / 2
+        sel = np.flatnonzero((cy >= rows.start) & (cy < rows.stop) & (cx >= cols.start) & (cx < cols.stop))
+    if sel is None or sel.size == 0:
+        out = {**NO_SIMILARITY, "score": 0.0}
+        if maps:
+            out["rep_map"] = np.zeros((h, w), dtype=np.float32)
+        return out
+
+    best, hits = _similarity_search(fm.patches, fm.coords, fm.patch, fm.sim_thresh, 1 << 22, rows=sel)
+    sims = similarity_stats(best)
+    hot = normalize01(_paint_patches(fm.small_shape, fm.coords[sel], hits, fm.patch)[rows, cols])
+    out = {**sims, "score": repetition_score(sims["p95_sim"], upsampled_mean(hot, h, w))}
+    if maps:
+        out["rep_map"] = _to_region(hot, w, h).astype(np.float32)
+    return out
+
+
+def region_features(fm: FeatureMaps, box: tuple[int, int, int, int], maps: bool = True) -> tuple[dict, dict, dict, dict]:
+    """
+    (spectrum, noise, repetition, edges) extractor dicts for the (x, y, w, h)
+    region, computed from the retained maps only:
+      - spectrum: FFT of the region's gray01
+      - noise: stats of the region's residual magnitude
+      - repetition: the region's patches searched against the whole image
+        (so content cloned from elsewhere counts), hot map cropped to it
+      - edges: Laplacian variance and gradient map of the region
+    maps=True adds the region-sized resid_map / rep_map / edge_map.
+    The full-image box reproduces analyze_image's stats.
+    """
+    x, y, w, h = box = clip_box(box, fm.shape)
+    rows, cols = slice(y, y + h), slice(x, x + w)
+
+    spec = spectrum_features(fm.gray01[rows, cols])
+
+    resid = fm.resid[_scaled(box, fm.shape, fm.resid.shape)]
+    noi = residual_stats(resid, fm.denoiser)
+
+    rep = _repetition(fm, box, maps)
+
+    lap_var = float(np.var(fm.lap[rows, cols]))
+    edg = {"lap_var": lap_var, "score": edge_score(lap_var)}
+
+    if maps:
+        noi["resid_map"] = normalize01(_to_region(resid, w, h))
+        edg["edge_map"] = normalize01(fm.grad_mag[rows, cols])
+    return spec, noi, rep, edg
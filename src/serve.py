@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from .pipeline import analyze_image
+from .context import ImageContext
+from .loader import decode_image
+from .calibration import as_provider
+from .cache import open_cache, bytes_digest, code_version
+from .artifacts.noise_residual import DENOISERS
+from .parallel import default_workers
+
+
+# ---- worker process side
+
+_worker_calibration = None
+_worker_cache = None
+
+
+def _init_serve_worker(calibration: str | None, cache_dir: str | None, cache_max_bytes: int) -> None:
+    """Runs once per worker: imports, calibration, cache and extractor caches are warm before traffic."""
+    global _worker_calibration, _worker_cache
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the server process
+    cv2.setNumThreads(1)
+    _worker_calibration = as_provider(calibration)
+    _worker_calibration.get()
+    if cache_dir:
+        _worker_cache = open_cache(cache_dir, max_bytes=cache_max_bytes)
+        code_version()
+    rng = np.random.default_rng(0)
+    analyze_image(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8), calibration=_worker_calibration)
+
+
+def _warmup() -> bool:
+    return True
+
+
+class BadImage(ValueError):
+    """The upload itself is unusable (served as 400); other failures are the server's (500)."""
+
+
+def _report(data: bytes, options: dict) -> dict:
+    try:
+        bgr, _ = decode_image(data, order="bgr")
+    except ValueError as e:
+        raise BadImage(str(e)) from e
+
+    res = None
+    if _worker_cache is not None:
+        key = _worker_cache.key(bytes_digest(data), {**options, "calibration": _worker_calibration, "maps": False})
+        res = _worker_cache.get(key, calibration=_worker_calibration, need_heatmap=False)
+    if res is None:
+        res = analyze_image(ImageContext(bgr, order="bgr"), calibration=_worker_calibration, maps=False, **options)
+        if _worker_cache is not None:
+            _worker_cache.put(key, res)
+
+    # same report as cli.main, minus the overlay file (so no heatmap is built)
+    return {
+        "verdict": res.verdict,
+        "confidence": round(res.confidence, 4),
+        "ai_likelihood": round(res.ai_likelihood, 4),
+        "evidence": res.evidence,
+        "scores": res.scores,
+    }
+
+
+def _run_batch(batch: list[tuple[bytes, dict]]) -> list[tuple[dict | None, str | None, bool]]:
+    """(report, error, bad input) per request."""
+    out = []
+    for data, options in batch:
+        try:
+            out.append((_report(data, options), None, False))
+        except Exception as e:
+            out.append((None, str(e), isinstance(e, BadImage)))
+    return out
+
+
+# ---- server process side
+
+class _Job:
+    __slots__ = ("data", "options", "future")
+
+    def __init__(self, data: bytes, options: dict):
+        self.data = data
+        self.options = options
+        self.future: Future = Future()
+
+
+class AnalysisService:
+    """
+    Warm process pool behind a bounded request queue.
+
+    submit() never blocks: when max_queue jobs are already waiting it raises
+    queue.Full (served as 503 + Retry-After). A dispatcher thread drains the
+    queue into the pool, grouping requests of at most small_bytes into
+    micro-batches of up to batch_size (waiting at most batch_wait seconds for
+    a batch to fill), so small images share one pool round-trip. At most
+    2 * workers batches are in the pool at once; everything else waits in the
+    bounded queue, which is what provides backpressure. Jobs cancelled while
+    waiting (timed-out requests) are dropped instead of dispatched.
+
+    When a worker process dies the pool is broken: the jobs in it fail, and
+    a fresh pool is started; `ready` is clear until its workers are warm.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 64,
+        batch_size: int = 8,
+        batch_wait: float = 0.005,
+        small_bytes: int = 512 << 10,
+        calibration: str | None = None,
+        cache_dir: str | None = None,
+        cache_max_bytes: int = 2 << 30,
+    ):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.small_bytes = small_bytes
+        self._queue: queue.Queue[_Job] = queue.Queue(maxsize=max_queue)
+        self._slots = threading.BoundedSemaphore(2 * self.workers)
+        self._initargs = (calibration, cache_dir, cache_max_bytes)
+        self._pool_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.restarts = 0
+        self._closed = False
+        self._start_pool()
+        threading.Thread(target=self._dispatch, daemon=True).start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _start_pool(self) -> None:
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_serve_worker, initargs=self._initargs
+        )
+        threading.Thread(target=self._warm, args=(self._pool,), daemon=True).start()
+
+    def _warm(self, pool: ProcessPoolExecutor) -> None:
+        # one trivial task per worker forces every process (and its initializer) up
+        try:
+            for f in [pool.submit(_warmup) for _ in range(self.workers)]:
+                f.result()
+        except BrokenProcessPool:
+            return  # not ready; the next job that finds the pool broken restarts it
+        if pool is self._pool:
+            self.ready.set()
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replaces the pool after a worker died (once, however many jobs saw it break)."""
+        with self._pool_lock:
+            if broken is not self._pool or self._closed:
+                return
+            self.ready.clear()
+            self.restarts += 1
+            self._start_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, data: bytes, options: dict) -> Future:
+        job = _Job(data, options)
+        self._queue.put_nowait(job)
+        return job.future
+
+    def _dispatch(self) -> None:
+        carry = None
+        while not self._closed:
+            job = carry or self._queue.get()
+            carry = None
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                continue  # its request timed out while queued
+            batch = [job]
+            if len(job.data) <= self.small_bytes:
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    try:
+                        nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if nxt is None or len(nxt.data) > self.small_bytes:
+                        carry = nxt  # large jobs run alone; None still has to stop the loop
+                        break
+                    if nxt.future.set_running_or_notify_cancel():
+                        batch.append(nxt)
+
+            self._slots.acquire()
+            try:
+                fut, pool = self._submit(batch)
+            except RuntimeError as e:  # pool shut down, or broken again right away
+                self._slots.release()
+                for j in batch:
+                    j.future.set_exception(e)
+                if self._closed:
+                    return
+                continue
+            fut.add_done_callback(lambda f, jobs=batch, p=pool: self._resolve(jobs, f, p))
+
+    def _submit(self, batch: list[_Job]) -> tuple[Future, ProcessPoolExecutor]:
+        args = [(j.data, j.options) for j in batch]
+        pool = self._pool
+        try:
+            return pool.submit(_run_batch, args), pool
+        except BrokenProcessPool:
+            self._restart(pool)  # these jobs never ran: retry once on the fresh pool
+            pool = self._pool
+            return pool.submit(_run_batch, args), pool
+
+    def _resolve(self, jobs: list[_Job], fut: Future, pool: ProcessPoolExecutor) -> None:
+        self._slots.release()
+        try:
+            results = fut.result()
+        except Exception as e:  # worker crashed (or the pool was shut down)
+            if isinstance(e, BrokenProcessPool):
+                self._restart(pool)
+            for j in jobs:
+                j.future.set_exception(e)
+            return
+        for j, (report, err, bad_input) in zip(jobs, results):
+            if err is None:
+                j.future.set_result(report)
+            else:
+                j.future.set_exception(BadImage(err) if bad_input else RuntimeError(err))
+
+    def close(self) -> None:
+        with self._pool_lock:
+            self._closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _options_from_query(qs: dict[str, list[str]]) -> dict:
+    options = {}
+    if "denoiser" in qs:
+        if qs["denoiser"][0] not in DENOISERS:
+            raise ValueError(f"Unknown denoiser: {qs['denoiser'][0]}")
+        options["denoiser"] = qs["denoiser"][0]
+    if "tile" in qs:
+        options["tile"] = int(qs["tile"][0])
+        if options["tile"] <= 0:
+            raise ValueError("tile must be a positive number of px")
+    if "cascade" in qs:
+        options["cascade"] = qs["cascade"][0].lower() in ("1", "true", "yes")
+    return options
+
+
+def make_handler(service: AnalysisService, max_bytes: int, timeout: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, payload: dict, headers: dict | None = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            path = urlparse(self.path).path
+            if path == "/healthz":
+                self._send(200, {"status": "ok"})
+            elif path == "/readyz":
+                ok = service.ready.is_set()
+                self._send(200 if ok else 503,
+                           {"ready": ok, "queue_depth": service.queue_depth, "pool_restarts": service.restarts})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            if url.path != "/analyze":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                self._send(400, {"error": "invalid Content-Length"})
+                return
+            if length <= 0:
+                self._send(400, {"error": "POST the raw image bytes as the request body"})
+                return
+            if length > max_bytes:
+                self._send(413, {"error": f"image larger than {max_bytes} bytes"})
+                return
+            data = self.rfile.read(length)
+
+            try:
+                options = _options_from_query(parse_qs(url.query))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+
+            try:
+                fut = service.submit(data, options)
+            except queue.Full:
+                self._send(503, {"error": "queue full"}, {"Retry-After": "1"})
+                return
+
+            try:
+                self._send(200, fut.result(timeout=timeout))
+            except TimeoutError:
+                fut.cancel()  # still queued: the dispatcher drops it; already running: the result is discarded
+                self._send(504, {"error": "analysis timed out"})
+            except BadImage as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, fmt: str, *args) -> None:
+            pass  # per-request logging would dominate under load tests
+
+    return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="TruthLens local HTTP analysis service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=max(1, default_workers() - 1), help="Analysis processes")
+    ap.add_argument("--max-queue", type=int, default=64, help="Waiting requests before answering 503")
+    ap.add_argument("--batch-size", type=int, default=8, help="Max small requests per micro-batch")
+    ap.add_argument("--batch-wait-ms", type=float, default=5.0, help="Max wait for a micro-batch to fill")
+    ap.add_argument("--small-kb", type=int, default=512, help="Uploads up to this size are micro-batched")
+    ap.add_argument("--max-mb", type=int, default=64, help="Largest accepted upload")
+    ap.add_argument("--timeout", type=float, default=120.0, help="Per-request analysis timeout (s)")
+    ap.add_argument("--calibration", default=None, help="calibration.json to use (default: out/calibration.json)")
+    ap.add_argument("--cache", default=None, help="Result cache folder shared by the workers")
+    ap.add_argument("--cache-max-mb", type=int, default=2048, help="Cache size limit (LRU eviction)")
+    args = ap.parse_args()
+
+    service = AnalysisService(
+        workers=args.workers,
+        max_queue=args.max_queue,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait_ms / 1000.0,
+        small_bytes=args.small_kb << 10,
+        calibration=args.calibration,
+        cache_dir=args.cache,
+        cache_max_bytes=args.cache_max_mb << 20,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.max_mb << 20, args.timeout))
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # stop cleanly under process managers too
+    print(f"✅ TruthLens serving on http://{args.host}:{args.port} ({args.workers} workers)")
+    print("   POST /analyze (raw image bytes, ?denoiser=&cascade=&tile=), GET /healthz, GET /readyz")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
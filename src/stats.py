@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+
+import numpy as np
+
+
+def pct(values: list[float] | np.ndarray, p: float, fallback: float) -> float:
+    if len(values) == 0:
+        return fallback
+    return float(np.percentile(np.array(values, dtype=np.float32), p))
+
+
+class P2Quantile:
+    """
+    Streaming estimate of the p-th percentile with the P-square algorithm
+    (Jain & Chlamtac, 1985): five markers, O(1) memory and time per value.
+    Exact (np.percentile) until more than five values were seen.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        f = p / 100.0
+        self.count = 0
+        self.q: list[float] = []  # marker heights
+        self.n = [1.0, 2.0, 3.0, 4.0, 5.0]  # marker positions
+        self.want = [1.0, 1.0 + 2 * f, 1.0 + 4 * f, 3.0 + 2 * f, 5.0]  # desired positions
+        self.step = [0.0, f / 2, f, (1.0 + f) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q, n = self.q, self.n
+        if self.count <= 5:
+            bisect.insort(q, x)
+            return
+
+        if x < q[0]:
+            q[0] = x
+        elif x > q[4]:
+            q[4] = x
+        k = min(max(bisect.bisect_right(q, x) - 1, 0), 3)  # cell of x
+        for i in range(k + 1, 5):
+            n[i] += 1.0
+        for i in range(5):
+            self.want[i] += self.step[i]
+
+        for i in (1, 2, 3):
+            d = self.want[i] - n[i]
+            if (d >= 1.0 and n[i + 1] - n[i] > 1.0) or (d <= -1.0 and n[i - 1] - n[i] < -1.0):
+                d = 1.0 if d > 0 else -1.0
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qp < q[i + 1]:  # parabola overshoots: linear step
+                    j = i + int(d)
+                    qp = q[i] + d * (q[j] - q[i]) / (n[j] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self, fallback: float) -> float:
+        if self.count == 0:
+            return fallback
+        if self.count <= 5:  # markers not yet initialized: q holds the sorted values
+            return pct(self.q, self.p, fallback)
+        return float(self.q[2])
+
+
+class TopK:
+    """
+    The k rows with the smallest key, ties going to the earlier row, i.e.
+    sorted(rows, key=key)[:k], from a bounded heap in one pass.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: list[tuple[float, int, dict]] = []  # (-key, -index, row): heap[0] is the worst kept
+
+    def wants(self, key: float, index: int) -> bool:
+        return len(self._heap) < self.k or (-key, -index) > self._heap[0][:2]
+
+    def push(self, key: float, index: int, row: dict) -> None:
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (-key, -index, row))
+        elif self.wants(key, index):
+            heapq.heapreplace(self._heap, (-key, -index, row))
+
+    def rows(self) -> list[dict]:
+        return [row for _, _, row in sorted(self._heap, key=lambda t: t[:2], reverse=True)]
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import numpy as np
+import cv2
+
+from .utils import rgb_to_gray01
+from .artifacts.spectrum_fft import spectrum_profile, profile_features
+from .artifacts.noise_residual import (
+    residual_magnitude, residual_stats, noise_score, effective_denoiser, WelchACF, acf_stats, ACF_MAX_BLOCKS,
+    NLMEANS_DOWN_MAX_SIDE,
+)
+from .artifacts.patch_repetition import repetition_hotmap, repetition_score, upsampled_mean, NO_SIMILARITY
+from .artifacts.edge_stats import edge_maps, edge_score
+
+
+class _Moments:
+    """Running sums for mean / std / Pearson corr, kept in float64."""
+
+    def __init__(self):
+        self.n = 0
+        self.s = 0.0
+        self.ss = 0.0
+
+    def add(self, x: np.ndarray) -> None:
+        x = x.astype(np.float64, copy=False)
+        self.n += x.size
+        self.s += float(x.sum())
+        self.ss += float(np.dot(x.ravel(), x.ravel()))
+
+    @property
+    def mean(self) -> float:
+        return self.s / max(self.n, 1)
+
+    @property
+    def var(self) -> float:
+        return max(self.ss / max(self.n, 1) - self.mean ** 2, 0.0)
+
+
+class _PairMoments:
+    def __init__(self):
+        self.a, self.b = _Moments(), _Moments()
+        self.sab = 0.0
+
+    def add(self, a: np.ndarray, b: np.ndarray) -> None:
+        self.a.add(a)
+        self.b.add(b)
+        self.sab += float(np.dot(a.astype(np.float64).ravel(), b.astype(np.float64).ravel()))
+
+    @property
+    def corr(self) -> float:
+        if self.a.n <= 10:
+            return 0.0
+        cov = self.sab / self.a.n - self.a.mean * self.b.mean
+        den = np.sqrt(self.a.var * self.b.var)
+        return float(np.clip(cov / den, -1.0, 1.0)) if den > 0 else 0.0
+
+
+def _tiles(h: int, w: int, tile: int, overlap: int):
+    """Yields (core, padded) as (y0, y1, x0, x1) boxes covering the image."""
+    for y0 in range(0, h, tile):
+        for x0 in range(0, w, tile):
+            y1, x1 = min(h, y0 + tile), min(w, x0 + tile)
+            yield (y0, y1, x0, x1), (max(0, y0 - overlap), min(h, y1 + overlap), max(0, x0 - overlap), min(w, x1 + overlap))
+
+
+def _norm_tile(x: np.ndarray, mn: float, mx: float, eps: float = 1e-8) -> np.ndarray:
+    # normalize01 with global min / max
+    if mx - mn < eps:
+        return np.zeros(x.shape, dtype=np.float32)
+    return (x.astype(np.float32) - mn) / (mx - mn)
+
+
+def _upsample_tile(hot: np.ndarray, h: int, w: int, box: tuple[int, int, int, int]) -> np.ndarray:
+    """The box of cv2.resize(hot, (w, h), INTER_LINEAR), without building the full map."""
+    y0, y1, x0, x1 = box
+    hs, ws = hot.shape
+    mx = ((np.arange(x0, x1, dtype=np.float32) + 0.5) * (ws / w) - 0.5).reshape(1, -1)
+    my = ((np.arange(y0, y1, dtype=np.float32) + 0.5) * (hs / h) - 0.5).reshape(-1, 1)
+    mx, my = np.broadcast_to(mx, (y1 - y0, x1 - x0)), np.broadcast_to(my, (y1 - y0, x1 - x0))
+    return cv2.remap(hot, np.ascontiguousarray(mx), np.ascontiguousarray(my), cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _area_sums(x: np.ndarray, edges: np.ndarray, a: int) -> np.ndarray:
+    """
+    Sums of the rows a, a + 1, ... of x over the px intervals [edges[i],
+    edges[i + 1]), rows counted by the fraction of them inside (0 outside).
+    """
+    n = x.shape[0]
+    e = np.clip(edges - a, 0, n)
+    k = np.minimum(e.astype(np.intp), n - 1)
+    c = np.cumsum(x, axis=0, dtype=np.float64)
+    frac = (e - k).reshape(-1, *([1] * (x.ndim - 1)))
+    return np.diff(c[k] + (frac - 1.0) * x[k], axis=0)  # c[k] - x[k] = sum of the rows before k
+
+
+class _AreaThumbnail:
+    """
+    cv2.resize(image, INTER_AREA) to at most max_side px per side, assembled
+    from tiles: area weights are separable, so every tile's share of each
+    output px just adds up (float64 sums, equal up to float rounding).
+    """
+
+    def __init__(self, h: int, w: int, max_side: int, channels: int = 0):
+        s = min(1.0, max_side / max(h, w))
+        hs, ws = max(1, int(h * s)), max(1, int(w * s))
+        self.ey = np.arange(hs + 1) * (h / hs)
+        self.ex = np.arange(ws + 1) * (w / ws)
+        self.area = (h / hs) * (w / ws)
+        self.acc = np.zeros((hs, ws, channels) if channels else (hs, ws), dtype=np.float64)
+
+    def add(self, x: np.ndarray, y0: int, x0: int) -> None:
+        for c in range(x.shape[2]) if x.ndim == 3 else (None,):
+            xc = x if c is None else x[..., c]
+            cols = _area_sums(xc, self.ey, y0)  # [hs, tile w]
+            out = self.acc if c is None else self.acc[..., c]
+            out += _area_sums(cols.T, self.ex, x0).T
+
+    def image(self) -> np.ndarray:
+        return (self.acc / self.area).astype(np.float32)
+
+
+def tiled_features(
+    rgb: np.ndarray,
+    tile: int = 2048,
+    overlap: int = 16,
+    denoiser: str = "nlmeans",
+    maps: bool = True,
+    down_side: int = NLMEANS_DOWN_MAX_SIDE,
+) -> tuple[dict, dict, dict, dict, np.ndarray | None]:
+    """
+    Memory-bounded version of the four extractors + heatmap for very large images.
+
+    The image is processed in tile x tile cores, each read with `overlap` px of
+    context (>= 13 keeps nlmeans / Sobel / Laplacian exact at tile seams).
+    Only tile-sized float buffers exist at a time; across tiles we keep
+      - running sums for residual mean / std / corr@1px and Laplacian variance
+        (exact, same numbers as the full-image path up to float rounding)
+      - the summed block power spectra of the residual autocorrelation
+        (WelchACF; blocks are picked per tile, so the multi-lag stats are an
+        estimate like the full-image ones, from other blocks)
+      - the average spectral profile of the full tile x tile cores, rescaled
+        to the image's size and frequency bins. This is a different, approximate
+        estimator: tiles see no frequencies below 1 / tile and average away
+        the image-wide peaks. Close on natural 1/f content (slope / resid_std
+        within ~1e-2 of the full image), off by up to ~0.07 on strongly
+        periodic content (measured: resid_std 0.085 vs 0.141, slope -0.062
+        vs -0.129)
+      - a <= 512px gray INTER_AREA thumbnail for the repetition search,
+        accumulated over the tiles (_AreaThumbnail, equal to the full path up
+        to float rounding)
+    "nlmeans_down" already works on a <= down_side px copy of the whole image,
+    which a tile cannot reproduce; such a thumbnail of the float image is
+    accumulated the same way and its residual computed once (not tiled).
+
+    maps=True also returns the heatmap: the float32 image-sized heat01 is the
+    only O(image) buffer (4 bytes / px). It first holds the raw residual, as
+    the maps are normalized by their global min / max; a second pass over the
+    tiles recomputes the gradient magnitude and blends the maps in place.
+    maps=False skips the Sobel passes and the heatmap (heat01 is None); the
+    stats are unchanged.
+
+    Returns (spec, noi, rep, edg, heat01) with the same stat keys as the
+    regular extractors (maps excluded).
+    """
+    if rgb.ndim != 3 or rgb.shape[2] != 3:
+        raise ValueError(f"Expected an HxWx3 RGB image, got shape {rgb.shape}")
+    h, w = rgb.shape[:2]
+    scale = 1.0 / 255.0 if rgb.dtype == np.uint8 or float(rgb.max()) > 1.5 else 1.0
+    st = min(tile, h, w)  # spectral tile side
+    gain = float(np.sqrt(h * w)) / st
+
+    denoiser = effective_denoiser(denoiser, (h, w), down_side)
+    down_thumb = _AreaThumbnail(h, w, down_side, channels=3) if denoiser == "nlmeans_down" else None
+    rep_thumb = _AreaThumbnail(h, w, 512)
+
+    heat = np.empty((h, w), dtype=np.float32) if maps else None
+    resid_m, lap_m, pairs = _Moments(), _Moments(), _PairMoments()
+    acf = WelchACF()
+    acf_blocks = max(1, ACF_MAX_BLOCKS // (-(-h // tile) * -(-w // tile)))  # shared over the tiles
+    r_lo, r_hi, m_lo, m_hi = np.inf, -np.inf, np.inf, -np.inf
+    prof_sum, prof_n, radii = None, 0, None
+
+    for core, pad in _tiles(h, w, tile, overlap):
+        y0, y1, x0, x1 = core
+        py0, py1, px0, px1 = pad
+        cy0, cy1, cx0, cx1 = y0 - py0, y1 - py0, x0 - px0, x1 - px0
+
+        rgb01 = rgb[py0:py1, px0:px1].astype(np.float32)
+        if scale != 1.0:
+            rgb01 *= scale
+        np.clip(rgb01, 0.0, 1.0, out=rgb01)
+        gray01 = rgb_to_gray01(rgb01)
+
+        # noise residual
+        if down_thumb is not None:
+            down_thumb.add(rgb01[cy0:cy1, cx0:cx1], y0, x0)
+        else:
+            rm = residual_magnitude(rgb01, denoiser)
+            core_rm = rm[cy0:cy1, cx0:cx1]
+            resid_m.add(core_rm)
+            ext = rm[cy0:cy1, cx0:min(cx1 + 1, rm.shape[1])]  # + seam column for the 1px pairs
+            pairs.add(ext[:, :-1], ext[:, 1:])
+            acf.add(core_rm, max_blocks=acf_blocks)
+            if maps:
+                heat[y0:y1, x0:x1] = core_rm
+                r_lo, r_hi = min(r_lo, float(core_rm.min())), max(r_hi, float(core_rm.max()))
+        del rgb01
+        rep_thumb.add(gray01[cy0:cy1, cx0:cx1], y0, x0)
+
+        # edges
+        lap, mag = edge_maps(gray01, sobel=maps)
+        lap_m.add(lap[cy0:cy1, cx0:cx1])
+        if maps:
+            core_mag = mag[cy0:cy1, cx0:cx1]
+            m_lo, m_hi = min(m_lo, float(core_mag.min())), max(m_hi, float(core_mag.max()))
+
+        # spectrum: average profile over full-size tiles
+        if y1 - y0 >= st and x1 - x0 >= st:
+            radii, rp = spectrum_profile(gray01[cy0:cy0 + st, cx0:cx0 + st], gain=gain)
+            prof_sum = rp if prof_sum is None else prof_sum + rp
+            prof_n += 1
+
+    rf = np.arange(1, min(h // 2, w // 2) + 1)
+    spec = profile_features(rf, np.interp(rf * (st / np.sqrt(h * w)), radii, prof_sum / prof_n))
+
+    down = None
+    if down_thumb is not None:
+        down = residual_magnitude(down_thumb.image(), denoiser, down_side)
+        del down_thumb
+    if down is None:
+        rmean = resid_m.mean
+        corr = pairs.corr
+        noi = {
+            "resid_mean": rmean,
+            "resid_std": float(np.sqrt(resid_m.var)),
+            "resid_corr_1px": corr,
+            **acf_stats(acf.surface()),
+            "score": noise_score(rmean, corr, denoiser),
+            "denoiser": denoiser,
+        }
+    else:
+        noi = residual_stats(down, denoiser)
+        r_lo, r_hi = float(down.min()), float(down.max())
+
+    lap_var = lap_m.var
+    edg = {"lap_var": lap_var, "score": edge_score(lap_var)}
+
+    found = repetition_hotmap(rep_thumb.image())
+    del rep_thumb
+
+    if found:
+        sims = found[0]
+        rep = {**sims, "score": repetition_score(sims["p95_sim"], upsampled_mean(found[1], h, w))}
+    else:
+        rep = {**NO_SIMILARITY, "score": 0.0}
+
+    if not maps:
+        return spec, noi, rep, edg, None
+
+    from .pipeline import HEATMAP_MAPS  # pipeline imports this module
+
+    wt = {name: weight for name, _, weight in HEATMAP_MAPS}
+
+    # blend the maps over the residual in heat, then normalize it in place
+    h_lo, h_hi = np.inf, -np.inf
+    for core, pad in _tiles(h, w, tile, overlap):
+        y0, y1, x0, x1 = core
+        py0, py1, px0, px1 = pad
+        gray01 = rgb_to_gray01(np.clip(rgb[py0:py1, px0:px1].astype(np.float32) * scale, 0.0, 1.0))
+        mag = edge_maps(gray01, sobel=True)[1][y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        resid = heat[y0:y1, x0:x1] if down is None else _upsample_tile(down, h, w, core)
+        t = (
+            wt["noise"] * _norm_tile(resid, r_lo, r_hi) +
+            wt["repetition"] * (_upsample_tile(found[1], h, w, core) if found else 0.0) +
+            wt["edges"] * _norm_tile(mag, m_lo, m_hi)
+        )
+        heat[y0:y1, x0:x1] = t
+        h_lo, h_hi = min(h_lo, float(t.min())), max(h_hi, float(t.max()))
+
+    for core, _ in _tiles(h, w, tile, 0):
+        y0, y1, x0, x1 = core
+        heat[y0:y1, x0:x1] = _norm_tile(heat[y0:y1, x0:x1], h_lo, h_hi)
+
+    return spec, noi, rep, edg, heat
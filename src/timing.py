@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# Stage names analyze_image may report, in pipeline order
+STAGES = (
+    "preprocess",
+    "edges",
+    "spectrum",
+    "repetition",
+    "noise",
+    "tiled",
+    "heatmap_combine",
+    "heatmap_normalize",
+    "summarize",
+)
+
+# Called as hook(timings, result) after every instrumented analyze_image call
+_hooks: list[Callable[[dict, object], None]] = []
+
+
+def add_timing_hook(fn: Callable[[dict, object], None]) -> None:
+    """
+    Registers fn to receive scores["timings"] (and the TruthLensResult) of
+    every analyze_image call in this process, e.g. to forward them to a
+    metrics system. Registering a hook turns instrumentation on.
+    """
+    if fn not in _hooks:
+        _hooks.append(fn)
+
+
+def remove_timing_hook(fn: Callable[[dict, object], None]) -> None:
+    if fn in _hooks:
+        _hooks.remove(fn)
+
+
+def timing_hooks() -> list[Callable[[dict, object], None]]:
+    return list(_hooks)
+
+
+class StageTimer:
+    """
+    Wall time per stage in ms and, with trace_memory, the peak bytes
+    allocated during each stage on top of what was live when it started.
+    Memory comes from tracemalloc, so it covers numpy buffers (and Python
+    objects) but not OpenCV's internal allocations.
+
+    Disabled timers cost one branch per stage.
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.ms: dict[str, float] = {}
+        self.peak_bytes: dict[str, int] = {}
+        self._t0 = time.perf_counter()
+        self._started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0.0) + (time.perf_counter() - t0) * 1e3
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+
+    def result(self) -> dict:
+        """{"ms": {stage: ms}, "total_ms": ..., ["peak_bytes": {stage: bytes}]}; stops tracing it started."""
+        out = {
+            "ms": {k: round(v, 3) for k, v in self.ms.items()},
+            "total_ms": round((time.perf_counter() - self._t0) * 1e3, 3),
+        }
+        if self.trace_memory:
+            out["peak_bytes"] = dict(self.peak_bytes)
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        return out
@@ -34,6 +34,20 @@ def sigmoid(x: float) -> float:
     return float(1.0 / (1.0 + np.exp(-x)))
 
 
+def pack_strings(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """utf-8 blob + offsets of a string list, for storing it in an .npz without pickle."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = blob.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
 def normalize01(x: np.ndarray, eps: float = 1e-8) -> np.ndarray:
     mn = float(np.min(x))
     mx = float(np.max(x))
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import cv2
+
+from .context import ImageContext
+from .pipeline import analyze_image, TruthLensResult
+from .calibration import as_provider, verdict_from_likelihood
+from .artifacts.noise_residual import DENOISERS
+from .stats import P2Quantile, TopK
+from .dedup import phash64
+from .reports import ReportWriter
+
+TIMELINE_FIELDS = ["frame", "t", "verdict", "ai_likelihood", "confidence", "reused_from", "scene_change"]
+
+
+@dataclass
+class FrameResult:
+    index: int  # frame number in the source
+    t: float  # seconds
+    result: TruthLensResult
+    reused_from: int | None  # frame whose result was reused (near-identical), None if analyzed
+    scene_change: bool
+
+
+def open_capture(source: str | Path) -> cv2.VideoCapture:
+    """
+    A video file, or a frame sequence as a printf pattern understood by
+    OpenCV (e.g. frames/img_%05d.png).
+    """
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {source}")
+    return cap
+
+
+def _thumb(frame: np.ndarray) -> tuple[np.ndarray, int]:
+    """32x32 BGR thumbnail -> (gray thumbnail as float32, phash64); phash64 shrinks to 32x32 itself."""
+    small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    return gray, phash64(small, order="bgr")
+
+
+def iter_video(
+    source: str | Path,
+    stride: int = 1,
+    scene_threshold: float | None = None,
+    max_gap: int = 30,
+    skip_distance: int = 4,
+    max_side: int | None = None,
+    **analyze_kwargs,
+) -> Iterator[FrameResult]:
+    """
+    Streams FrameResults over every stride-th frame (the others are only
+    grabbed, not decoded).
+
+    scene_threshold: analyze a sampled frame only when its 32x32 gray
+      thumbnail differs from the previous sampled one by more than this mean
+      absolute difference (0-255), or max_gap sampled frames have passed;
+      the others reuse the last analysis.
+    skip_distance: a frame within this phash Hamming distance of the last
+      analyzed frame is near-identical and reuses its result (-1 = never).
+    max_side: downscale larger frames first (INTER_AREA; changes scores).
+
+    analyze_kwargs go to analyze_image, which runs scores-only (maps=False)
+    on a BGR ImageContext of the decoded frame. Frames share one shape, so
+    the extractors' per-shape window / bin / resize caches are reused; only
+    the current frame and the last result are held, whatever the clip length.
+    """
+    if stride < 1:
+        raise ValueError(f"stride must be >= 1, got {stride}")
+    analyze_kwargs.setdefault("maps", False)
+    cap = open_capture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frame = None
+    prev_gray = None
+    last: tuple[int, TruthLensResult, int] | None = None  # (frame index, result, phash)
+    since = 0
+    try:
+        index = -1
+        while True:
+            index += 1
+            if not cap.grab():
+                break
+            if index % stride:
+                continue
+            ok, frame = cap.retrieve(frame)  # decodes into the previous buffer when shapes match
+            if not ok:
+                break
+            t = index / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1e3
+
+            gray, h = _thumb(frame)
+            scene_change = prev_gray is None or (
+                scene_threshold is not None and float(np.mean(np.abs(gray - prev_gray))) > scene_threshold
+            )
+            prev_gray = gray
+            since += 1
+
+            reuse = last is not None and not scene_change and (
+                (scene_threshold is not None and since < max_gap)
+                or (skip_distance >= 0 and bin(last[2] ^ h).count("1") <= skip_distance)
+            )
+            if reuse:
+                yield FrameResult(index, t, last[1], last[0], scene_change)
+                continue
+
+            img = frame
+            if max_side and max(frame.shape[:2]) > max_side:
+                s = max_side / max(frame.shape[:2])
+                img = cv2.resize(frame, (max(1, round(frame.shape[1] * s)), max(1, round(frame.shape[0] * s))),
+                                 interpolation=cv2.INTER_AREA)
+            res = analyze_image(ImageContext(img, order="bgr"), **analyze_kwargs)
+            last, since = (index, res, h), 0
+            yield FrameResult(index, t, res, None, scene_change)
+    finally:
+        cap.release()
+
+
+class ClipAggregate:
+    """
+    Clip-level summary of FrameResults in O(1) memory: counts, mean / max /
+    streaming p90 of the per-frame ai_likelihood, verdict counts, the top_k
+    most AI-like frames and the longest run of "Likely AI-generated" frames.
+
+    The clip likelihood is the p90 of the sampled frames: one odd frame does
+    not flip the verdict, a sustained AI segment covering >= 10% does.
+    """
+
+    def __init__(self, top_k: int = 5):
+        self.sampled = 0
+        self.analyzed = 0
+        self.reused = 0
+        self.scene_changes = 0
+        self.total = 0.0
+        self.max: tuple[float, int, float] | None = None  # (ai_likelihood, frame, t)
+        self.p90 = P2Quantile(90)
+        self.verdicts: dict[str, int] = {}
+        self.top = TopK(top_k)
+        self._run: tuple[float, float] | None = None  # current AI run (start t, end t)
+        self.longest_ai: tuple[float, float] | None = None
+
+    def add(self, fr: FrameResult) -> None:
+        x = fr.result.ai_likelihood
+        self.sampled += 1
+        self.analyzed += fr.reused_from is None
+        self.reused += fr.reused_from is not None
+        self.scene_changes += fr.scene_change
+        self.total += x
+        self.p90.add(x)
+        if self.max is None or x > self.max[0]:
+            self.max = (x, fr.index, fr.t)
+        self.verdicts[fr.result.verdict] = self.verdicts.get(fr.result.verdict, 0) + 1
+        if fr.reused_from is None and self.top.wants(-x, fr.index):
+            self.top.push(-x, fr.index, {"frame": fr.index, "t": round(fr.t, 3), "ai_likelihood": round(x, 4),
+                                         "evidence": fr.result.evidence})
+
+        if fr.result.verdict == "Likely AI-generated":
+            self._run = (self._run[0] if self._run else fr.t, fr.t)
+            if self.longest_ai is None or self._run[1] - self._run[0] > self.longest_ai[1] - self.longest_ai[0]:
+                self.longest_ai = self._run
+        else:
+            self._run = None
+
+    def summary(self, calibration=None) -> dict:
+        likely_real_max, likely_ai_min = as_provider(calibration).thresholds()
+        clip = self.p90.value(0.0)
+        verdict, confidence = verdict_from_likelihood(clip, likely_real_max, likely_ai_min)
+        n_ai = self.verdicts.get("Likely AI-generated", 0)
+        evidence = [f"{n_ai} of {self.sampled} sampled frames look AI-generated"] if self.sampled else []
+        if self.longest_ai is not None:
+            evidence.append(f"Longest AI-looking segment: {self.longest_ai[0]:.2f}s - {self.longest_ai[1]:.2f}s")
+        return {
+            "verdict": verdict if self.sampled else "ERROR",
+            "confidence": round(confidence, 4),
+            "ai_likelihood": round(clip, 4),
+            "evidence": evidence,
+            "frames": {
+                "sampled": self.sampled,
+                "analyzed": self.analyzed,
+                "reused": self.reused,
+                "scene_changes": self.scene_changes,
+            },
+            "likelihood": {
+                "mean": round(self.total / self.sampled, 4) if self.sampled else None,
+                "p90": round(clip, 4),
+                "max": round(self.max[0], 4) if self.max else None,
+            },
+            "verdict_counts": self.verdicts,
+            "top_frames": self.top.rows(),
+            "thresholds_used": {"likely_real_max": likely_real_max, "likely_ai_min": likely_ai_min},
+        }
+
+
+def analyze_video(
+    source: str | Path,
+    timeline: str | Path | None = None,
+    calibration=None,
+    top_k: int = 5,
+    **kwargs,
+) -> dict:
+    """
+    Runs iter_video (kwargs: its sampling options + analyze_image options)
+    and returns the ClipAggregate summary. timeline: JSONL file receiving
+    one line per sampled frame as it is processed.
+    """
+    agg = ClipAggregate(top_k)
+    writer = ReportWriter(timeline, TIMELINE_FIELDS, "jsonl") if timeline else None
+    try:
+        for fr in iter_video(source, calibration=calibration, **kwargs):
+            agg.add(fr)
+            if writer is not None:
+                writer.write({
+                    "frame": fr.index,
+                    "t": round(fr.t, 3),
+                    "verdict": fr.result.verdict,
+                    "ai_likelihood": round(fr.result.ai_likelihood, 4),
+                    "confidence": round(fr.result.confidence, 4),
+                    "reused_from": fr.reused_from if fr.reused_from is not None else "",
+                    "scene_change": fr.scene_change,
+                })
+    finally:
+        if writer is not None:
+            writer.close()
+    return agg.summary(calibration)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="TruthLens video / frame-sequence analysis (streaming)")
+    ap.add_argument("--video", required=True, help="Video file, or a frame pattern like frames/%%05d.png")
+    ap.add_argument("--out", default="out/video", help="Output folder")
+    ap.add_argument("--stride", type=int, default=10, help="Sample every N-th frame (the rest are not decoded)")
+    ap.add_argument("--scene-threshold", type=float, default=None,
+                    help="Only analyze sampled frames that start a new scene (mean abs thumbnail change, 0-255)")
+    ap.add_argument("--max-gap", type=int, default=30,
+                    help="With --scene-threshold: still analyze at least every N sampled frames")
+    ap.add_argument("--skip-distance", type=int, default=4,
+                    help="Reuse the last result for near-identical frames (phash distance; -1 = off)")
+    ap.add_argument("--max-side", type=int, default=None, help="Downscale larger frames before analysis")
+    ap.add_argument("--calibration", default=None, help="calibration.json to use (default: out/calibration.json)")
+    ap.add_argument("--denoiser", default="nlmeans", choices=list(DENOISERS),
+                    help="Noise residual backend (nlmeans = most accurate, median/gaussian = fastest)")
+    ap.add_argument("--cascade", action="store_true",
+                    help="Skip repetition / noise stages once cheaper stages fix the verdict")
+    args = ap.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(args.video).stem.replace("%", "")
+    timeline = out_dir / f"{stem}_timeline.jsonl"
+
+    t0 = time.perf_counter()
+    summary = analyze_video(
+        args.video,
+        timeline=timeline,
+        calibration=args.calibration,
+        stride=max(1, args.stride),
+        scene_threshold=args.scene_threshold,
+        max_gap=args.max_gap,
+        skip_distance=args.skip_distance,
+        max_side=args.max_side,
+        denoiser=args.denoiser,
+        cascade=args.cascade,
+    )
+    summary["source"] = str(args.video)
+    summary["outputs"] = {"timeline": timeline.as_posix()}
+    summary["elapsed_s"] = round(time.perf_counter() - t0, 2)
+
+    out_json = out_dir / f"{stem}_clip.json"
+    out_json.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f"\n✅ Saved: {out_json} + {timeline}")
+
+
+if __name__ == "__main__":
+    main()
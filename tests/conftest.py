@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # `import src` without installing
+
+
+def photo_like(h: int, w: int, seed: int = 0) -> np.ndarray:
+    """uint8 RGB with smooth structure, edges and mild noise (scores away from the 0 / 1 clips)."""
+    rng = np.random.default_rng(seed)
+    img = cv2.resize(rng.random((max(2, h // 32), max(2, w // 32), 3), dtype=np.float32), (w, h),
+                     interpolation=cv2.INTER_CUBIC)
+    for _ in range(6):
+        y, x = int(rng.integers(0, h)), int(rng.integers(0, w))
+        cv2.circle(img, (x, y), int(rng.integers(4, max(5, min(h, w) // 6))), tuple(rng.random(3).tolist()), -1)
+    img += rng.standard_normal((h, w, 3), dtype=np.float32) * 0.02
+    return (np.clip(img, 0, 1) * 255).astype(np.uint8)
+
+
+@pytest.fixture
+def rgb() -> np.ndarray:
+    return photo_like(180, 240)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from src.pipeline import analyze_batch, analyze_image
+from conftest import photo_like
+
+
+@pytest.fixture(scope="module")
+def stack():
+    return np.stack([photo_like(160, 200, seed=s) for s in range(3)])
+
+
+@pytest.mark.parametrize("denoiser", ["nlmeans", "median"])
+def test_batched_equals_per_image(stack, denoiser):
+    batch = analyze_batch(stack, denoiser=denoiser)
+    for img, res in zip(stack, batch):
+        single = analyze_image(img, denoiser=denoiser)
+        assert res.scores == single.scores
+        assert (res.verdict, res.ai_likelihood, res.evidence) == (single.verdict, single.ai_likelihood, single.evidence)
+        assert np.array_equal(res.heatmap01, single.heatmap01)
+
+
+def test_batched_scores_only(stack):
+    for img, res in zip(stack, analyze_batch(stack, maps=False)):
+        assert res.heatmap01 is None
+        assert res.scores == analyze_image(img, maps=False).scores
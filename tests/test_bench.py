@@ -0,0 +1,14 @@
+from src.bench import compare
+
+
+def _report(**metrics):
+    return {"results": [{"size": "2", "target": "noise", **metrics}]}
+
+
+def test_p95_regressions_are_flagged():
+    base = _report(p50_ms=100.0, p95_ms=120.0, peak_rss_mb=200.0)
+    assert compare(base, _report(p50_ms=100.0, p95_ms=140.0, peak_rss_mb=200.0))[0]["regressions"] == []
+    assert compare(base, _report(p50_ms=100.0, p95_ms=160.0, peak_rss_mb=200.0))[0]["regressions"] == ["p95_ms"]
+    assert compare(base, _report(p50_ms=115.0, p95_ms=120.0, peak_rss_mb=230.0))[0]["regressions"] == [
+        "p50_ms", "peak_rss_mb",
+    ]
@@ -0,0 +1,75 @@
+import numpy as np
+
+from src.cache import ResultCache, bytes_digest
+from src.pipeline import analyze_image, analyze_region
+
+
+def _disk_size(root):
+    return sum(f.stat().st_size for f in root.rglob("*") if f.is_file())
+
+
+def test_result_round_trip(rgb, tmp_path):
+    cache = ResultCache(tmp_path)
+    res = analyze_image(rgb)
+    key = cache.key(bytes_digest(rgb.tobytes()))
+    cache.put(key, res)
+    hit = cache.get(key)
+    assert (hit.verdict, hit.ai_likelihood, hit.evidence) == (res.verdict, res.ai_likelihood, res.evidence)
+    assert hit.scores["noise"] == res.scores["noise"]
+    assert np.abs(hit.heatmap01 - res.heatmap01).max() <= 1 / 255
+
+
+def test_other_options_miss(tmp_path):
+    cache = ResultCache(tmp_path)
+    assert cache.key("d") == cache.key("d", {"denoiser": "nlmeans"})
+    assert cache.key("d") != cache.key("d", {"denoiser": "median"})
+
+
+def test_missing_heatmap_is_a_miss_only_when_needed(rgb, tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put("k", analyze_image(rgb, maps=False))
+    assert cache.get("k") is None
+    assert cache.get("k", need_heatmap=False).heatmap01 is None
+
+
+def test_overwrites_are_not_double_counted(rgb, tmp_path):
+    cache = ResultCache(tmp_path)
+    res = analyze_image(rgb, retain=True)
+    for _ in range(3):
+        cache.put("k", res)
+        cache.put_maps("k", res.feature_maps)
+    assert cache._size == _disk_size(tmp_path)
+
+
+def test_maps_round_trip(rgb, tmp_path):
+    cache = ResultCache(tmp_path)
+    res = analyze_image(rgb, retain=True)
+    cache.put_maps("k", res.feature_maps)
+    box = (10, 20, 100, 80)
+    a = analyze_region(res.feature_maps, box).scores
+    b = analyze_region(cache.get_maps("k"), box).scores
+    assert a == b
+
+
+def test_entry_evicted_meanwhile(rgb, tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1)
+    cache.put("k", analyze_image(rgb))  # evicted right away
+    assert cache.get("k") is None and cache.get_maps("k") is None
+    assert cache._size == _disk_size(tmp_path) == 0
+
+
+def test_hit_survives_concurrent_eviction(rgb, tmp_path, monkeypatch):
+    import src.cache
+
+    cache = ResultCache(tmp_path)
+    cache.put("k", analyze_image(rgb))
+    imread = src.cache.cv2.imread
+
+    def read_then_evict(path, flags):
+        img = imread(path, flags)
+        for f in tmp_path.rglob("k.*"):
+            f.unlink()
+        return img
+
+    monkeypatch.setattr(src.cache.cv2, "imread", read_then_evict)
+    assert cache.get("k") is not None
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.pipeline import analyze_image, quick_scores
+from src.features import FeatureStore, raw_features
+from src.rescore import rescore
+from conftest import photo_like
+
+# far enough from 0.5 for edges + spectrum alone to settle a clearly real image
+WIDE = {"thresholds": {"likely_real_max": 0.70, "likely_ai_min": 0.95}}
+
+
+@pytest.fixture(scope="module")
+def smooth():
+    return photo_like(200, 260, seed=5)
+
+
+def test_exit_after_two_stages(smooth):
+    assert quick_scores(smooth)["likelihood_bounds"][1] < WIDE["thresholds"]["likely_real_max"]
+    res = analyze_image(smooth, calibration=WIDE, cascade=True)
+    assert res.scores["cascade"]["skipped"] == ["repetition", "noise"]
+    assert res.scores["noise"]["score"] is None and res.scores["repetition"]["score"] is None
+    assert res.verdict == analyze_image(smooth, calibration=WIDE).verdict == "Likely Real"
+    lo, hi = res.scores["cascade"]["likelihood_bounds"]
+    assert lo <= res.ai_likelihood <= hi
+
+
+def test_default_thresholds_keep_the_verdict(smooth, rgb):
+    for img in (smooth, rgb):
+        assert analyze_image(img, cascade=True).verdict == analyze_image(img).verdict
+
+
+def test_rescore_renormalizes_skipped_stages(smooth, rgb):
+    store = FeatureStore()
+    results = [analyze_image(smooth, calibration=WIDE, cascade=True), analyze_image(rgb, calibration=WIDE)]
+    for i, res in enumerate(results):
+        store.add(f"img{i}", "s", "c", res.verdict, raw_features(res.scores))
+    assert np.isnan(store.column("noise_score")[0])
+    out = rescore(store, likely_real_max=0.70, likely_ai_min=0.95)
+    assert out["combined"].tolist() == [r.scores["combined_score"] for r in results]
+    assert out["ai_likelihood"].tolist() == [r.ai_likelihood for r in results]
@@ -0,0 +1,26 @@
+import numpy as np
+
+from src.context import ImageContext
+from src.pipeline import analyze_image
+from src.utils import to_float01
+
+
+def test_uint8_path_matches_to_float01(rgb):
+    ctx = ImageContext(rgb)
+    assert np.array_equal(ctx.rgb01, to_float01(rgb))
+    assert ctx.rgb8 is rgb
+
+
+def test_near_black_uint8_is_still_scaled():
+    dark = np.ones((8, 8, 3), np.uint8)
+    assert np.allclose(ImageContext(dark).rgb01, 1 / 255)
+
+
+def test_bgr_source_equals_rgb(rgb):
+    bgr = np.ascontiguousarray(rgb[..., ::-1])
+    ctx = ImageContext(bgr, order="bgr")
+    assert np.array_equal(ctx.rgb8, rgb)
+    assert np.array_equal(ctx.gray01, ImageContext(rgb).gray01)
+    a, b = analyze_image(rgb), analyze_image(ctx)
+    assert a.scores == b.scores and a.verdict == b.verdict
+    assert np.array_equal(a.heatmap01, b.heatmap01)
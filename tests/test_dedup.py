@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.dedup import DuplicateIndex
+
+
+def _near(rng, base, n_flips):
+    h = int(base)
+    for bit in rng.choice(64, n_flips, replace=False):
+        h ^= 1 << int(bit)
+    return h
+
+
+@pytest.fixture(scope="module")
+def index_and_hashes():
+    rng = np.random.default_rng(0)
+    bases = rng.integers(0, 2 ** 63, 300, dtype=np.uint64)
+    hashes = [int(b) for b in bases] + [_near(rng, b, rng.integers(1, 9)) for b in bases for _ in range(3)]
+    index = DuplicateIndex(merge_every=97)  # several merges + a pending tail
+    for i, h in enumerate(hashes):
+        index.add(h, f"k{i}", f"r{i}")
+    return index, hashes
+
+
+def test_recall_matches_brute_force(index_and_hashes):
+    index, hashes = index_and_hashes
+    all_h = np.array(hashes, dtype=np.uint64)
+    for d in range(index.max_exact_distance + 1):
+        for q in hashes[::37]:
+            dist = np.bitwise_count(all_h ^ np.uint64(q))
+            expected = {f"k{i}" for i in np.flatnonzero(dist <= d)}
+            assert {k for k, _, _ in index.query(q, d)} == expected
+
+
+def test_incremental_merge_equals_rebuild(index_and_hashes):
+    index, _ = index_and_hashes
+    index._merge_pending()
+    vals, idx = [v.copy() for v in index._sorted_vals], [i.copy() for i in index._sorted_idx]
+    index._rebuild()
+    for b in range(index.bands):
+        assert np.array_equal(vals[b], index._sorted_vals[b])
+        assert np.array_equal(idx[b], index._sorted_idx[b])
+
+
+def test_save_load_round_trip(index_and_hashes, tmp_path):
+    index, hashes = index_and_hashes
+    index.update(5, "newer", sig="s1")
+    index.save(tmp_path / "index.npz")
+    loaded = DuplicateIndex.load(tmp_path / "index.npz")
+    assert loaded.keys == index.keys and loaded.refs == index.refs and loaded.sigs == index.sigs
+    assert loaded.query(hashes[5], 0, sig="s1") == [("k5", "newer", 0)]
@@ -0,0 +1,48 @@
+import os
+
+from src.manifest import RunManifest
+
+
+def _stat(path, text):
+    path.write_text(text)
+    return path.stat()
+
+
+def test_round_trip_and_invalidation(tmp_path):
+    journal = tmp_path / "manifest.jsonl"
+    st = _stat(tmp_path / "a.png", "aaaa")
+    m = RunManifest(journal, "opts-1", checkpoint_every=1)
+    m.record("a.png", st, {"image": "a.png", "verdict": "Likely Real"})
+    m.record("b.png", st, {"image": "b.png", "verdict": "ERROR"})
+    m.close()
+
+    again = RunManifest(journal, "opts-1")
+    assert again.lookup("a.png", st) == {"image": "a.png", "verdict": "Likely Real"}
+    assert again.lookup("b.png", st) is None  # failures are retried
+    assert RunManifest(journal, "opts-2").lookup("a.png", st) is None
+    changed = _stat(tmp_path / "a.png", "changed content")
+    assert again.lookup("a.png", changed) is None
+
+
+def test_last_line_wins_and_torn_lines_are_skipped(tmp_path):
+    journal = tmp_path / "manifest.jsonl"
+    st = _stat(tmp_path / "a.png", "aaaa")
+    m = RunManifest(journal, "o")
+    m.record("a.png", st, {"verdict": "Uncertain"})
+    m.record("a.png", st, {"verdict": "Likely AI"})
+    m.close()
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('{"image": "c.png", "si')
+    assert RunManifest(journal, "o").lookup("a.png", st) == {"verdict": "Likely AI"}
+
+
+def test_compact_drops_gone_files(tmp_path):
+    journal = tmp_path / "manifest.jsonl"
+    st = _stat(tmp_path / "a.png", "aaaa")
+    m = RunManifest(journal, "o")
+    for name in ("a.png", "a.png", "gone.png"):
+        m.record(name, st, {"verdict": "Uncertain"})
+    m.compact({"a.png"})
+    assert len(journal.read_text().splitlines()) == 1
+    assert list(RunManifest(journal, "o").entries) == ["a.png"]
+    assert not os.path.exists(journal.with_name(journal.name + ".tmp"))
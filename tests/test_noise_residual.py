@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import pytest
+
+from src.artifacts.noise_residual import NLMEANS_DOWN_MAX_SIDE, effective_denoiser, noise_residual_features
+
+
+def test_nlmeans_down_is_nlmeans_below_max_side(rgb):
+    assert max(rgb.shape[:2]) <= NLMEANS_DOWN_MAX_SIDE
+    down = noise_residual_features(rgb, denoiser="nlmeans_down")
+    full = noise_residual_features(rgb, denoiser="nlmeans")
+    assert down["denoiser"] == "nlmeans"
+    for k in ("resid_mean", "resid_std", "resid_corr_1px", "score"):
+        assert down[k] == full[k]
+
+
+@pytest.mark.parametrize("shape, expected", [((480, 640), "nlmeans"), ((768, 500), "nlmeans"), ((769, 500), "nlmeans_down")])
+def test_effective_denoiser(shape, expected):
+    assert effective_denoiser("nlmeans_down", shape) == expected
+    assert effective_denoiser("median", shape) == "median"
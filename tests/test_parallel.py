@@ -0,0 +1,42 @@
+import os
+
+import cv2
+
+from src.parallel import bounded_map
+from src.pipeline import analyze_image, analyze_many
+from src.utils import read_image_rgb
+
+
+def _square(x):
+    return x * x
+
+
+def _die_on_three(x):
+    if x == 3:
+        os._exit(1)
+    return x
+
+
+def _crashed(item, err):
+    return -item
+
+
+def test_bounded_map_keeps_input_order():
+    assert list(bounded_map(_square, range(20), workers=2, max_in_flight=3)) == [x * x for x in range(20)]
+
+
+def test_bounded_map_survives_a_crashing_worker():
+    out = list(bounded_map(_die_on_three, range(8), workers=2, on_crash=_crashed))
+    # items in flight with 3 get the crash result, the rest run on a fresh pool
+    assert out[3] == -3 and all(o in (i, -i) for i, o in enumerate(out))
+
+
+def test_analyze_many_matches_analyze_image(rgb, tmp_path):
+    path = tmp_path / "img.png"
+    cv2.imwrite(str(path), rgb[..., ::-1])
+    paths = [path, tmp_path / "missing.png", path]
+    results = list(analyze_many(paths, workers=2, denoiser="median", maps=False))
+    assert [r[0] for r in results] == [str(p) for p in paths]
+    assert results[1][1] is None and results[1][2]
+    single = analyze_image(read_image_rgb(str(path)), denoiser="median", maps=False)
+    assert results[0][1].scores == results[2][1].scores == single.scores
@@ -0,0 +1,15 @@
+import numpy as np
+
+from src.artifacts.patch_repetition import patch_repetition_features
+from src.pipeline import EVIDENCE
+
+
+def test_max_sim_is_the_true_maximum(rgb):
+    f = patch_repetition_features(rgb, maps=False)
+    assert f["max_sim"] >= f["p95_sim"]
+    assert "p95_sim=" in EVIDENCE["repetition"](f)
+
+
+def test_tiny_image_has_no_similarity():
+    f = patch_repetition_features(np.zeros((16, 16, 3), np.uint8), maps=False)
+    assert f["max_sim"] == f["p95_sim"] == f["score"] == 0.0
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from src.pipeline import analyze_image, analyze_region
+from src.roi import clip_box, parse_box
+
+
+def test_full_box_equals_analyze_image(rgb):
+    res = analyze_image(rgb, retain=True)
+    h, w = rgb.shape[:2]
+    region = analyze_region(res.feature_maps, (0, 0, w, h))
+    for stage in ("spectrum", "noise", "repetition", "edges"):
+        assert region.scores[stage] == pytest.approx(res.scores[stage], rel=1e-5, abs=1e-7), stage
+    assert region.verdict == res.verdict
+    assert region.ai_likelihood == pytest.approx(res.ai_likelihood, rel=1e-6)
+    assert np.abs(region.heatmap01 - res.heatmap01).max() < 1e-5
+
+
+def test_boxes_are_clipped_and_parsed():
+    assert parse_box("10,20,30,40") == (10, 20, 30, 40)
+    assert clip_box((-5, 10, 1000, 50), (100, 200)) == (0, 10, 200, 50)
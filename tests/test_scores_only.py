@@ -0,0 +1,29 @@
+import pytest
+
+from src.pipeline import analyze_image
+from src.artifacts.noise_residual import DENOISERS, noise_residual_features
+from src.artifacts.patch_repetition import patch_repetition_features
+from src.artifacts.edge_stats import edge_features
+from conftest import photo_like
+
+
+@pytest.mark.parametrize("denoiser", list(DENOISERS))
+def test_maps_false_keeps_the_scores(rgb, denoiser):
+    full = analyze_image(rgb, denoiser=denoiser)
+    quick = analyze_image(rgb, denoiser=denoiser, maps=False)
+    assert quick.heatmap01 is None
+    assert quick.scores == full.scores
+    assert (quick.verdict, quick.ai_likelihood, quick.evidence) == (full.verdict, full.ai_likelihood, full.evidence)
+
+
+def test_maps_false_tiled():
+    img = photo_like(400, 520, seed=2)
+    assert analyze_image(img, tile=192, maps=False).scores == analyze_image(img, tile=192).scores
+
+
+@pytest.mark.parametrize("extractor", [noise_residual_features, patch_repetition_features, edge_features])
+def test_extractor_stats_without_maps(rgb, extractor):
+    with_maps = extractor(rgb)
+    without = extractor(rgb, maps=False)
+    assert without == {k: v for k, v in with_maps.items() if k in without}
+    assert len(without) < len(with_maps)
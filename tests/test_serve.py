@@ -0,0 +1,86 @@
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+from src.serve import AnalysisService, make_handler
+
+MAX_BYTES = 1 << 20
+
+
+@pytest.fixture(scope="module")
+def service():
+    svc = AnalysisService(workers=1, max_queue=8)
+    assert svc.ready.wait(120)
+    yield svc
+    svc.close()
+
+
+@pytest.fixture(scope="module")
+def port(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service, MAX_BYTES, 120.0))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def png():
+    img = np.random.default_rng(0).integers(0, 255, (64, 80, 3), dtype=np.uint8)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def _request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read() or b"{}")
+
+
+def test_health_and_readiness(port):
+    assert _request(port, "GET", "/healthz") == (200, {"status": "ok"})
+    status, body = _request(port, "GET", "/readyz")
+    assert status == 200 and body["ready"]
+    assert _request(port, "GET", "/nope")[0] == 404
+
+
+def test_analyze_ok(port, png):
+    status, body = _request(port, "POST", "/analyze?denoiser=median", png)
+    assert status == 200
+    assert body["verdict"] in ("Likely Real", "Uncertain", "Likely AI")
+
+
+@pytest.mark.parametrize("path, body, headers", [
+    ("/analyze", b"not an image", {}),  # undecodable
+    ("/analyze?tile=-5", None, {}),  # invalid option
+    ("/analyze?denoiser=bogus", None, {}),
+    ("/analyze", b"", {}),  # empty body
+])
+def test_bad_requests(port, png, path, body, headers):
+    assert _request(port, "POST", path, png if body is None else body, headers)[0] == 400
+
+
+def test_bad_content_length(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.putrequest("POST", "/analyze")
+    conn.putheader("Content-Length", "abc")
+    conn.endheaders()
+    assert conn.getresponse().status == 400
+
+
+def test_too_large(port):
+    assert _request(port, "POST", "/analyze", b"\0" * (MAX_BYTES + 1))[0] == 413
+
+
+def test_recovers_from_a_worker_crash(service, port, png):
+    restarts = service.restarts
+    with pytest.raises(Exception):
+        service._pool.submit(os._exit, 1).result()
+    assert _request(port, "POST", "/analyze?denoiser=median", png)[0] == 200
+    assert service.restarts == restarts + 1
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.artifacts.spectrum_fft import spectrum_features, profile_features
+from conftest import photo_like
+
+
+def reference_features(gray01):
+    """The original full-plane fft2 + fftshift implementation."""
+    h, w = gray01.shape
+    win = (np.hanning(h).reshape(-1, 1) * np.hanning(w).reshape(1, -1)).astype(np.float32)
+    mag = np.log1p(np.abs(np.fft.fftshift(np.fft.fft2((gray01 * win).astype(np.float32))))).astype(np.float32)
+    cy, cx = h // 2, w // 2
+    y, x = np.indices((h, w))
+    r = np.clip(np.sqrt((x - cx) ** 2 + (y - cy) ** 2).astype(np.int32), 0, min(cy, cx))
+    radial_mean = np.bincount(r.ravel(), mag.ravel()) / np.maximum(np.bincount(r.ravel()), 1)
+    return profile_features(np.arange(len(radial_mean))[1:], radial_mean[1:])
+
+
+def _gray(h, w, kind):
+    if kind == "noise":
+        return np.random.default_rng(0).random((h, w), dtype=np.float32)
+    return cv2.cvtColor(photo_like(h, w), cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+
+
+@pytest.mark.parametrize("kind", ["noise", "photo"])
+@pytest.mark.parametrize("shape", [(480, 640), (509, 761)])
+def test_default_matches_reference(shape, kind):
+    g = _gray(*shape, kind)
+    assert spectrum_features(g) == reference_features(g)
+
+
+def test_smooth_sizes_are_never_padded():
+    g = _gray(480, 640, "noise")
+    assert spectrum_features(g, pad_optimal=True) == spectrum_features(g)
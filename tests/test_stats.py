@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from src.stats import P2Quantile, TopK
+
+
+@pytest.mark.parametrize("p", [10, 50, 90])
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5])
+def test_p2_is_exact_up_to_five_values(p, n):
+    values = np.random.default_rng(n).random(n)
+    est = P2Quantile(p)
+    for v in values:
+        est.add(float(v))
+    assert est.value(-1.0) == pytest.approx(np.percentile(values.astype(np.float32), p), rel=1e-6)
+
+
+def test_p2_estimate_converges():
+    values = np.random.default_rng(0).random(20000)
+    est = P2Quantile(90)
+    for v in values:
+        est.add(float(v))
+    assert est.value(-1.0) == pytest.approx(np.percentile(values, 90), abs=0.01)
+    assert P2Quantile(90).value(-1.0) == -1.0
+
+
+def test_topk_matches_sorted():
+    keys = np.random.default_rng(1).integers(0, 20, 200).astype(float)
+    top = TopK(7)
+    for i, k in enumerate(keys):
+        top.push(k, i, {"i": i})
+    expected = sorted(range(len(keys)), key=lambda i: keys[i])[:7]
+    assert [r["i"] for r in top.rows()] == expected
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src.pipeline import analyze_image
+from src.artifacts.noise_residual import DENOISERS
+from conftest import photo_like
+
+TILE = 256
+
+
+@pytest.fixture(scope="module")
+def large():
+    return photo_like(600, 840, seed=3)
+
+
+@pytest.mark.parametrize("denoiser", [d for d in DENOISERS if d != "nlmeans_down"])
+def test_exact_stats_match_full_image(large, denoiser):
+    full = analyze_image(large, denoiser=denoiser, maps=False).scores
+    tiled = analyze_image(large, denoiser=denoiser, tile=TILE, maps=False).scores
+    for key in ("resid_mean", "resid_std", "resid_corr_1px"):
+        assert tiled["noise"][key] == pytest.approx(full["noise"][key], rel=1e-5, abs=1e-7)
+    assert tiled["edges"]["lap_var"] == pytest.approx(full["edges"]["lap_var"], rel=1e-5)
+    assert tiled["repetition"] == pytest.approx(full["repetition"], abs=1e-5)
+
+
+def test_nlmeans_down_thumbnail_matches(large):
+    full = analyze_image(large, denoiser="nlmeans_down", maps=False).scores["noise"]
+    tiled = analyze_image(large, denoiser="nlmeans_down", tile=TILE, maps=False).scores["noise"]
+    assert tiled["denoiser"] == full["denoiser"] == "nlmeans_down"
+    for key in ("resid_mean", "resid_std", "resid_corr_1px"):
+        assert tiled[key] == pytest.approx(full[key], abs=1e-3)
+
+
+def test_gray_input_is_rejected():
+    with pytest.raises(ValueError):
+        analyze_image(np.zeros((600, 600), np.uint8), tile=TILE)
@@ -0,0 +1,9 @@
+import pytest
+
+from src.video import iter_video
+
+
+@pytest.mark.parametrize("stride", [0, -3])
+def test_stride_must_be_positive(stride):
+    with pytest.raises(ValueError):
+        next(iter_video("missing.mp4", stride=stride))